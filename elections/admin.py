@@ -1,5 +1,89 @@
 from django.contrib import admin
-from .models import Election, Candidate, Vote
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ALL_VAR, ORDER_VAR, SEARCH_VAR, ChangeList
+from django.core.paginator import Paginator
+from django.db.models import Count, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils.functional import cached_property
+
+from .models import Election, Candidate, ElectionCandidate, Vote, ElectionTally, CandidateTally
+from .replica import pin_to_primary, use_replica
+
+CURSOR_VAR = 'cursor'
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    不做精确 COUNT(*) 的分页器：优先使用给定的估计值（来自计票汇总表），
+    否则最多数到 count_limit 行，避免在大表上全表扫描。
+    """
+
+    def __init__(self, object_list, per_page, estimate=None, count_limit=10000, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.estimate = estimate
+        self.count_limit = count_limit
+
+    @cached_property
+    def count(self):
+        if self.estimate is not None:
+            return self.estimate
+        return self.object_list.order_by()[:self.count_limit].count()
+
+
+class KeysetChangeList(ChangeList):
+    """
+    按主键倒序的游标分页：下一页用 id < cursor 过滤，不使用 OFFSET。
+    用户点击列头排序或选择“显示全部”时退回默认的页码分页。
+    """
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # 过滤、排序等链接都从第一页开始
+        return super().get_query_string(new_params, [*(remove or []), CURSOR_VAR])
+
+    def get_results(self, request):
+        self.keyset = ORDER_VAR not in self.params and ALL_VAR not in self.params
+        if not self.keyset:
+            return super().get_results(request)
+
+        cursor = request.GET.get(CURSOR_VAR)
+        queryset = self.queryset
+        if cursor:
+            try:
+                queryset = queryset.filter(pk__lt=int(cursor))
+            except ValueError:
+                raise IncorrectLookupParameters
+        rows = list(queryset[:self.list_per_page + 1])
+        result_list = rows[:self.list_per_page]
+        has_next = len(rows) > self.list_per_page
+
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        self.result_count = paginator.count
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.result_list = result_list
+        self.can_show_all = False
+        self.multi_page = has_next or bool(cursor)
+        self.paginator = paginator
+        self.first_page_url = self.get_query_string() if cursor else None
+        self.next_page_url = (
+            self.get_query_string({CURSOR_VAR: result_list[-1].pk}) if has_next else None
+        )
+
+
+class ElectionCandidateInline(admin.TabularInline):
+    model = ElectionCandidate
+    extra = 0
+    autocomplete_fields = ('candidate',)
+    ordering = ('ballot_order', 'id')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('candidate')
 
 
 @admin.register(Election)
@@ -10,11 +94,28 @@ class ElectionAdmin(admin.ModelAdmin):
         'start_date',
         'end_date',
         'is_active',
+        'candidate_count',
         'total_votes',
     )
     list_filter = ('is_active', 'start_date', 'end_date')
     search_fields = ('title',)
     ordering = ('-start_date',)
+    inlines = (ElectionCandidateInline,)
+
+    def get_queryset(self, request):
+        # 总票数与名单人数随列表一次查询取出（LEFT JOIN 计票汇总表和名单）
+        return super().get_queryset(request).annotate(
+            vote_total=Coalesce('tally__total_votes', Value(0)),
+            roster_size=Count('roster'),
+        )
+
+    @admin.display(description='候选人数', ordering='roster_size')
+    def candidate_count(self, obj):
+        return obj.roster_size
+
+    @admin.display(description='总票数', ordering='vote_total')
+    def total_votes(self, obj):
+        return obj.vote_total
 
 
 @admin.register(Candidate)
@@ -26,6 +127,7 @@ class CandidateAdmin(admin.ModelAdmin):
         'user',
         'created_at',
     )
+    list_select_related = ('user',)
     search_fields = ('full_name', 'party', 'user__username')
     list_filter = ('party',)
     ordering = ('full_name',)
@@ -41,9 +143,13 @@ class VoteAdmin(admin.ModelAdmin):
         'voted_at',
         'ip_address',
     )
+    list_select_related = ('voter', 'candidate', 'election')
     list_filter = ('election', 'candidate')
-    search_fields = ('voter__username', 'candidate__full_name')
-    ordering = ('-voted_at',)
+    # 用户名精确匹配可以走索引，模糊匹配需要扫描整个投票表
+    search_fields = ('=voter__username', '^candidate__full_name')
+    ordering = ('-id',)
+    show_full_result_count = False
+    change_list_template = 'admin/elections/vote/change_list.html'
 
     readonly_fields = (
         'voter',
@@ -56,3 +162,56 @@ class VoteAdmin(admin.ModelAdmin):
     def has_add_permission(self, request):
         # 禁止管理员手动添加投票
         return False
+
+    def changelist_view(self, request, extra_context=None):
+        # 审计列表只读：GET 请求从只读副本读取，批量删除等 POST 操作仍走主库
+        if request.method != 'GET':
+            return super().changelist_view(request, extra_context)
+        with use_replica(request.user.pk):
+            response = super().changelist_view(request, extra_context)
+            # TemplateResponse 延迟渲染，在副本路由生效期间完成查询
+            if hasattr(response, 'render'):
+                response.render()
+        return response
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        pin_to_primary(request.user.pk)
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        pin_to_primary(request.user.pk)
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        return EstimatedCountPaginator(
+            queryset,
+            per_page,
+            estimate=self.estimate_count(request),
+            orphans=orphans,
+            allow_empty_first_page=allow_empty_first_page,
+        )
+
+    def estimate_count(self, request):
+        """
+        只按选举/候选人过滤时，用计票汇总表得出行数；其他情况返回 None
+        """
+        params = {k: v for k, v in request.GET.items() if k not in (CURSOR_VAR, ORDER_VAR, ALL_VAR, 'p')}
+        election_id = params.pop('election__id__exact', None)
+        candidate_id = params.pop('candidate__id__exact', None)
+        if params.pop(SEARCH_VAR, '') or params:
+            return None
+        try:
+            if candidate_id:
+                qs = CandidateTally.objects.filter(candidate_id=int(candidate_id))
+                if election_id:
+                    qs = qs.filter(election_id=int(election_id))
+                return qs.aggregate(total=Sum('votes'))['total'] or 0
+            qs = ElectionTally.objects.all()
+            if election_id:
+                qs = qs.filter(election_id=int(election_id))
+            return qs.aggregate(total=Sum('total_votes'))['total'] or 0
+        except ValueError:
+            return None
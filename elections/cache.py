@@ -0,0 +1,188 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+from django.core.cache.utils import make_template_fragment_key
+
+from . import metrics
+from .replica import readable_version
+from .results import all_standings, api_standings, election_standings
+
+# 全局版本：任何选举结果或选举/候选人信息变化时都会递增（所有选举的结果汇总使用）
+ALL_ELECTIONS = 'all'
+# 目录版本：选举、候选人或名单变化时递增，投票不递增。
+# 单个选举的版本由本选举版本与目录版本相加得到，其他选举的投票不会使其缓存失效
+CATALOG = 'catalog'
+
+VERSION_KEY = 'elections:results_version:{}'
+STANDINGS_KEY = 'elections:standings:{}:{}'
+ALL_STANDINGS_KEY = 'elections:all_standings:{}'
+API_STANDINGS_KEY = 'elections:api_rows:{}:{}'
+
+# 模板片段缓存（{% cache %} 标签）的名称，按对象 id 区分
+CANDIDATE_FRAGMENTS = ('candidate_card',)
+ELECTION_FRAGMENTS = ('election_deadline',)
+
+
+def get_cache():
+    return caches[getattr(settings, 'RESULTS_CACHE_ALIAS', 'default')]
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+def get_results_version(scope=ALL_ELECTIONS):
+    """
+    返回结果版本号（毫秒时间戳，单调递增）。
+    缓存中没有时以当前时间初始化，保证重启或缓存淘汰后版本不会回退。
+    只读视图从副本读取时返回副本能看到的版本（见 replica.readable_version）。
+    """
+    cache = get_cache()
+    key = VERSION_KEY.format(scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _now_ms(), None)
+        version = cache.get(key)
+    return readable_version(version)
+
+
+def _bump(scopes):
+    cache = get_cache()
+    for scope in scopes:
+        key = VERSION_KEY.format(scope)
+        current = cache.get(key) or 0
+        cache.set(key, max(_now_ms(), current + 1), None)
+
+
+def bump_results_version(*election_ids):
+    """
+    投票成功（事务提交）后递增对应选举及全局的结果版本
+    """
+    _bump((*election_ids, ALL_ELECTIONS))
+
+
+def bump_catalog_version():
+    """
+    选举、候选人或名单变化（事务提交）后递增目录版本，所有选举的结果缓存随之失效
+    """
+    _bump((CATALOG, ALL_ELECTIONS))
+
+
+def combine_versions(election_version, catalog_version):
+    """
+    合并本选举版本与目录版本。两者都单调递增，相加后任一方递增时结果都会变化
+    （取较大者则可能在同一毫秒内的两次递增中丢失一次）
+    """
+    return election_version + catalog_version
+
+
+def election_results_version(election_id):
+    """
+    单个选举的结果版本：本选举的投票或目录变化时改变
+    """
+    return combine_versions(get_results_version(election_id), get_results_version(CATALOG))
+
+
+def version_etag(scope, version, *extra):
+    """
+    根据版本号生成 ETag，extra 用于区分按用户渲染的页面
+    """
+    parts = [str(scope), str(version), *[str(e) for e in extra]]
+    return '"{}"'.format('-'.join(parts))
+
+
+def cached_election_standings(election):
+    """
+    从缓存读取单个选举的排名表，返回 (standings, total_votes, version)
+    """
+    cache = get_cache()
+    version = election_results_version(election.id)
+    key = STANDINGS_KEY.format(election.id, version)
+    data = cache.get(key)
+    if data is None:
+        metrics.inc('voting_results_cache_requests_total', result='miss')
+        data = election_standings(election)
+        cache.set(key, data, getattr(settings, 'RESULTS_CACHE_TIMEOUT', 300))
+    else:
+        metrics.inc('voting_results_cache_requests_total', result='hit')
+    standings, total_votes = data
+    return standings, total_votes, version
+
+
+def cached_all_standings(elections):
+    """
+    从缓存读取所有选举的结果，返回 (results_data, version)
+    """
+    cache = get_cache()
+    version = get_results_version()
+    key = ALL_STANDINGS_KEY.format(version)
+    data = cache.get(key)
+    if data is None:
+        metrics.inc('voting_results_cache_requests_total', result='miss')
+        data = all_standings(elections)
+        cache.set(key, data, getattr(settings, 'RESULTS_CACHE_TIMEOUT', 300))
+    else:
+        metrics.inc('voting_results_cache_requests_total', result='hit')
+    return data, version
+
+
+def cached_api_standings(election_ids):
+    """
+    批量读取多个选举的结果接口数据，返回 {election_id: (rows, total_votes, version)}。
+    版本号和排名表各用一次 get_many 读取，未命中的选举用一次分组查询一起计算。
+    """
+    cache = get_cache()
+    election_ids = list(election_ids)
+    scopes = [*election_ids, CATALOG]
+    stored = cache.get_many([VERSION_KEY.format(scope) for scope in scopes])
+    versions = {}
+    for scope in scopes:
+        version = stored.get(VERSION_KEY.format(scope))
+        versions[scope] = readable_version(version) if version is not None else get_results_version(scope)
+    combined = {
+        election_id: combine_versions(versions[election_id], versions[CATALOG])
+        for election_id in election_ids
+    }
+    keys = {
+        election_id: API_STANDINGS_KEY.format(election_id, combined[election_id])
+        for election_id in election_ids
+    }
+
+    cached = cache.get_many(list(keys.values()))
+    missing = [election_id for election_id, key in keys.items() if key not in cached]
+    if missing:
+        computed = api_standings(missing)
+        cache.set_many(
+            {keys[election_id]: computed[election_id] for election_id in missing},
+            getattr(settings, 'RESULTS_CACHE_TIMEOUT', 300),
+        )
+        cached.update({keys[election_id]: computed[election_id] for election_id in missing})
+    for result, count in (('miss', len(missing)), ('hit', len(election_ids) - len(missing))):
+        if count:
+            metrics.inc('voting_results_cache_requests_total', count, result=result)
+
+    return {
+        election_id: (*cached[key], combined[election_id])
+        for election_id, key in keys.items()
+    }
+
+
+def get_fragment_cache():
+    """
+    {% cache %} 标签使用的缓存：配置了 template_fragments 时使用它，否则使用默认缓存
+    """
+    try:
+        return caches['template_fragments']
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+def invalidate_fragments(names, object_id):
+    """
+    删除某个对象的模板片段缓存（候选人或选举保存/删除时调用）
+    """
+    get_fragment_cache().delete_many(
+        [make_template_fragment_key(name, [object_id]) for name in names]
+    )
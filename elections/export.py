@@ -0,0 +1,104 @@
+import csv
+import json
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.db.models import Q
+
+from .models import Candidate, Vote
+
+FORMATS = ('csv', 'ndjson')
+COLUMNS = ['id', 'voter_id', 'voter', 'candidate_id', 'candidate', 'voted_at', 'ip_address']
+
+
+class _Echo:
+    """
+    csv.writer 的伪文件对象：write 直接返回该行文本
+    """
+
+    def write(self, value):
+        return value
+
+
+def vote_rows(election, chunk_size=2000):
+    """
+    逐行产出选举的投票记录（按 id 顺序），内存占用与选举规模无关。
+    只查询所需字段并连接 auth_user 取用户名；候选人姓名预先一次查出（名单及有计票的候选人）。
+    """
+    names = dict(
+        Candidate.objects.filter(
+            Q(roster_entries__election=election) | Q(tallies__election=election)
+        ).values_list('id', 'full_name')
+    )
+    rows = (
+        Vote.objects.filter(election_id=election.id)
+        .order_by('id')
+        .values_list('id', 'voter_id', 'voter__username', 'candidate_id', 'voted_at', 'ip_address')
+        .iterator(chunk_size=chunk_size)
+    )
+    for vote_id, voter_id, username, candidate_id, voted_at, ip_address in rows:
+        yield [
+            vote_id,
+            voter_id,
+            username,
+            candidate_id,
+            names.get(candidate_id, ''),
+            voted_at.isoformat(),
+            ip_address or '',
+        ]
+
+
+def export_chunks(election, fmt='csv', chunk_size=2000):
+    """
+    以 CSV 或 NDJSON 文本块的形式产出投票记录，每块约 chunk_size 行
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f'不支持的导出格式: {fmt}')
+
+    if fmt == 'csv':
+        writer = csv.writer(_Echo())
+        encode = writer.writerow
+        yield encode(COLUMNS)
+    else:
+        def encode(row):
+            return json.dumps(dict(zip(COLUMNS, row)), ensure_ascii=False) + '\n'
+
+    lines = []
+    for row in vote_rows(election, chunk_size):
+        lines.append(encode(row))
+        if len(lines) >= chunk_size:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+def gzip_chunks(chunks, level=6):
+    """
+    边生成边压缩为 gzip 格式
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+async def async_chunks(chunks):
+    """
+    在 ASGI 下逐块产出同步生成器的内容。
+    StreamingHttpResponse 遇到同步迭代器时会先用 sync_to_async(list) 读完全部内容再发送，
+    这里每次只在同步线程中取下一块，导出的内存占用仍与选举规模无关。
+    数据库游标只能在创建它的线程中使用，因此始终使用同一个同步线程（thread_sensitive）。
+    """
+    done = object()
+    next_chunk = sync_to_async(next)
+    try:
+        while True:
+            chunk = await next_chunk(chunks, done)
+            if chunk is done:
+                break
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close)()
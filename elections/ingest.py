@@ -0,0 +1,230 @@
+import queue
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+
+from .models import Vote
+from .tallies import record_votes
+
+DEFAULTS = {
+    'ENABLED': False,
+    'BATCH_SIZE': 200,
+    'MAX_WAIT_MS': 10,
+    'QUEUE_SIZE': 10000,
+    'SUBMIT_TIMEOUT': 5,
+}
+
+
+def get_ingest_settings():
+    return {**DEFAULTS, **getattr(settings, 'VOTE_INGEST', {})}
+
+
+def ingest_enabled():
+    return get_ingest_settings()['ENABLED']
+
+
+class IngestUnavailable(Exception):
+    """
+    队列已满、写入超时（选票已从队列撤回）或批次提交失败，调用方应返回 503 让客户端重试
+    """
+
+
+class IngestPending(Exception):
+    """
+    等待超时时选票已在提交中的批次里，无法撤回：结果未知，调用方应返回 202，
+    之后由已投票检查（数据库唯一约束）确定这张选票是否生效
+    """
+
+
+class Ballot:
+    """
+    等待批量写入的选票
+    """
+    __slots__ = (
+        'voter_id', 'election_id', 'candidate_id', 'ip_address',
+        'done', 'accepted', 'error', 'claimed', 'cancelled',
+    )
+
+    def __init__(self, voter_id, election_id, candidate_id, ip_address=None):
+        self.voter_id = voter_id
+        self.election_id = election_id
+        self.candidate_id = candidate_id
+        self.ip_address = ip_address
+        self.done = threading.Event()
+        self.accepted = False
+        self.error = None
+        # claimed：写入线程已把选票放入待提交批次；cancelled：请求线程等待超时后撤回
+        self.claimed = False
+        self.cancelled = False
+
+
+def flush_ballots(ballots):
+    """
+    在一个事务内写入一批选票并更新计票表。
+    已投过票（数据库中已存在或同一批次内重复）的选票标记为未接受。
+    """
+    voter_ids = {b.voter_id for b in ballots}
+    election_ids = {b.election_id for b in ballots}
+
+    # 查重放在事务之外，使事务以写操作开始：SQLite 的延迟事务由读锁升级为写锁时
+    # 不会等待 busy_timeout，而是直接报 "database is locked"。
+    # 查重与写入之间的并发冲突由唯一约束兜底（IntegrityError）。
+    seen = set(
+        Vote.objects.filter(voter_id__in=voter_ids, election_id__in=election_ids)
+        .values_list('voter_id', 'election_id')
+    )
+    accepted = []
+    votes = []
+    counts = Counter()
+    for ballot in ballots:
+        key = (ballot.voter_id, ballot.election_id)
+        if key in seen:
+            continue
+        seen.add(key)
+        accepted.append(ballot)
+        counts[(ballot.election_id, ballot.candidate_id)] += 1
+        votes.append(Vote(
+            voter_id=ballot.voter_id,
+            election_id=ballot.election_id,
+            candidate_id=ballot.candidate_id,
+            ip_address=ballot.ip_address,
+        ))
+
+    with transaction.atomic():
+        Vote.objects.bulk_create(votes)
+        record_votes(counts)
+
+    for ballot in accepted:
+        ballot.accepted = True
+    return len(votes)
+
+
+class VoteIngestor:
+    """
+    分组提交的投票写入管道。
+    请求线程把选票放入有界队列并等待；后台写入线程按 batch_size 或 max_wait 攒批，
+    一个事务提交整批选票后再逐一通知请求线程。
+    """
+
+    def __init__(self, batch_size=200, max_wait=0.01, queue_size=10000):
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.batches = 0
+        self.ballots = 0
+        self._thread = None
+        self._lock = threading.Lock()
+        # 保护 Ballot.claimed / cancelled：一张选票要么被写入线程认领，要么被请求线程撤回
+        self._claim_lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='vote-ingestor', daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, voter_id, election_id, candidate_id, ip_address=None, timeout=5):
+        """
+        提交选票并等待所在批次提交，返回是否被接受（False 表示已投过票）。
+        超时时尚未进入批次的选票被撤回并抛出 IngestUnavailable；
+        已进入批次的选票无法撤回，抛出 IngestPending。
+        """
+        self.start()
+        ballot = Ballot(voter_id, election_id, candidate_id, ip_address)
+        try:
+            self.queue.put(ballot, timeout=timeout)
+        except queue.Full:
+            raise IngestUnavailable('投票队列已满')
+        if not ballot.done.wait(timeout):
+            with self._claim_lock:
+                if not ballot.claimed:
+                    ballot.cancelled = True
+            if ballot.cancelled:
+                raise IngestUnavailable('投票写入超时')
+            raise IngestPending('投票正在写入')
+        if ballot.error is not None:
+            # 同一批次的所有等待者共享写入线程的异常，每个等待者抛出各自的新异常
+            raise IngestUnavailable('投票写入失败') from ballot.error
+        return ballot.accepted
+
+    def _claim(self, batch):
+        """
+        认领批次中的选票，丢弃等待超时后已撤回的选票
+        """
+        claimed = []
+        with self._claim_lock:
+            for ballot in batch:
+                if not ballot.cancelled:
+                    ballot.claimed = True
+                    claimed.append(ballot)
+        return claimed
+
+    def _collect(self):
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._claim(self._collect())
+            if not batch:
+                continue
+            close_old_connections()
+            try:
+                try:
+                    flush_ballots(batch)
+                except IntegrityError:
+                    # 其他进程并发写入导致整批冲突时，逐张重试
+                    for ballot in batch:
+                        try:
+                            flush_ballots([ballot])
+                        except IntegrityError:
+                            pass
+            except Exception as exc:
+                for ballot in batch:
+                    ballot.accepted = False
+                    ballot.error = exc
+            self.batches += 1
+            self.ballots += len(batch)
+            for ballot in batch:
+                ballot.done.set()
+
+
+_ingestor = None
+_ingestor_lock = threading.Lock()
+
+
+def get_ingestor():
+    global _ingestor
+    with _ingestor_lock:
+        if _ingestor is None:
+            options = get_ingest_settings()
+            _ingestor = VoteIngestor(
+                batch_size=options['BATCH_SIZE'],
+                max_wait=options['MAX_WAIT_MS'] / 1000,
+                queue_size=options['QUEUE_SIZE'],
+            )
+        return _ingestor
+
+
+def submit_vote(voter_id, election_id, candidate_id, ip_address=None):
+    """
+    通过分组提交管道写入一张选票
+    """
+    return get_ingestor().submit(
+        voter_id, election_id, candidate_id, ip_address,
+        timeout=get_ingest_settings()['SUBMIT_TIMEOUT'],
+    )
@@ -0,0 +1,117 @@
+import asyncio
+import json
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from .cache import cached_election_standings, election_results_version
+from .models import Election
+
+
+def build_update(election):
+    """
+    生成推送给客户端的精简结果（与 api_results 的字段保持一致）
+    """
+    standings, total_votes, version = cached_election_standings(election)
+    return {
+        'success': True,
+        'election_id': election.id,
+        'version': version,
+        'total_votes': total_votes,
+        'results': [
+            {
+                'id': row['candidate'].id,
+                'votes': row['vote_count'],
+                'percentage': round(row['percentage'], 2),
+                'rank': row['rank'],
+            }
+            for row in standings
+        ],
+        'timestamp': timezone.now().strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+class ResultsBroadcaster:
+    """
+    实时结果广播器。
+    每个进程中每个选举只有一个后台任务检查结果版本，
+    版本变化时只计算一次结果，再分发给该选举的所有订阅者。
+    """
+
+    def __init__(self, interval=None, queue_size=8):
+        self.interval = interval or getattr(settings, 'LIVE_RESULTS_INTERVAL', 0.5)
+        self.queue_size = queue_size
+        self._subscribers = defaultdict(set)
+        self._latest = {}
+        self._tasks = {}
+
+    def subscribe(self, election_id):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[election_id].add(queue)
+        # 新订阅者立即收到最近一次结果
+        if election_id in self._latest:
+            queue.put_nowait(self._latest[election_id])
+        task = self._tasks.get(election_id)
+        if task is None or task.done():
+            self._tasks[election_id] = asyncio.get_running_loop().create_task(
+                self._watch(election_id)
+            )
+        return queue
+
+    def unsubscribe(self, election_id, queue):
+        self._subscribers[election_id].discard(queue)
+
+    def subscriber_count(self, election_id):
+        return len(self._subscribers[election_id])
+
+    def publish(self, election_id, update):
+        self._latest[election_id] = update
+        for queue in list(self._subscribers[election_id]):
+            if queue.full():
+                # 客户端处理过慢时丢弃最旧的更新，只保留最新结果
+                queue.get_nowait()
+            queue.put_nowait(update)
+
+    async def _watch(self, election_id):
+        election = await Election.objects.aget(id=election_id)
+        last_version = None
+        try:
+            while self._subscribers[election_id]:
+                version = await sync_to_async(election_results_version)(election_id)
+                if version != last_version:
+                    update = await sync_to_async(build_update)(election)
+                    last_version = update['version']
+                    self.publish(election_id, update)
+                await asyncio.sleep(self.interval)
+        finally:
+            self._tasks.pop(election_id, None)
+            self._latest.pop(election_id, None)
+
+
+broadcaster = ResultsBroadcaster()
+
+
+async def event_stream(election_id, max_age=None, keepalive=15):
+    """
+    SSE 事件流。连接最长保持 max_age 秒后结束，由浏览器的 EventSource 自动重连，
+    以免客户端断开后残留的连接长期占用资源。
+    """
+    if max_age is None:
+        max_age = getattr(settings, 'LIVE_RESULTS_MAX_AGE', 300)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_age
+    queue = broadcaster.subscribe(election_id)
+    try:
+        yield 'retry: 3000\n\n'
+        while loop.time() < deadline:
+            try:
+                update = await asyncio.wait_for(queue.get(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            data = json.dumps(update, ensure_ascii=False, separators=(',', ':'))
+            yield f"id: {update['version']}\nevent: results\ndata: {data}\n\n"
+    finally:
+        broadcaster.unsubscribe(election_id, queue)
@@ -0,0 +1,163 @@
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from elections.models import Election
+
+
+class InFlight:
+    """
+    统计同时处于处理中的请求数峰值
+    """
+
+    def __init__(self):
+        self.current = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def enter(self):
+        with self._lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+
+    def exit(self):
+        with self._lock:
+            self.current -= 1
+
+
+class Command(BaseCommand):
+    help = (
+        '对比异步视图（ASGI 处理器）与同步视图（固定大小线程池）在大量并发连接下的表现（JSON）：'
+        '同时处理中的请求数、处理请求的线程数、吞吐量和延迟。'
+        '两种模式都用进程内测试客户端直接调用 Django 处理器，不经过网络服务器'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clients', type=int, nargs='+', default=[8, 64, 256],
+            help='并发客户端（连接）数，可给出多个',
+        )
+        parser.add_argument('--requests-per-client', type=int, default=10, help='每个客户端顺序发出的请求数')
+        parser.add_argument('--threads', type=int, default=8, help='WSGI 线程池大小')
+        parser.add_argument('--worker', choices=['wsgi', 'asgi'], help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if not Election.objects.exists():
+            raise CommandError('没有选举数据，请先运行 create_sample_data')
+
+        if options['worker']:
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                report = self.run_worker(options)
+            self.stdout.write(json.dumps(report))
+            return
+
+        # 两种模式分别在子进程中运行：URL 配置在导入时根据 ASYNC_VIEWS 选择视图
+        report = {
+            'clients': options['clients'],
+            'requests_per_client': options['requests_per_client'],
+            'wsgi_threads': options['threads'],
+            # 两种模式都是进程内的测试客户端（django.test.Client / AsyncClient），
+            # 没有 HTTP 服务器和套接字开销，数值只用于比较两种视图的并发特性
+            'transport': 'in-process test client',
+        }
+        for mode in ('wsgi', 'asgi'):
+            env = {**os.environ, 'VOTING_ASYNC_VIEWS': '1' if mode == 'asgi' else '0'}
+            args = [
+                # 通过 call_command 或 python -m django 运行时 sys.argv[0] 不是 manage.py
+                sys.executable, str(settings.BASE_DIR / 'manage.py'), 'asgi_bench', '--worker', mode,
+                '--threads', str(options['threads']),
+                '--requests-per-client', str(options['requests_per_client']),
+                '--clients', *[str(c) for c in options['clients']],
+            ]
+            output = subprocess.run(args, env=env, capture_output=True, text=True, check=True).stdout
+            report[mode] = json.loads(output)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def run_worker(self, options):
+        url = reverse('elections:api_results')
+        results = []
+        for clients in options['clients']:
+            if options['worker'] == 'wsgi':
+                results.append(self.run_wsgi(url, clients, options))
+            else:
+                results.append(asyncio.run(self.run_asgi(url, clients, options)))
+        return results
+
+    def run_wsgi(self, url, clients, options):
+        # 模拟 WSGI 服务器的线程池：每个客户端线程只代表一个等待中的连接，
+        # 请求由固定大小的线程池通过 django.test.Client 处理
+        inflight = InFlight()
+        latencies = []
+        local = threading.local()
+
+        def handle():
+            client = getattr(local, 'client', None)
+            if client is None:
+                client = local.client = Client()
+            inflight.enter()
+            try:
+                return client.get(url).status_code
+            finally:
+                inflight.exit()
+
+        def client_loop(pool):
+            for _ in range(options['requests_per_client']):
+                started = time.perf_counter()
+                pool.submit(handle).result()
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            with ThreadPoolExecutor(max_workers=clients) as connections:
+                list(connections.map(lambda _: client_loop(pool), range(clients)))
+        # 处理请求的线程只有线程池中的 threads 个（客户端线程只负责等待）
+        return summarize(clients, latencies, time.perf_counter() - started, inflight, options['threads'])
+
+    async def run_asgi(self, url, clients, options):
+        inflight = InFlight()
+        latencies = []
+        client = AsyncClient()
+
+        async def client_loop():
+            for _ in range(options['requests_per_client']):
+                started = time.perf_counter()
+                inflight.enter()
+                try:
+                    await client.get(url)
+                finally:
+                    inflight.exit()
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*[client_loop() for _ in range(clients)])
+        # 事件循环线程 + asgiref 执行同步代码的线程（此模式下没有其他线程）
+        threads = threading.active_count()
+        return summarize(clients, latencies, time.perf_counter() - started, inflight, threads)
+
+
+def summarize(clients, latencies, duration, inflight, handler_threads):
+    latencies.sort()
+
+    def pct(p):
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))] * 1000, 2)
+
+    return {
+        'clients': clients,
+        'requests': len(latencies),
+        'throughput_rps': round(len(latencies) / duration, 1),
+        'p50_ms': pct(50),
+        'p95_ms': pct(95),
+        'peak_in_flight': inflight.peak,
+        'handler_threads': handler_threads,
+    }
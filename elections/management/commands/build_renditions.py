@@ -0,0 +1,47 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from elections.models import Candidate
+from elections.renditions import build_renditions, get_rendition_settings
+
+
+class Command(BaseCommand):
+    help = '为已有的候选人照片补生成缩略图（缺失或照片已更换的）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--candidate',
+            type=int,
+            action='append',
+            dest='candidates',
+            help='只处理指定候选人（可重复）',
+        )
+        parser.add_argument('--force', action='store_true', help='重新生成全部缩略图')
+        parser.add_argument('--workers', type=int, help='并行线程数（默认 PHOTO_RENDITIONS["WORKERS"]）')
+
+    def handle(self, *args, **options):
+        candidates = Candidate.objects.exclude(photo='').exclude(photo__isnull=True)
+        if options['candidates']:
+            candidates = candidates.filter(id__in=options['candidates'])
+        ids = list(candidates.order_by('id').values_list('id', flat=True))
+        workers = options['workers'] or get_rendition_settings()['WORKERS']
+
+        def build(candidate_id):
+            try:
+                return build_renditions(candidate_id, force=options['force'])
+            finally:
+                close_old_connections()
+
+        # 缩放和编码时 Pillow 会释放 GIL，线程可以并行
+        if workers > 1 and len(ids) > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(build, ids))
+        else:
+            results = [build_renditions(candidate_id, force=options['force']) for candidate_id in ids]
+
+        updated = sum(results)
+        self.stdout.write(self.style.SUCCESS(
+            f'已处理 {len(ids)} 位候选人的照片，生成 {updated} 组缩略图'
+        ))
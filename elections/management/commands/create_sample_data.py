@@ -1,13 +1,73 @@
-from django.core.management.base import BaseCommand
-from elections.models import Candidate, Election, Vote
+import contextlib
+import itertools
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from elections.models import Candidate, Election, ElectionCandidate, Vote
+from elections.tallies import rebuild_tallies
 from django.contrib.auth.models import User
 from django.utils import timezone
 from datetime import datetime, timedelta
 
+PARTIES = ['民主党', '共和党', '独立候选人', '绿党', '自由党']
+COLORS = ['#1e3a8a', '#dc2626', '#6b7280', '#16a34a', '#f59e0b', '#7c3aed']
+
+
+def insert_rows(model, columns, rows):
+    """
+    直接以 executemany 批量插入，绕过逐行构造模型实例和字段预处理，
+    是生成百万级数据的主要开销所在
+    """
+    qn = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        qn(model._meta.db_table),
+        ', '.join(qn(c) for c in columns),
+        ', '.join(['%s'] * len(columns)),
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+@contextlib.contextmanager
+def fast_sqlite_writes():
+    """
+    批量生成数据期间关闭 SQLite 同步写盘（仅影响当前连接）
+    """
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        # 事务内不允许修改 synchronous
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA synchronous')
+        previous = cursor.fetchone()[0]
+        cursor.execute('PRAGMA synchronous = OFF')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA synchronous = {previous}')
+
+
 class Command(BaseCommand):
-    help = '创建示例选举数据'
-    
-    def handle(self, *args, **kwargs):
+    help = '创建示例选举数据；指定 --elections/--candidates/--voters/--votes 时批量生成大规模合成数据'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--elections', type=int, default=0, help='生成的选举数量')
+        parser.add_argument('--candidates', type=int, default=0, help='生成的候选人数量')
+        parser.add_argument('--voters', type=int, default=0, help='生成的投票人数量')
+        parser.add_argument('--votes', type=int, default=0, help='生成的投票总数（分摊到各选举）')
+        parser.add_argument('--batch-size', type=int, default=5000, help='bulk_create 每批行数')
+        parser.add_argument('--skew', type=float, default=1.2, help='得票分布的 Zipf 指数，越大越集中')
+        parser.add_argument('--seed', type=int, help='随机数种子，便于复现')
+
+    def handle(self, *args, **options):
+        if any(options[k] for k in ('elections', 'candidates', 'voters', 'votes')):
+            self.generate(options)
+            return
+
         # 创建选举
         election, created = Election.objects.get_or_create(
             title="2023年总统选举",
@@ -49,7 +109,7 @@ class Command(BaseCommand):
             }
         ]
         
-        for data in candidates_data:
+        for position, data in enumerate(candidates_data, start=1):
             user, created = User.objects.get_or_create(
                 username=data['username'],
                 defaults={
@@ -73,9 +133,144 @@ class Command(BaseCommand):
                 }
             )
             
+            ElectionCandidate.objects.get_or_create(
+                election=election,
+                candidate=candidate,
+                defaults={'ballot_order': position},
+            )
+
             if created:
                 self.stdout.write(self.style.SUCCESS(f"创建候选人 {data['full_name']} 成功"))
             else:
                 self.stdout.write(self.style.SUCCESS(f"候选人 {data['full_name']} 已存在"))
         
-        self.stdout.write(self.style.SUCCESS('示例数据创建完成'))
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS('示例数据创建完成'))
+
+    def generate(self, options):
+        """
+        流式批量生成大规模数据：按 batch_size 分批写入，所有用户共用一个预先计算的密码哈希，
+        投票按 Zipf 分布偏向少数候选人，投票时间集中在选举前期并逐渐回落。
+        """
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        n_elections = max(options['elections'], 1)
+        n_candidates = max(options['candidates'], 2)
+        n_votes = options['votes']
+        n_voters = options['voters'] or -(-n_votes // n_elections)
+        if n_votes > n_voters * n_elections:
+            raise CommandError('--votes 不能超过 --voters × --elections（每人每场只能投一票）')
+
+        started = time.monotonic()
+        run = timezone.now().strftime('%Y%m%d%H%M%S')
+        password = make_password('password123')
+
+        with fast_sqlite_writes():
+            elections = self.generate_elections(run, n_elections)
+            candidates = self.generate_candidates(run, n_candidates, password)
+            ElectionCandidate.objects.bulk_create([
+                ElectionCandidate(election=election, candidate=candidate, ballot_order=position)
+                for election in elections
+                for position, candidate in enumerate(candidates, start=1)
+            ])
+            voter_ids = self.generate_voters(run, n_voters, password, batch_size)
+            self.stdout.write(f'已生成 {len(voter_ids)} 名投票人 ({time.monotonic() - started:.1f}s)')
+
+            # 各选举分摊票数
+            per_election = [n_votes // n_elections] * n_elections
+            for i in range(n_votes % n_elections):
+                per_election[i] += 1
+
+            total = 0
+            for election, count in zip(elections, per_election):
+                total += self.generate_votes(
+                    election, candidates, voter_ids, count, batch_size,
+                    options['skew'], rng
+                )
+                self.stdout.write(f'{election.title}: {count} 票 ({time.monotonic() - started:.1f}s)')
+
+            rebuild_tallies([e.id for e in elections])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'生成 {n_elections} 个选举、{n_candidates} 位候选人、{n_voters} 名投票人、'
+            f'{total} 张选票，用时 {time.monotonic() - started:.1f}s'
+        ))
+
+    def generate_elections(self, run, count):
+        now = timezone.now()
+        elections = []
+        for i in range(count):
+            start = now - timedelta(days=30 * (count - i))
+            elections.append(Election(
+                title=f'合成选举 {run}-{i + 1}',
+                description='由 create_sample_data 生成',
+                start_date=start,
+                end_date=start + timedelta(days=7),
+                is_active=(i == count - 1),
+            ))
+        return Election.objects.bulk_create(elections)
+
+    def generate_candidates(self, run, count, password):
+        users = User.objects.bulk_create([
+            User(username=f'cand_{run}_{i}', first_name=f'候选人{i + 1}', password=password)
+            for i in range(count)
+        ])
+        return Candidate.objects.bulk_create([
+            Candidate(
+                user=user,
+                full_name=user.first_name,
+                party=PARTIES[i % len(PARTIES)],
+                bio='合成候选人简介',
+                program='合成竞选纲领',
+                color=COLORS[i % len(COLORS)],
+            )
+            for i, user in enumerate(users)
+        ])
+
+    def generate_voters(self, run, count, password, batch_size):
+        date_joined = connection.ops.adapt_datetimefield_value(timezone.now())
+        columns = [
+            'username', 'password', 'first_name', 'last_name', 'email',
+            'is_superuser', 'is_staff', 'is_active', 'date_joined',
+        ]
+        for offset in range(0, count, batch_size):
+            insert_rows(User, columns, [
+                (f'voter_{run}_{i}', password, '', '', '', False, False, True, date_joined)
+                for i in range(offset, min(offset + batch_size, count))
+            ])
+        return list(
+            User.objects.filter(username__startswith=f'voter_{run}_')
+            .order_by('id')
+            .values_list('id', flat=True)
+        )
+
+    def generate_votes(self, election, candidates, voter_ids, count, batch_size, skew, rng):
+        # Zipf 权重，每场选举随机打乱领先者
+        weights = [1 / (rank + 1) ** skew for rank in range(len(candidates))]
+        rng.shuffle(weights)
+        cum_weights = list(itertools.accumulate(weights))
+        candidate_ids = [c.id for c in candidates]
+
+        window = (election.end_date - election.start_date).total_seconds()
+        # 按数据库存储格式预先换算起始时间，逐行只做加法
+        start = connection.ops.adapt_datetimefield_value(election.start_date)
+        if isinstance(start, str):
+            start = datetime.fromisoformat(start)
+        # 按 id 顺序插入，使 (voter, election) 唯一索引顺序增长
+        voters = sorted(rng.sample(voter_ids, count))
+        columns = ['voter_id', 'candidate_id', 'election_id', 'voted_at', 'ip_address']
+
+        for offset in range(0, count, batch_size):
+            chunk = voters[offset:offset + batch_size]
+            chosen = rng.choices(candidate_ids, cum_weights=cum_weights, k=len(chunk))
+            insert_rows(Vote, columns, [
+                (
+                    voter_id,
+                    candidate_id,
+                    election.id,
+                    # 投票集中在开始后不久，随后逐渐减少
+                    str(start + timedelta(seconds=window * rng.betavariate(1.3, 3))),
+                    f'10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}',
+                )
+                for voter_id, candidate_id in zip(chunk, chosen)
+            ])
+        return count
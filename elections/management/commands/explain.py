@@ -0,0 +1,87 @@
+import re
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+
+from elections.models import CandidateTally, Election, Vote
+
+# SQLite 计划中对投票表的全表扫描（“SCAN elections_vote USING ... INDEX” 不算）
+FULL_SCAN = re.compile(r'\bSCAN (?:TABLE )?elections_vote\b(?! USING)')
+
+
+def build_queries(election_id):
+    """
+    结果与审计相关的主要查询，名称 -> QuerySet
+    """
+    votes = Vote.objects.order_by().filter(election_id=election_id)
+    return {
+        'results_from_votes': (
+            votes.values_list('election_id', 'candidate_id').annotate(n=Count('id'))
+        ),
+        'results_from_tallies': (
+            CandidateTally.objects.filter(election_id=election_id)
+            .values_list('election_id', 'candidate_id', 'votes')
+        ),
+        'turnout_timeline': (
+            votes.filter(voted_at__gte=timezone.now() - timedelta(hours=1))
+            .order_by('voted_at').values_list('voted_at', flat=True)
+        ),
+        'ip_audit': votes.filter(ip_address='127.0.0.1').values_list('voter_id', 'voted_at'),
+        'ip_summary': (
+            votes.exclude(ip_address=None).values('ip_address')
+            .annotate(n=Count('id')).filter(n__gt=1)
+        ),
+        'duplicate_check': votes.filter(voter_id=1).values('id')[:1],
+    }
+
+
+class Command(BaseCommand):
+    help = '输出结果与审计查询的执行计划，可选计时；--check 时发现投票表全表扫描即失败'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--election', type=int, help='选举 ID（默认取票数最多的选举）')
+        parser.add_argument('--timing', action='store_true', help='执行每个查询并输出耗时')
+        parser.add_argument('--repeat', type=int, default=5, help='计时重复次数（取中位数）')
+        parser.add_argument('--check', action='store_true', help='存在全表扫描时返回错误')
+
+    def handle(self, *args, **options):
+        election_id = options['election'] or self.default_election()
+        if election_id is None:
+            raise CommandError('没有选举数据')
+
+        regressions = []
+        for name, queryset in build_queries(election_id).items():
+            plan = queryset.explain()
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(plan)
+            if options['timing']:
+                self.stdout.write(f'耗时中位数: {self.time_query(queryset, options["repeat"]):.2f} ms')
+            self.stdout.write('')
+            if connection.vendor == 'sqlite' and FULL_SCAN.search(plan):
+                regressions.append(name)
+
+        if regressions:
+            message = '以下查询对投票表做了全表扫描: ' + ', '.join(regressions)
+            if options['check']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+
+    def default_election(self):
+        election = (
+            Election.objects.order_by('-tally__total_votes', 'id')
+            .values_list('id', flat=True).first()
+        )
+        return election
+
+    def time_query(self, queryset, repeat):
+        samples = []
+        for _ in range(max(1, repeat)):
+            started = time.perf_counter()
+            list(queryset.all())
+            samples.append((time.perf_counter() - started) * 1000)
+        return statistics.median(samples)
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from elections.export import FORMATS, export_chunks, gzip_chunks
+from elections.models import Election
+
+
+class Command(BaseCommand):
+    help = '流式导出某个选举的全部投票记录（CSV 或 NDJSON，可选 gzip），内存占用与选举规模无关'
+
+    def add_arguments(self, parser):
+        parser.add_argument('election', type=int, help='选举 ID')
+        parser.add_argument('--format', choices=FORMATS, default='csv', help='导出格式')
+        parser.add_argument('--output', help='输出文件（默认标准输出）')
+        parser.add_argument('--gzip', action='store_true', help='以 gzip 压缩输出')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='每次从数据库读取的行数')
+
+    def handle(self, *args, **options):
+        try:
+            election = Election.objects.get(pk=options['election'])
+        except Election.DoesNotExist:
+            raise CommandError(f"选举 {options['election']} 不存在")
+
+        chunks = export_chunks(election, options['format'], options['chunk_size'])
+        # 输出到文件或二进制标准输出时写 UTF-8 字节；
+        # stdout 是文本流（如 call_command(stdout=StringIO())）时直接写文本
+        stream = None if options['output'] else getattr(self.stdout, 'buffer', None)
+        if not options['output'] and stream is None:
+            if options['gzip']:
+                raise CommandError('标准输出不是二进制流，--gzip 须配合 --output 使用')
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+
+        if options['gzip']:
+            chunks = gzip_chunks(chunks)
+        else:
+            chunks = (chunk.encode('utf-8') for chunk in chunks)
+
+        if options['output']:
+            with open(options['output'], 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+        else:
+            for chunk in chunks:
+                stream.write(chunk)
+            stream.flush()
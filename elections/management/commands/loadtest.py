@@ -0,0 +1,229 @@
+import json
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections, connection
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from elections.ingest import get_ingestor, get_ingest_settings
+from elections.middleware import QueryCounter
+from elections.models import Candidate, Election, ElectionCandidate
+from elections.replica import ReplicaRefresher, refresh_replica, replica_alias
+
+
+class Command(BaseCommand):
+    help = '并发压测投票与结果接口，输出吞吐量、延迟分位数、每请求 SQL 数及锁冲突（JSON）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--voters', type=int, default=200, help='合成投票人数（每人投一票）')
+        parser.add_argument('--reads', type=int, default=400, help='结果接口读取次数')
+        parser.add_argument('--concurrency', type=int, default=8, help='并发线程数')
+        parser.add_argument('--candidates', type=int, default=3, help='合成候选人数')
+        parser.add_argument(
+            '--group-commit',
+            action='store_true',
+            help='启用分组提交写入管道（VOTE_INGEST）',
+        )
+        parser.add_argument('--keep', action='store_true', help='保留生成的测试数据')
+        parser.add_argument('--output', help='将 JSON 结果写入文件')
+
+    def handle(self, *args, **options):
+        run_id = uuid.uuid4().hex[:8]
+        election, candidates, voters = self.create_fixtures(run_id, options)
+
+        ingest = {**get_ingest_settings(), 'ENABLED': options['group_commit']}
+        try:
+            with override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                VOTE_INGEST=ingest,
+            ):
+                report = self.run(election, candidates, voters, options)
+        finally:
+            if not options['keep']:
+                self.cleanup(run_id, election)
+
+        report['run_id'] = run_id
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output)
+        self.stdout.write(output)
+
+    def create_fixtures(self, run_id, options):
+        # 所有合成用户共用一个预先计算的密码哈希
+        password = make_password(None)
+        election = Election.objects.create(
+            title=f'压测选举 {run_id}',
+            description='loadtest',
+            start_date=timezone.now() - timedelta(hours=1),
+            end_date=timezone.now() + timedelta(days=1),
+            is_active=True,
+        )
+        candidate_users = User.objects.bulk_create([
+            User(username=f'loadtest_{run_id}_c{i}', password=password)
+            for i in range(options['candidates'])
+        ])
+        candidates = Candidate.objects.bulk_create([
+            Candidate(user=user, full_name=user.username, bio='', program='')
+            for user in candidate_users
+        ])
+        ElectionCandidate.objects.bulk_create([
+            ElectionCandidate(election=election, candidate=candidate, ballot_order=position)
+            for position, candidate in enumerate(candidates, start=1)
+        ])
+        voters = User.objects.bulk_create([
+            User(username=f'loadtest_{run_id}_v{i}', password=password)
+            for i in range(options['voters'])
+        ], batch_size=1000)
+        return election, candidates, voters
+
+    def cleanup(self, run_id, election):
+        election.delete()
+        User.objects.filter(username__startswith=f'loadtest_{run_id}_').delete()
+
+    def run(self, election, candidates, voters, options):
+        tasks = [('vote', voter) for voter in voters]
+        tasks += [
+            ('api_results' if i % 2 else 'results', None)
+            for i in range(options['reads'])
+        ]
+        random.shuffle(tasks)
+
+        urls = {
+            'api_results': reverse('elections:api_results'),
+            'results': reverse('elections:results'),
+        }
+        stats = defaultdict(lambda: {
+            'latency': [], 'queries': 0, 'lock_errors': 0, 'errors': 0,
+            'status': defaultdict(int),
+        })
+        lock = threading.Lock()
+        local = threading.local()
+
+        def worker(task):
+            name, voter = task
+            client = getattr(local, 'client', None)
+            if client is None:
+                client = local.client = Client()
+            if name == 'vote':
+                # 登录不计入压测时间
+                client.force_login(voter)
+                url = reverse(
+                    'elections:vote',
+                    args=[election.id, random.choice(candidates).id],
+                )
+            else:
+                url = urls[name]
+
+            counter = QueryCounter()
+            status = None
+            error = None
+            started = time.perf_counter()
+            try:
+                with connection.execute_wrapper(counter):
+                    if name == 'vote':
+                        # 每个合成投票人使用不同的 IP，避免触发按 IP 限流
+                        response = client.post(
+                            url,
+                            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+                            REMOTE_ADDR=f'10.{voter.id >> 16 & 255}.{voter.id >> 8 & 255}.{voter.id & 255}',
+                        )
+                    else:
+                        response = client.get(url)
+                status = response.status_code
+            except OperationalError as exc:
+                error = 'lock' if 'locked' in str(exc) else 'error'
+            except Exception:
+                error = 'error'
+            elapsed = time.perf_counter() - started
+            close_old_connections()
+
+            with lock:
+                entry = stats[name]
+                entry['latency'].append(elapsed)
+                entry['queries'] += counter.count
+                if error == 'lock':
+                    entry['lock_errors'] += 1
+                elif error:
+                    entry['errors'] += 1
+                else:
+                    entry['status'][status] += 1
+
+        ingestor = get_ingestor()
+        batches_before, ballots_before = ingestor.batches, ingestor.ballots
+
+        # 配置了只读副本时，压测期间在后台按 REFRESH_INTERVAL 刷新副本
+        refresher = None
+        if replica_alias() is not None:
+            refresh_replica()
+            refresher = ReplicaRefresher()
+            refresher.start()
+
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                list(pool.map(worker, tasks))
+            duration = time.perf_counter() - started
+        finally:
+            if refresher is not None:
+                refresher.stop()
+
+        report = {
+            'config': {
+                'voters': options['voters'],
+                'reads': options['reads'],
+                'concurrency': options['concurrency'],
+                'candidates': options['candidates'],
+                'group_commit': options['group_commit'],
+                'database': settings.DATABASES['default']['ENGINE'],
+                'db_profile': getattr(settings, 'DB_PROFILE', 'development'),
+                'replica': replica_alias(),
+            },
+            'duration_sec': round(duration, 3),
+            'throughput_rps': round(len(tasks) / duration, 1),
+            'endpoints': {name: summarize(entry, duration) for name, entry in stats.items()},
+            'votes_recorded': Election.objects.get(pk=election.pk).total_votes,
+        }
+        if refresher is not None:
+            report['replica_refreshes'] = refresher.refreshes
+        if options['group_commit']:
+            batches = ingestor.batches - batches_before
+            ballots = ingestor.ballots - ballots_before
+            report['group_commit'] = {
+                'batches': batches,
+                'ballots': ballots,
+                'avg_batch_size': round(ballots / batches, 1) if batches else 0,
+            }
+        return report
+
+
+def percentile(samples, pct):
+    index = min(len(samples) - 1, int(len(samples) * pct / 100))
+    return round(samples[index] * 1000, 2)
+
+
+def summarize(entry, duration):
+    latency = sorted(entry['latency'])
+    requests = len(latency)
+    return {
+        'requests': requests,
+        'throughput_rps': round(requests / duration, 1),
+        'p50_ms': percentile(latency, 50),
+        'p95_ms': percentile(latency, 95),
+        'p99_ms': percentile(latency, 99),
+        'queries_per_request': round(entry['queries'] / requests, 2),
+        'lock_errors': entry['lock_errors'],
+        'errors': entry['errors'],
+        'status_codes': {str(code): n for code, n in sorted(entry['status'].items())},
+    }
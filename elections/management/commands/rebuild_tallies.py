@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from elections.tallies import rebuild_tallies
+
+
+class Command(BaseCommand):
+    help = '根据原始投票记录重建计票汇总表'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--election',
+            type=int,
+            action='append',
+            dest='elections',
+            help='只重建指定选举（可重复）',
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_tallies(options['elections'])
+        self.stdout.write(self.style.SUCCESS(f'已重建 {count} 个选举的计票'))
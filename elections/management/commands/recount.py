@@ -0,0 +1,70 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from elections.cache import bump_results_version
+from elections.recount import reconcile, recount
+from elections.tallies import rebuild_tallies
+
+
+class Command(BaseCommand):
+    help = '根据原始投票记录并行重新计票，并与计票汇总表及结果页面显示的票数逐个候选人核对'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--election',
+            type=int,
+            action='append',
+            dest='elections',
+            help='只核对指定选举（可重复）',
+        )
+        parser.add_argument('--workers', type=int, help='工作进程数（默认 CPU 核数）')
+        parser.add_argument('--chunks-per-worker', type=int, default=4, help='每个进程分到的主键区间数')
+        parser.add_argument('--repair', action='store_true', help='发现不一致时重建相应选举的计票')
+        parser.add_argument('--json', action='store_true', help='以 JSON 输出核对结果')
+
+    def handle(self, *args, **options):
+        election_ids = options['elections']
+        counts, stats = recount(election_ids, options['workers'], options['chunks_per_worker'])
+        report, mismatches = reconcile(counts, election_ids)
+
+        repaired = []
+        if mismatches and options['repair']:
+            repaired = sorted({m['election'] for m in mismatches})
+            rebuild_tallies(repaired)
+            # 立即递增结果版本再复核（rebuild_tallies 的递增在事务提交后才执行）
+            bump_results_version(*repaired)
+            report, mismatches = reconcile(counts, election_ids)
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                **stats,
+                'elections': report,
+                'mismatches': mismatches,
+                'repaired': repaired,
+            }, indent=2, ensure_ascii=False))
+        else:
+            self.write_report(report, mismatches, stats, repaired)
+
+        if mismatches:
+            raise CommandError(f'{len(mismatches)} 处计票不一致')
+
+    def write_report(self, report, mismatches, stats, repaired):
+        self.stdout.write(
+            f"重新计票用时 {stats['duration_sec']}s"
+            f"（{stats['workers']} 个进程，{stats['ranges']} 个主键区间）"
+        )
+        for entry in report:
+            style = self.style.SUCCESS if entry['ok'] else self.style.ERROR
+            status = '一致' if entry['ok'] else '不一致'
+            self.stdout.write(style(
+                f"选举 {entry['election']} {entry['title']}: {entry['recount_total']} 票，{status}"
+            ))
+        for row in mismatches:
+            target = '总票数' if row['candidate'] is None else f"候选人 {row['candidate']}"
+            self.stdout.write(self.style.ERROR(
+                f"  选举 {row['election']} {target}: 重新计票 {row['recount']}，"
+                f"计票表 {row['tally']}，页面显示 {row['displayed']}"
+            ))
+        if repaired:
+            self.stdout.write(self.style.WARNING(f'已重建选举 {repaired} 的计票'))
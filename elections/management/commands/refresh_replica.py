@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from elections.replica import get_replica_settings, refresh_replica, replica_alias
+
+
+class Command(BaseCommand):
+    help = '用 SQLite 备份 API 把主库复制到只读副本（--loop 时按间隔持续刷新）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='持续刷新，直到进程被终止')
+        parser.add_argument(
+            '--interval',
+            type=float,
+            help='刷新间隔秒数（默认 READ_REPLICA["REFRESH_INTERVAL"]）',
+        )
+
+    def handle(self, *args, **options):
+        if replica_alias() is None:
+            raise CommandError('DATABASES 中没有配置只读副本（设置 VOTING_REPLICA_PATH）')
+        interval = options['interval'] or get_replica_settings()['REFRESH_INTERVAL']
+
+        while True:
+            started = time.perf_counter()
+            refresh_replica()
+            elapsed = (time.perf_counter() - started) * 1000
+            self.stdout.write(self.style.SUCCESS(f'副本已刷新（{elapsed:.1f} ms）'))
+            if not options['loop']:
+                break
+            time.sleep(interval)
@@ -0,0 +1,155 @@
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+SCHEMA = """
+CREATE TABLE vote (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    voter_id INTEGER NOT NULL,
+    candidate_id INTEGER NOT NULL,
+    election_id INTEGER NOT NULL,
+    voted_at TEXT NOT NULL,
+    UNIQUE (voter_id, election_id)
+);
+CREATE TABLE candidate_tally (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    election_id INTEGER NOT NULL,
+    candidate_id INTEGER NOT NULL,
+    votes INTEGER NOT NULL,
+    UNIQUE (election_id, candidate_id)
+);
+"""
+
+
+class Command(BaseCommand):
+    help = '对比默认与生产 SQLite 配置下并发投票写入与结果读取的性能（输出 JSON）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4, help='写入线程数')
+        parser.add_argument('--readers', type=int, default=8, help='读取线程数')
+        parser.add_argument('--duration', type=float, default=5, help='每种配置运行秒数')
+        parser.add_argument('--candidates', type=int, default=5, help='候选人数')
+
+    def handle(self, *args, **options):
+        report = {
+            'writers': options['writers'],
+            'readers': options['readers'],
+            'duration': options['duration'],
+            'profiles': {
+                'default': self.run_profile({}, options),
+                'production': self.run_profile(settings.SQLITE_PRODUCTION_PRAGMAS, options),
+            },
+        }
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def connect(self, path, pragmas):
+        # 与 Django 一致：默认 5 秒超时、自动提交，由代码显式开启事务
+        conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        for name, value in pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def run_profile(self, pragmas, options):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.sqlite3')
+            conn = self.connect(path, pragmas)
+            conn.executescript(SCHEMA)
+            conn.executemany(
+                'INSERT INTO candidate_tally (election_id, candidate_id, votes) VALUES (1, ?, 0)',
+                [(c,) for c in range(1, options['candidates'] + 1)],
+            )
+            conn.close()
+
+            stats = {
+                'writes': 0, 'reads': 0, 'write_errors': 0, 'read_errors': 0,
+                'write_latency': [], 'read_latency': [],
+            }
+            lock = threading.Lock()
+            stop = time.monotonic() + options['duration']
+            voter_ids = iter(range(1, 10 ** 9))
+
+            def writer():
+                conn = self.connect(path, pragmas)
+                while time.monotonic() < stop:
+                    with lock:
+                        voter_id = next(voter_ids)
+                    candidate_id = random.randint(1, options['candidates'])
+                    started = time.perf_counter()
+                    try:
+                        conn.execute('BEGIN')
+                        conn.execute(
+                            'INSERT INTO vote (voter_id, candidate_id, election_id, voted_at) '
+                            "VALUES (?, ?, 1, datetime('now'))",
+                            (voter_id, candidate_id),
+                        )
+                        conn.execute(
+                            'UPDATE candidate_tally SET votes = votes + 1 '
+                            'WHERE election_id = 1 AND candidate_id = ?',
+                            (candidate_id,),
+                        )
+                        conn.execute('COMMIT')
+                    except sqlite3.OperationalError:
+                        if conn.in_transaction:
+                            conn.execute('ROLLBACK')
+                        with lock:
+                            stats['write_errors'] += 1
+                        continue
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        stats['writes'] += 1
+                        stats['write_latency'].append(elapsed)
+                conn.close()
+
+            def reader():
+                conn = self.connect(path, pragmas)
+                while time.monotonic() < stop:
+                    started = time.perf_counter()
+                    try:
+                        conn.execute(
+                            'SELECT candidate_id, votes FROM candidate_tally WHERE election_id = 1'
+                        ).fetchall()
+                        conn.execute('SELECT COUNT(*) FROM vote WHERE election_id = 1').fetchone()
+                    except sqlite3.OperationalError:
+                        with lock:
+                            stats['read_errors'] += 1
+                        continue
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        stats['reads'] += 1
+                        stats['read_latency'].append(elapsed)
+                conn.close()
+
+            threads = (
+                [threading.Thread(target=writer) for _ in range(options['writers'])]
+                + [threading.Thread(target=reader) for _ in range(options['readers'])]
+            )
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        duration = options['duration']
+        return {
+            'pragmas': pragmas,
+            'writes_per_sec': round(stats['writes'] / duration, 1),
+            'reads_per_sec': round(stats['reads'] / duration, 1),
+            'write_errors': stats['write_errors'],
+            'read_errors': stats['read_errors'],
+            'write_p95_ms': percentile_ms(stats['write_latency'], 95),
+            'read_p95_ms': percentile_ms(stats['read_latency'], 95),
+        }
+
+
+def percentile_ms(samples, pct):
+    if not samples:
+        return None
+    samples = sorted(samples)
+    index = min(len(samples) - 1, int(len(samples) * pct / 100))
+    return round(samples[index] * 1000, 2)
@@ -0,0 +1,185 @@
+import bisect
+import threading
+import weakref
+
+# 指标定义：名称 -> (类型, 说明)
+METRICS = {
+    'voting_votes_total': ('counter', '按选举和结果统计的投票请求数'),
+    'voting_request_duration_seconds': ('histogram', 'elections 视图的请求耗时'),
+    'voting_db_queries_total': ('counter', 'elections 视图执行的 SQL 数'),
+    'voting_results_cache_requests_total': ('counter', '结果缓存的命中与未命中次数'),
+    'voting_photo_renditions_total': ('counter', '后台生成候选人缩略图的次数'),
+    'voting_replica_reads_total': ('counter', '只读视图读副本或回退主库的次数'),
+    'voting_replica_refresh_seconds': ('histogram', '刷新只读副本的耗时'),
+}
+
+# 选举尚未确认存在（限流、请求方法错误）时使用的 election 标签，
+# 避免用 URL 中任意的 id 生成无限多的时间序列
+UNKNOWN_ELECTION = 'unknown'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Shard:
+    """
+    单个线程的指标数据。只由所属线程写入，无需加锁；抓取时再合并所有线程的数据。
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+
+    def merge_into(self, counters, histograms):
+        for key, value in list(self.counters.items()):
+            counters[key] = counters.get(key, 0) + value
+        for key, data in list(self.histograms.items()):
+            merged = histograms.get(key)
+            if merged is None:
+                histograms[key] = list(data)
+            else:
+                for i, value in enumerate(data):
+                    merged[i] += value
+
+
+class _Holder:
+    """
+    线程局部变量中保存分片的对象：线程结束时随线程局部数据一起释放，触发分片退役
+    """
+    __slots__ = ('shard', '__weakref__')
+
+    def __init__(self, shard):
+        self.shard = shard
+
+
+_local = threading.local()
+_shards = []
+# 已结束线程的数据合并到这里，_shards 只保留存活线程的分片，不随线程数增长。
+# 垃圾回收可能在持有锁时触发退役回调，因此使用可重入锁
+_retired = _Shard()
+_shards_lock = threading.RLock()
+
+
+def _retire(shard):
+    with _shards_lock:
+        try:
+            _shards.remove(shard)
+        except ValueError:
+            return
+        shard.merge_into(_retired.counters, _retired.histograms)
+
+
+def _shard():
+    holder = getattr(_local, 'holder', None)
+    if holder is None:
+        shard = _Shard()
+        holder = _local.holder = _Holder(shard)
+        with _shards_lock:
+            _shards.append(shard)
+        weakref.finalize(holder, _retire, shard)
+    return holder.shard
+
+
+def inc(name, amount=1, **labels):
+    """
+    计数器加一（或 amount）
+    """
+    key = (name, tuple(sorted(labels.items())))
+    counters = _shard().counters
+    counters[key] = counters.get(key, 0) + amount
+
+
+def observe(name, value, buckets=LATENCY_BUCKETS, **labels):
+    """
+    记录一次直方图观测值
+    """
+    key = (name, tuple(sorted(labels.items())))
+    histograms = _shard().histograms
+    data = histograms.get(key)
+    if data is None:
+        # 各桶计数（非累计）+ 超出最大桶的计数，最后两项为总和与次数
+        data = histograms[key] = [0] * (len(buckets) + 1) + [0.0, 0]
+    data[bisect.bisect_left(buckets, value)] += 1
+    data[-2] += value
+    data[-1] += 1
+
+
+def collect():
+    """
+    合并所有线程（包括已结束线程）的数据，返回 (counters, histograms)
+    """
+    counters = {}
+    histograms = {}
+    with _shards_lock:
+        shards = list(_shards)
+        _retired.merge_into(counters, histograms)
+    for shard in shards:
+        shard.merge_into(counters, histograms)
+    return counters, histograms
+
+
+def reset():
+    with _shards_lock:
+        for shard in [_retired, *_shards]:
+            shard.counters.clear()
+            shard.histograms.clear()
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    body = ','.join(
+        '{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+        for k, v in pairs
+    )
+    return '{' + body + '}'
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def _sort_key(item):
+    # 标签值可能混有数字和字符串（如 election=3 与 election='unknown'），按文本排序
+    (metric, labels), _ = item
+    return metric, [(k, str(v)) for k, v in labels]
+
+
+def render(buckets=LATENCY_BUCKETS):
+    """
+    以 Prometheus 文本格式输出所有指标
+    """
+    counters, histograms = collect()
+    lines = []
+
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'counter':
+            for (metric, labels), value in sorted(counters.items(), key=_sort_key):
+                if metric == name:
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        else:
+            for (metric, labels), data in sorted(histograms.items(), key=_sort_key):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets, data):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {data[-1]}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(data[-2])}')
+                lines.append(f'{name}_count{_format_labels(labels)} {data[-1]}')
+
+    # 结果缓存命中率（由计数器推导）
+    hits = sum(v for (m, l), v in counters.items()
+               if m == 'voting_results_cache_requests_total' and ('result', 'hit') in l)
+    total = sum(v for (m, l), v in counters.items()
+                if m == 'voting_results_cache_requests_total')
+    lines.append('# HELP voting_results_cache_hit_ratio 结果缓存命中率')
+    lines.append('# TYPE voting_results_cache_hit_ratio gauge')
+    lines.append(f'voting_results_cache_hit_ratio {_format_value(hits / total if total else 0.0)}')
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,207 @@
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connection
+from django.template.backends import django as django_backend
+
+from . import metrics
+
+_current_profile = ContextVar('elections_request_profile', default=None)
+
+
+class RequestProfile:
+    """
+    单个请求的 SQL 与模板渲染统计
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_sql = ''
+        self.template_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper 回调
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.sql_time += elapsed
+            if elapsed > self.slowest_time:
+                self.slowest_time = elapsed
+                self.slowest_sql = sql
+
+
+class ProfileAggregates:
+    """
+    按 URL 名称累计的请求统计（进程内）
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, profile, total_time):
+        with self._lock:
+            entry = self._data.setdefault(name, {
+                'requests': 0,
+                'total_ms': 0.0,
+                'max_ms': 0.0,
+                'queries': 0,
+                'max_queries': 0,
+                'sql_ms': 0.0,
+                'template_ms': 0.0,
+                'slowest_query_ms': 0.0,
+                'slowest_query': '',
+            })
+            entry['requests'] += 1
+            entry['total_ms'] += total_time * 1000
+            entry['max_ms'] = max(entry['max_ms'], total_time * 1000)
+            entry['queries'] += profile.queries
+            entry['max_queries'] = max(entry['max_queries'], profile.queries)
+            entry['sql_ms'] += profile.sql_time * 1000
+            entry['template_ms'] += profile.template_time * 1000
+            if profile.slowest_time * 1000 > entry['slowest_query_ms']:
+                entry['slowest_query_ms'] = profile.slowest_time * 1000
+                entry['slowest_query'] = profile.slowest_sql
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for name, entry in self._data.items():
+                n = entry['requests']
+                result[name] = {
+                    'requests': n,
+                    'avg_ms': round(entry['total_ms'] / n, 2),
+                    'max_ms': round(entry['max_ms'], 2),
+                    'avg_queries': round(entry['queries'] / n, 2),
+                    'max_queries': entry['max_queries'],
+                    'avg_sql_ms': round(entry['sql_ms'] / n, 2),
+                    'avg_template_ms': round(entry['template_ms'] / n, 2),
+                    'slowest_query_ms': round(entry['slowest_query_ms'], 2),
+                    'slowest_query': entry['slowest_query'],
+                }
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._data.clear()
+
+
+profile_aggregates = ProfileAggregates()
+
+
+def _install_template_timer():
+    """
+    包装 Django 模板后端的 render，统计顶层模板渲染耗时（include 的子模板已包含在内）
+    """
+    template_class = django_backend.Template
+    if getattr(template_class.render, '_elections_timed', False):
+        return
+    original = template_class.render
+
+    def render(self, context=None, request=None):
+        profile = _current_profile.get()
+        if profile is None:
+            return original(self, context, request)
+        started = time.perf_counter()
+        try:
+            return original(self, context, request)
+        finally:
+            profile.template_time += time.perf_counter() - started
+
+    render._elections_timed = True
+    template_class.render = render
+
+
+class RequestProfilingMiddleware:
+    """
+    可选的请求分析中间件：统计每个请求的 SQL 数量、SQL 总耗时、最慢 SQL、
+    视图耗时与模板渲染耗时，写入 Server-Timing 响应头，并按 URL 名称累计。
+    应放在 MIDDLEWARE 最后，使计时只覆盖 URL 解析与视图本身。
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        _install_template_timer()
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(profile):
+                response = self.get_response(request)
+        finally:
+            _current_profile.reset(token)
+        total_time = time.perf_counter() - started
+
+        response.headers['Server-Timing'] = ', '.join([
+            f'view;dur={total_time * 1000:.2f}',
+            f'sql;dur={profile.sql_time * 1000:.2f};desc="{profile.queries} queries"',
+            f'sqlmax;dur={profile.slowest_time * 1000:.2f}',
+            f'tpl;dur={profile.template_time * 1000:.2f}',
+        ])
+
+        match = getattr(request, 'resolver_match', None)
+        # 未匹配的路径归为一类，避免累计数据无限增长
+        name = match.view_name if match else '<unresolved>'
+        profile_aggregates.record(name, profile, total_time)
+        return response
+
+
+class QueryCounter:
+    """
+    connection.execute_wrapper 回调：只计数，不计时
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """
+    为 elections 应用的视图记录请求耗时直方图和 SQL 数量（供 /metrics 抓取）。
+    指标按线程分片累加，热点路径上无锁。
+    同时支持同步和异步调用，ASGI 下不会迫使整条中间件链退回线程执行；
+    异步请求的 SQL 在同步线程中执行，无法归属到请求，只记录耗时。
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        self.record(request, time.perf_counter() - started, counter.count)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.record(request, time.perf_counter() - started)
+        return response
+
+    def record(self, request, elapsed, queries=None):
+        match = getattr(request, 'resolver_match', None)
+        if match is not None and match.app_name == 'elections':
+            metrics.observe('voting_request_duration_seconds', elapsed, view=match.view_name)
+            if queries is not None:
+                metrics.inc('voting_db_queries_total', queries, view=match.view_name)
@@ -0,0 +1,75 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_tallies(apps, schema_editor):
+    """
+    根据已有投票生成初始计票
+    """
+    Election = apps.get_model('elections', 'Election')
+    Vote = apps.get_model('elections', 'Vote')
+    ElectionTally = apps.get_model('elections', 'ElectionTally')
+    CandidateTally = apps.get_model('elections', 'CandidateTally')
+
+    totals = {}
+    rows = (
+        Vote.objects.order_by()
+        .values('election_id', 'candidate_id')
+        .annotate(n=models.Count('id'))
+    )
+    tallies = []
+    for row in rows:
+        totals[row['election_id']] = totals.get(row['election_id'], 0) + row['n']
+        tallies.append(CandidateTally(
+            election_id=row['election_id'],
+            candidate_id=row['candidate_id'],
+            votes=row['n'],
+        ))
+    CandidateTally.objects.bulk_create(tallies, batch_size=1000)
+    ElectionTally.objects.bulk_create(
+        [
+            ElectionTally(election_id=eid, total_votes=totals.get(eid, 0))
+            for eid in Election.objects.values_list('id', flat=True)
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0003_election_created_at_alter_candidate_user_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ElectionTally',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_votes', models.PositiveIntegerField(default=0, verbose_name='总票数')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('election', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='tally', to='elections.election', verbose_name='选举')),
+            ],
+            options={
+                'verbose_name': '选举计票',
+                'verbose_name_plural': '选举计票',
+            },
+        ),
+        migrations.CreateModel(
+            name='CandidateTally',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('votes', models.PositiveIntegerField(default=0, verbose_name='票数')),
+                ('candidate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tallies', to='elections.candidate', verbose_name='候选人')),
+                ('election', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='candidate_tallies', to='elections.election', verbose_name='选举')),
+            ],
+            options={
+                'verbose_name': '候选人计票',
+                'verbose_name_plural': '候选人计票',
+                'unique_together': {('election', 'candidate')},
+            },
+        ),
+        migrations.RunPython(build_tallies, migrations.RunPython.noop),
+    ]
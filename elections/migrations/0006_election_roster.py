@@ -0,0 +1,71 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:13
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.utils import timezone
+import django.db.models.deletion
+
+
+def build_rosters(apps, schema_editor):
+    """
+    生成候选人名单：
+    进行中、尚未结束或还没有投票的选举列入全部现有候选人（按 id 顺序），
+    已结束且有投票的选举只列入得过票的候选人
+    """
+    Candidate = apps.get_model('elections', 'Candidate')
+    Election = apps.get_model('elections', 'Election')
+    Vote = apps.get_model('elections', 'Vote')
+    ElectionCandidate = apps.get_model('elections', 'ElectionCandidate')
+
+    voted = defaultdict(list)
+    pairs = (
+        Vote.objects.order_by('election_id', 'candidate_id')
+        .values_list('election_id', 'candidate_id')
+        .distinct()
+    )
+    for election_id, candidate_id in pairs:
+        voted[election_id].append(candidate_id)
+
+    all_candidates = list(Candidate.objects.order_by('id').values_list('id', flat=True))
+    now = timezone.now()
+    entries = []
+    for election_id, is_active, end_date in Election.objects.values_list('id', 'is_active', 'end_date'):
+        finished = not is_active and end_date is not None and end_date <= now
+        candidate_ids = voted[election_id] if finished and voted[election_id] else all_candidates
+        entries.extend(
+            ElectionCandidate(election_id=election_id, candidate_id=candidate_id, ballot_order=position)
+            for position, candidate_id in enumerate(candidate_ids, start=1)
+        )
+    ElectionCandidate.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0005_vote_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ElectionCandidate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ballot_order', models.PositiveIntegerField(default=0, verbose_name='选票顺序')),
+                ('candidate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='roster_entries', to='elections.candidate', verbose_name='候选人')),
+                ('election', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='roster', to='elections.election', verbose_name='选举')),
+            ],
+            options={
+                'verbose_name': '候选人名单',
+                'verbose_name_plural': '候选人名单',
+                'ordering': ['ballot_order', 'id'],
+                'unique_together': {('election', 'candidate')},
+            },
+        ),
+        migrations.AddField(
+            model_name='election',
+            name='candidates',
+            field=models.ManyToManyField(blank=True, related_name='elections', through='elections.ElectionCandidate', to='elections.candidate', verbose_name='候选人'),
+        ),
+        migrations.RunPython(build_rosters, migrations.RunPython.noop),
+    ]
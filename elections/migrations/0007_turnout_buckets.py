@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:16
+
+import datetime
+
+from django.db import migrations, models
+from django.db.models.functions import TruncMinute
+import django.db.models.deletion
+
+
+def build_turnout(apps, schema_editor):
+    """
+    根据已有投票生成每分钟的投票数
+    """
+    Vote = apps.get_model('elections', 'Vote')
+    TurnoutBucket = apps.get_model('elections', 'TurnoutBucket')
+
+    rows = (
+        Vote.objects.order_by()
+        .annotate(bucket=TruncMinute('voted_at', tzinfo=datetime.timezone.utc))
+        .values('election_id', 'bucket')
+        .annotate(n=models.Count('id'))
+    )
+    TurnoutBucket.objects.bulk_create(
+        [
+            TurnoutBucket(election_id=row['election_id'], minute=row['bucket'], votes=row['n'])
+            for row in rows.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0006_election_roster'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TurnoutBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('minute', models.DateTimeField(verbose_name='时间（分钟）')),
+                ('votes', models.PositiveIntegerField(default=0, verbose_name='票数')),
+                ('election', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='turnout_buckets', to='elections.election', verbose_name='选举')),
+            ],
+            options={
+                'verbose_name': '投票率分钟统计',
+                'verbose_name_plural': '投票率分钟统计',
+                'unique_together': {('election', 'minute')},
+            },
+        ),
+        migrations.RunPython(build_turnout, migrations.RunPython.noop),
+    ]
@@ -3,6 +3,13 @@ from django.contrib.auth.models import User
 from django.utils import timezone
 
 
+def roster_only(fields):
+    """
+    名单查询（select_related('candidate')）的 only() 参数：名单本身的字段加上指定的候选人字段
+    """
+    return ('election', 'candidate', 'ballot_order', *(f'candidate__{f}' for f in fields))
+
+
 class Election(models.Model):
     """
     Голосование / Election
@@ -13,6 +20,13 @@ class Election(models.Model):
     end_date = models.DateTimeField(verbose_name="结束时间")
     is_active = models.BooleanField(default=False, verbose_name="是否进行中")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
+    candidates = models.ManyToManyField(
+        'Candidate',
+        through='ElectionCandidate',
+        related_name='elections',
+        blank=True,
+        verbose_name="候选人",
+    )
 
     class Meta:
         verbose_name = "选举"
@@ -23,7 +37,24 @@ class Election(models.Model):
 
     @property
     def total_votes(self):
-        return Vote.objects.filter(election=self).count()
+        # 从计票汇总表读取，避免对 Vote 表做 COUNT(*)
+        try:
+            return self.tally.total_votes
+        except ElectionTally.DoesNotExist:
+            return 0
+
+    def ballot(self, fields=None):
+        """
+        按选票顺序返回候选人名单；已预取 roster 时不再查询。
+        fields 指定只读取的候选人字段（其余字段延迟加载），如不读取简介、纲领等大文本字段
+        """
+        if 'roster' in getattr(self, '_prefetched_objects_cache', {}):
+            entries = self.roster.all()
+        else:
+            entries = self.roster.select_related('candidate')
+            if fields is not None:
+                entries = entries.only(*roster_only(fields))
+        return [entry.candidate for entry in entries]
 
     def is_open(self):
         now = timezone.now()
@@ -37,6 +68,8 @@ class Candidate(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, verbose_name="用户")
     full_name = models.CharField(max_length=200, verbose_name="姓名")
     photo = models.ImageField(upload_to='candidates/', blank=True, null=True, verbose_name="照片")
+    # 后台生成的缩略图：{'source': 原图名, 'webp': [[宽度, 文件名], ...], 'jpeg': [...]}
+    photo_renditions = models.JSONField(default=dict, blank=True, editable=False, verbose_name="照片缩略图")
     bio = models.TextField(verbose_name="个人简介")
     program = models.TextField(verbose_name="竞选纲领")
     party = models.CharField(max_length=100, blank=True, verbose_name="政党")
@@ -52,19 +85,67 @@ class Candidate(models.Model):
     def __str__(self):
         return self.full_name
 
+    def photo_srcset(self, fmt):
+        """
+        指定格式缩略图的 srcset；缩略图尚未生成或已过期（照片已更换）时返回空字符串
+        """
+        if not self.photo or self.photo_renditions.get('source') != self.photo.name:
+            return ''
+        storage = self.photo.storage
+        return ', '.join(
+            f'{storage.url(name)} {width}w' for width, name in self.photo_renditions.get(fmt, [])
+        )
+
+    @property
+    def photo_webp_srcset(self):
+        return self.photo_srcset('webp')
+
+    @property
+    def photo_jpeg_srcset(self):
+        return self.photo_srcset('jpeg')
+
     def get_votes_count(self, election=None):
-        qs = Vote.objects.filter(candidate=self)
+        qs = CandidateTally.objects.filter(candidate=self)
         if election:
             qs = qs.filter(election=election)
-        return qs.count()
+        return qs.aggregate(total=models.Sum('votes'))['total'] or 0
 
     def get_vote_percentage(self, election):
-        total = Vote.objects.filter(election=election).count()
+        total = election.total_votes
         if total == 0:
             return 0
         return round((self.get_votes_count(election) / total) * 100, 2)
 
 
+class ElectionCandidate(models.Model):
+    """
+    Список кандидатов / Election roster
+    选举的候选人名单及选票上的排列顺序
+    """
+    election = models.ForeignKey(Election, on_delete=models.CASCADE, related_name='roster', verbose_name="选举")
+    candidate = models.ForeignKey(Candidate, on_delete=models.CASCADE, related_name='roster_entries', verbose_name="候选人")
+    ballot_order = models.PositiveIntegerField(default=0, verbose_name="选票顺序")
+
+    class Meta:
+        unique_together = ['election', 'candidate']
+        ordering = ['ballot_order', 'id']
+        verbose_name = "候选人名单"
+        verbose_name_plural = "候选人名单"
+
+    def __str__(self):
+        return f"{self.election.title}: {self.ballot_order}. {self.candidate.full_name}"
+
+
+class VoteQuerySet(models.QuerySet):
+
+    def delete(self):
+        # 批量删除时按组扣减计票，删除本身仍是一条 DELETE（Vote 没有删除信号，可以快速删除）。
+        # tallies 依赖本模块，在此延迟导入
+        from .tallies import retracting
+        with retracting(self):
+            return super().delete()
+
+
 class Vote(models.Model):
     """
     Голос / Vote
@@ -75,10 +156,78 @@ class Vote(models.Model):
     voted_at = models.DateTimeField(auto_now_add=True, verbose_name="投票时间")
     ip_address = models.GenericIPAddressField(blank=True, null=True, verbose_name="IP地址")
 
+    objects = VoteQuerySet.as_manager()
+
     class Meta:
         unique_together = ['voter', 'election']
+        indexes = [
+            # 按候选人计票：GROUP BY candidate_id WHERE election_id = ?，索引即可覆盖
+            models.Index(fields=['election', 'candidate'], name='vote_election_candidate_idx'),
+            # 投票时间线 / 投票率
+            models.Index(fields=['election', 'voted_at'], name='vote_election_time_idx'),
+            # 按 IP 审计
+            models.Index(fields=['election', 'ip_address'], name='vote_election_ip_idx'),
+        ]
         verbose_name = "投票"
         verbose_name_plural = "投票记录"
 
     def __str__(self):
         return f"{self.voter.username} -> {self.candidate.full_name} ({self.election.title})"
+
+    def delete(self, *args, **kwargs):
+        from .tallies import retracting
+        with retracting(Vote.objects.filter(pk=self.pk)):
+            return super().delete(*args, **kwargs)
+
+
+class ElectionTally(models.Model):
+    """
+    Итог голосования / Election tally
+    每次投票时在同一事务内更新的选举总票数
+    """
+    election = models.OneToOneField(Election, on_delete=models.CASCADE, related_name='tally', verbose_name="选举")
+    total_votes = models.PositiveIntegerField(default=0, verbose_name="总票数")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
+
+    class Meta:
+        verbose_name = "选举计票"
+        verbose_name_plural = "选举计票"
+
+    def __str__(self):
+        return f"{self.election.title}: {self.total_votes}"
+
+
+class CandidateTally(models.Model):
+    """
+    Итог кандидата / Candidate tally
+    每个选举中每位候选人的得票数
+    """
+    election = models.ForeignKey(Election, on_delete=models.CASCADE, related_name='candidate_tallies', verbose_name="选举")
+    candidate = models.ForeignKey(Candidate, on_delete=models.CASCADE, related_name='tallies', verbose_name="候选人")
+    votes = models.PositiveIntegerField(default=0, verbose_name="票数")
+
+    class Meta:
+        unique_together = ['election', 'candidate']
+        verbose_name = "候选人计票"
+        verbose_name_plural = "候选人计票"
+
+    def __str__(self):
+        return f"{self.candidate.full_name} ({self.election.title}): {self.votes}"
+
+
+class TurnoutBucket(models.Model):
+    """
+    Явка по минутам / Turnout bucket
+    每个选举每分钟的投票数，随投票增量更新，用于投票率时间序列
+    """
+    election = models.ForeignKey(Election, on_delete=models.CASCADE, related_name='turnout_buckets', verbose_name="选举")
+    minute = models.DateTimeField(verbose_name="时间（分钟）")
+    votes = models.PositiveIntegerField(default=0, verbose_name="票数")
+
+    class Meta:
+        unique_together = ['election', 'minute']
+        verbose_name = "投票率分钟统计"
+        verbose_name_plural = "投票率分钟统计"
+
+    def __str__(self):
+        return f"{self.election.title} {self.minute:%Y-%m-%d %H:%M}: {self.votes}"
@@ -0,0 +1,159 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+
+DEFAULTS = {
+    'ENABLED': True,
+    'IP_RATE': '60/m',
+    'USER_RATE': '10/m',
+    'ELECTIONS': {},
+    'CACHE': None,
+    'MAX_KEYS': 100000,
+    # 前面可信反向代理的层数：0 表示直接使用 REMOTE_ADDR，不信任客户端发送的 X-Forwarded-For
+    'PROXY_HOPS': 0,
+}
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def get_rate_limit_settings():
+    return {**DEFAULTS, **getattr(settings, 'VOTE_RATE_LIMIT', {})}
+
+
+@lru_cache(maxsize=64)
+def parse_rate(rate):
+    """
+    解析 '10/m' 形式的限额，返回 (次数, 周期秒数)
+    """
+    count, _, unit = rate.partition('/')
+    try:
+        return int(count), PERIODS[unit[:1]]
+    except (KeyError, ValueError):
+        raise ValueError(f'无效的限流配置: {rate}')
+
+
+class TokenBucketLimiter:
+    """
+    进程内的令牌桶限流器。每个键只保存 [剩余令牌, 上次时间]，
+    按最近使用顺序最多保留 max_keys 个键，超出时淘汰最久未出现的键，内存有上限。
+    """
+
+    def __init__(self):
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key, capacity, period, max_keys=DEFAULTS['MAX_KEYS'], now=None):
+        """
+        消耗一个令牌，返回需要等待的秒数（0 表示放行）
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(capacity), now]
+                while len(self._buckets) > max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * capacity / period)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0
+            return (1 - bucket[0]) * period / capacity
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheLimiter:
+    """
+    基于共享缓存的滑动窗口计数（多进程部署时使用）：
+    当前窗口计数 + 上一窗口计数按剩余比例折算，每次检查读写两个键。
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def hit(self, key, capacity, period, now=None):
+        now = time.time() if now is None else now
+        window = int(now // period)
+        elapsed = now - window * period
+        current_key = f'ratelimit:{key}:{window}'
+        self.cache.add(current_key, 0, timeout=period * 2)
+        try:
+            count = self.cache.incr(current_key)
+        except ValueError:
+            # 键在 add 和 incr 之间过期
+            self.cache.set(current_key, 1, timeout=period * 2)
+            count = 1
+        previous = self.cache.get(f'ratelimit:{key}:{window - 1}', 0)
+        if previous * (1 - elapsed / period) + count <= capacity:
+            return 0
+
+        # 被拒绝的请求不计入窗口，与令牌桶的行为一致
+        self.cache.decr(current_key)
+        count -= 1
+        if count >= capacity or not previous:
+            return period - elapsed
+        # 上一窗口的折算部分降到能再容纳一个请求（count + 1）所需的时间
+        return max(period * (1 - (capacity - count - 1) / previous) - elapsed, 0.001)
+
+
+memory_limiter = TokenBucketLimiter()
+
+
+def rate_limit_ip(request):
+    """
+    限流使用的客户端 IP。X-Forwarded-For 可以由客户端任意伪造，只取可信代理追加的那一段：
+    PROXY_HOPS 层代理时为倒数第 PROXY_HOPS 个地址；未配置代理或地址不足时使用 REMOTE_ADDR
+    """
+    hops = get_rate_limit_settings()['PROXY_HOPS']
+    if hops:
+        forwarded = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+        if len(forwarded) >= hops:
+            return forwarded[-hops]
+    return request.META.get('REMOTE_ADDR')
+
+
+def check_rate_limit(election_id, kind, ident):
+    """
+    对某个选举的 IP（kind='ip'）或用户（kind='user'）计一次请求。
+    返回 Retry-After 秒数，0 表示放行。ELECTIONS 中可按选举 id 覆盖 IP_RATE / USER_RATE，
+    值为 None 表示不限制。
+    """
+    conf = get_rate_limit_settings()
+    if not conf['ENABLED'] or ident is None:
+        return 0
+    option = f'{kind.upper()}_RATE'
+    rate = conf['ELECTIONS'].get(election_id, {}).get(option, conf[option])
+    if rate is None:
+        return 0
+
+    capacity, period = parse_rate(rate)
+    key = f'{kind}:{election_id}:{ident}'
+    if conf['CACHE']:
+        wait = CacheLimiter(caches[conf['CACHE']]).hit(key, capacity, period)
+    else:
+        wait = memory_limiter.hit(key, capacity, period, conf['MAX_KEYS'])
+    return math.ceil(wait)
+
+
+def check_vote_rate_limit(request, election_id):
+    """
+    投票请求的限流检查：先按 IP（不访问数据库），放行后再按已登录用户。
+    返回 Retry-After 秒数，0 表示放行。使用共享缓存时会阻塞，异步视图中须放到同步线程执行。
+    """
+    retry_after = check_rate_limit(election_id, 'ip', rate_limit_ip(request))
+    if not retry_after:
+        retry_after = check_rate_limit(election_id, 'user', request.user.pk)
+    return retry_after
@@ -0,0 +1,157 @@
+import os
+import sqlite3
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import quote
+
+import django
+from django.db import connection
+from django.db.models import Count, Max, Min
+
+from .cache import cached_election_standings
+from .models import Election, ElectionTally, Vote
+from .results import count_votes
+
+
+def split_range(low, high, parts):
+    """
+    把主键区间 [low, high] 切成至多 parts 段，返回 [(lo, hi)]（闭区间）
+    """
+    if low is None or high is None:
+        return []
+    parts = max(1, min(parts, high - low + 1))
+    size = -(-(high - low + 1) // parts)
+    return [(lo, min(lo + size - 1, high)) for lo in range(low, high + 1, size)]
+
+
+def _range_sql(table, election_ids):
+    sql = (
+        f'SELECT election_id, candidate_id, COUNT(*) FROM "{table}" '
+        'WHERE id BETWEEN ? AND ?'
+    )
+    if election_ids:
+        sql += ' AND election_id IN ({})'.format(', '.join('?' * len(election_ids)))
+    return sql + ' GROUP BY election_id, candidate_id'
+
+
+def count_range_readonly(path, table, low, high, election_ids=None):
+    """
+    进程池任务：用只读 SQLite 连接统计一个主键区间内的票数
+    """
+    conn = sqlite3.connect(f'file:{quote(str(path))}?mode=ro', uri=True)
+    try:
+        conn.execute('PRAGMA query_only = 1')
+        return conn.execute(
+            _range_sql(table, election_ids), [low, high, *(election_ids or [])]
+        ).fetchall()
+    finally:
+        conn.close()
+
+
+def count_range(low, high, election_ids=None):
+    """
+    在当前进程内通过 ORM 统计一个主键区间（非 SQLite 文件数据库时使用）
+    """
+    qs = Vote.objects.order_by().filter(id__range=(low, high))
+    if election_ids:
+        qs = qs.filter(election_id__in=election_ids)
+    return list(qs.values_list('election_id', 'candidate_id').annotate(n=Count('id')))
+
+
+def can_use_process_pool():
+    return connection.vendor == 'sqlite' and not connection.is_in_memory_db()
+
+
+def recount(election_ids=None, workers=None, chunks_per_worker=4):
+    """
+    直接根据 Vote 原始记录重新计票：按主键区间切分，交给进程池并行统计后合并。
+    每个工作进程使用独立的只读 SQLite 连接；内存数据库或其他数据库在当前进程内统计。
+    返回 ({election_id: {candidate_id: 票数}}, 统计信息)
+    """
+    started = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    votes = Vote.objects.all()
+    if election_ids:
+        votes = votes.filter(election_id__in=election_ids)
+    bounds = votes.aggregate(low=Min('id'), high=Max('id'))
+    ranges = split_range(bounds['low'], bounds['high'], workers * chunks_per_worker)
+    election_ids = list(election_ids or [])
+
+    parallel = workers > 1 and len(ranges) > 1 and can_use_process_pool()
+    if parallel:
+        path = connection.settings_dict['NAME']
+        table = Vote._meta.db_table
+        # spawn/forkserver 启动的子进程需要先初始化 Django 才能导入本模块
+        with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+            futures = [
+                pool.submit(count_range_readonly, path, table, low, high, election_ids)
+                for low, high in ranges
+            ]
+            partials = [future.result() for future in futures]
+    else:
+        partials = [count_range(low, high, election_ids) for low, high in ranges]
+
+    counts = defaultdict(lambda: defaultdict(int))
+    for rows in partials:
+        for election_id, candidate_id, n in rows:
+            counts[election_id][candidate_id] += n
+
+    stats = {
+        'workers': workers if parallel else 1,
+        'ranges': len(ranges),
+        'duration_sec': round(time.perf_counter() - started, 3),
+    }
+    return {eid: dict(c) for eid, c in counts.items()}, stats
+
+
+def reconcile(recounted, election_ids=None):
+    """
+    将重新计票结果与计票汇总表及结果页面显示的票数（结果缓存）逐个候选人比对。
+    返回 (报告列表, 不一致列表)；候选人为 None 的条目表示选举总票数。
+    """
+    elections = Election.objects.order_by('id')
+    if election_ids:
+        elections = elections.filter(id__in=election_ids)
+    elections = list(elections)
+    ids = [e.id for e in elections]
+    tallied = count_votes(ids)
+    totals = dict(ElectionTally.objects.filter(election_id__in=ids).values_list('election_id', 'total_votes'))
+
+    report = []
+    mismatches = []
+    for election in elections:
+        counted = recounted.get(election.id, {})
+        tally = tallied.get(election.id, {})
+        standings, displayed_total, _ = cached_election_standings(election)
+        displayed = {row['candidate'].id: row['vote_count'] for row in standings}
+
+        rows = []
+        for candidate_id in sorted(set(counted) | set(tally) | set(displayed)):
+            rows.append({
+                'election': election.id,
+                'candidate': candidate_id,
+                'recount': counted.get(candidate_id, 0),
+                'tally': tally.get(candidate_id, 0),
+                'displayed': displayed.get(candidate_id),
+            })
+        rows.append({
+            'election': election.id,
+            'candidate': None,
+            'recount': sum(counted.values()),
+            'tally': totals.get(election.id, 0),
+            'displayed': displayed_total,
+        })
+        for row in rows:
+            # 不在名单上的候选人不会显示在结果页面上；只要没有票就不算不一致
+            displayed_value = row['displayed'] if row['displayed'] is not None else 0
+            if not row['recount'] == row['tally'] == displayed_value:
+                mismatches.append(row)
+
+        report.append({
+            'election': election.id,
+            'title': election.title,
+            'recount_total': sum(counted.values()),
+            'ok': not any(m['election'] == election.id for m in mismatches),
+        })
+    return report, mismatches
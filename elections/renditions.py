@@ -0,0 +1,155 @@
+import hashlib
+import io
+import os
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from PIL import Image, ImageOps
+
+from . import metrics
+from .cache import CANDIDATE_FRAGMENTS, bump_catalog_version, invalidate_fragments
+from .models import Candidate
+
+DEFAULTS = {
+    'WIDTHS': (64, 128, 256),
+    'FORMATS': ('webp', 'jpeg'),
+    'QUALITY': 80,
+    'ASYNC': True,
+    'WORKERS': 2,
+}
+
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+
+# 缩略图文件名：<原图名>.<宽度>.<内容哈希>.<扩展名>，内容不变则文件名不变，可以长期缓存
+RENDITION_RE = re.compile(r'\.\d+\.[0-9a-f]{12}\.(?:webp|jpg)$')
+RENDITION_MAX_AGE = 365 * 24 * 3600
+
+
+def get_rendition_settings():
+    return {**DEFAULTS, **getattr(settings, 'PHOTO_RENDITIONS', {})}
+
+
+def rendition_name(source_name, width, fmt, data):
+    stem, _ = os.path.splitext(source_name)
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    return f'{stem}.{width}.{digest}.{EXTENSIONS[fmt]}'
+
+
+def render_image(image, width, fmt, quality):
+    """
+    裁剪为正方形并缩放到 width（页面上头像以圆形 object-fit: cover 显示），返回编码后的字节
+    """
+    thumb = ImageOps.fit(image, (width, width), Image.LANCZOS)
+    if fmt == 'jpeg' and thumb.mode not in ('RGB', 'L'):
+        thumb = thumb.convert('RGB')
+    buffer = io.BytesIO()
+    thumb.save(buffer, format=fmt.upper(), quality=quality)
+    return buffer.getvalue()
+
+
+def generate_renditions(source_name, storage=default_storage):
+    """
+    为一张原图生成各尺寸、各格式的缩略图，保存在原图旁边。
+    返回 {'source': 原图名, 格式: [[宽度, 文件名], ...]}；不放大比原图小的尺寸。
+    """
+    options = get_rendition_settings()
+    with storage.open(source_name) as f:
+        image = Image.open(f)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    largest = min(image.size)
+    widths = [w for w in options['WIDTHS'] if w <= largest] or [min(options['WIDTHS'])]
+    renditions = {'source': source_name}
+    for fmt in options['FORMATS']:
+        renditions[fmt] = []
+        for width in widths:
+            data = render_image(image, width, fmt, options['QUALITY'])
+            name = rendition_name(source_name, width, fmt, data)
+            if not storage.exists(name):
+                name = storage.save(name, ContentFile(data))
+            renditions[fmt].append([width, name])
+    return renditions
+
+
+def build_renditions(candidate_id, force=False, storage=default_storage):
+    """
+    为候选人当前的照片生成缩略图并写回 photo_renditions，删除旧照片留下的缩略图。
+    返回是否有更新。
+    """
+    row = Candidate.objects.filter(pk=candidate_id).values('photo', 'photo_renditions').first()
+    if row is None:
+        return False
+    photo, previous = row['photo'], row['photo_renditions'] or {}
+    if not force and previous.get('source', '') == (photo or ''):
+        return False
+
+    renditions = generate_renditions(photo, storage) if photo else {}
+    # 只有照片在生成期间没有再次更换时才写回
+    updated = Candidate.objects.filter(pk=candidate_id, photo=photo).update(photo_renditions=renditions)
+    if not updated:
+        return False
+
+    current = {name for fmt in EXTENSIONS for _, name in renditions.get(fmt, [])}
+    for fmt in EXTENSIONS:
+        for _, name in previous.get(fmt, []):
+            if name not in current:
+                storage.delete(name)
+
+    # update() 不触发信号：手动使候选人卡片和结果缓存失效
+    invalidate_fragments(CANDIDATE_FRAGMENTS, candidate_id)
+    bump_catalog_version()
+    return True
+
+
+def _build(candidate_id):
+    try:
+        updated = build_renditions(candidate_id)
+    except Exception:
+        metrics.inc('voting_photo_renditions_total', result='error')
+        raise
+    metrics.inc('voting_photo_renditions_total', result='updated' if updated else 'unchanged')
+    return updated
+
+
+def _run(candidate_id):
+    # 后台线程使用自己的数据库连接，用完关闭
+    close_old_connections()
+    try:
+        return _build(candidate_id)
+    finally:
+        close_old_connections()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=get_rendition_settings()['WORKERS'],
+                thread_name_prefix='photo-renditions',
+            )
+        return _executor
+
+
+def schedule_renditions(candidate_id):
+    """
+    在后台线程池中生成缩略图，返回 Future；ASYNC 为 False 时在当前线程执行
+    """
+    if get_rendition_settings()['ASYNC']:
+        return get_executor().submit(_run, candidate_id)
+    future = Future()
+    try:
+        future.set_result(_build(candidate_id))
+    except Exception as exc:
+        future.set_exception(exc)
+    return future
@@ -0,0 +1,253 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from . import metrics
+
+DEFAULTS = {
+    'ALIAS': 'replica',
+    # 只有这些应用的模型从副本读取；会话、用户等始终读主库
+    'APPS': ('elections',),
+    # 副本落后主库超过 MAX_LAG 秒时改读主库
+    'MAX_LAG': 5,
+    # 副本同步时间在进程内缓存的秒数
+    'CHECK_INTERVAL': 1,
+    # refresh_replica 命令和压测时刷新副本的间隔（秒）
+    'REFRESH_INTERVAL': 2,
+    # 保存用户写入时间的缓存别名；None 表示使用结果缓存
+    'CACHE': None,
+}
+
+# 用户写入后的时间戳：副本同步到该时间之前，该用户的只读视图读主库
+PIN_KEY = 'elections:replica_pin:{}'
+# 副本中记录同步时间的表（每次刷新时随备份一起重建）
+SYNC_TABLE = 'replica_sync'
+
+_read_alias = ContextVar('elections_read_alias', default=None)
+
+
+def get_replica_settings():
+    return {**DEFAULTS, **getattr(settings, 'READ_REPLICA', {})}
+
+
+def get_pin_cache():
+    return caches[get_replica_settings()['CACHE'] or getattr(settings, 'RESULTS_CACHE_ALIAS', 'default')]
+
+
+def replica_alias():
+    """
+    已配置的副本别名；DATABASES 中没有副本时返回 None
+    """
+    alias = get_replica_settings()['ALIAS']
+    return alias if alias in settings.DATABASES else None
+
+
+def backup_database(source_path, target_path, synced_at):
+    """
+    用 SQLite 备份 API 把主库完整复制到副本文件，并在副本中记录同步时间 synced_at
+    （备份开始的时间，副本至少包含该时刻之前提交的数据）
+    """
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path)
+    try:
+        source.backup(target)
+        with target:
+            target.execute(f'CREATE TABLE IF NOT EXISTS {SYNC_TABLE} (synced_at REAL NOT NULL)')
+            target.execute(f'DELETE FROM {SYNC_TABLE}')
+            target.execute(f'INSERT INTO {SYNC_TABLE} (synced_at) VALUES (?)', [synced_at])
+    finally:
+        target.close()
+        source.close()
+
+
+def refresh_replica():
+    """
+    刷新副本，返回同步时间
+    """
+    alias = replica_alias()
+    if alias is None:
+        raise ValueError('DATABASES 中没有配置只读副本')
+    source_path = connections[DEFAULT_DB_ALIAS].settings_dict['NAME']
+    target_path = connections[alias].settings_dict['NAME']
+    synced_at = time.time()
+    if str(source_path) == str(target_path):
+        # 副本与主库是同一个数据库（如测试时 TEST['MIRROR']），无需复制
+        return synced_at
+    started = time.perf_counter()
+    backup_database(source_path, target_path, synced_at)
+    metrics.observe('voting_replica_refresh_seconds', time.perf_counter() - started)
+    replica_status.reset()
+    return synced_at
+
+
+def read_synced_at(alias):
+    """
+    从副本读取同步时间；副本尚未刷新过时返回 None
+    """
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute(f'SELECT synced_at FROM {SYNC_TABLE}')
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    return row[0] if row else None
+
+
+class ReplicaStatus:
+    """
+    副本同步时间，在进程内缓存 CHECK_INTERVAL 秒，避免每个请求都查询副本
+    """
+
+    def __init__(self):
+        self._synced_at = None
+        self._checked = None
+        self._lock = threading.Lock()
+
+    def synced_at(self):
+        interval = get_replica_settings()['CHECK_INTERVAL']
+        with self._lock:
+            if self._checked is None or time.monotonic() - self._checked > interval:
+                self._synced_at = read_synced_at(get_replica_settings()['ALIAS'])
+                self._checked = time.monotonic()
+            return self._synced_at
+
+    def reset(self):
+        with self._lock:
+            self._checked = None
+
+
+replica_status = ReplicaStatus()
+
+
+def pin_to_primary(user_id):
+    """
+    用户写入后调用：在副本同步到本次写入之前，该用户的只读视图读主库（读己之写）
+    """
+    if user_id is None:
+        return
+    pin_users_to_primary([user_id])
+
+
+def pin_users_to_primary(user_ids):
+    """
+    同 pin_to_primary，用于一次写入影响多个用户的情况（如管理员删除选票后的各个投票人）
+    """
+    if not user_ids or replica_alias() is None:
+        return
+    pinned_at = time.time()
+    get_pin_cache().set_many(
+        {PIN_KEY.format(user_id): pinned_at for user_id in user_ids},
+        get_replica_settings()['MAX_LAG'],
+    )
+
+
+def read_alias_for(user_id=None):
+    """
+    当前请求的只读查询应使用的数据库：副本足够新且用户没有未同步的写入时返回副本别名，
+    否则返回 None（读主库）
+    """
+    alias = replica_alias()
+    if alias is None:
+        return None
+    synced_at = replica_status.synced_at()
+    if synced_at is None or time.time() - synced_at > get_replica_settings()['MAX_LAG']:
+        metrics.inc('voting_replica_reads_total', db='primary', reason='lag')
+        return None
+    if user_id is not None:
+        pinned_at = get_pin_cache().get(PIN_KEY.format(user_id))
+        if pinned_at is not None and pinned_at >= synced_at:
+            metrics.inc('voting_replica_reads_total', db='primary', reason='pinned')
+            return None
+    metrics.inc('voting_replica_reads_total', db='replica', reason='fresh')
+    return alias
+
+
+@contextmanager
+def reads_from(alias):
+    """
+    在 with 块内把 elections 模型的读取路由到 alias（None 表示主库）
+    """
+    token = _read_alias.set(alias)
+    try:
+        yield alias
+    finally:
+        _read_alias.reset(token)
+
+
+def use_replica(user_id=None):
+    """
+    在 with 块内从副本读取（副本不可用时仍读主库）
+    """
+    return reads_from(read_alias_for(user_id))
+
+
+def readable_version(version):
+    """
+    当前读取能看到的结果版本（毫秒）。从副本读取且副本早于 version 时返回副本的同步时间：
+    结果缓存的键和 ETag 都以它为准，不会把缺少最新投票的结果当作最新版本缓存；
+    副本刷新后版本前进，客户端随之拿到新结果
+    """
+    if _read_alias.get() is None:
+        return version
+    synced_at = replica_status.synced_at()
+    if synced_at is None:
+        return version
+    return min(version, int(synced_at * 1000))
+
+
+class ReplicaRefresher(threading.Thread):
+    """
+    后台线程：每 interval 秒刷新一次副本
+    """
+
+    def __init__(self, interval=None):
+        super().__init__(name='replica-refresher', daemon=True)
+        self.interval = interval or get_replica_settings()['REFRESH_INTERVAL']
+        self.refreshes = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                refresh_replica()
+                self.refreshes += 1
+            except sqlite3.Error:
+                # 主库或副本暂时被锁：下个周期再试，期间副本变旧时读取自动回退主库
+                pass
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class ReplicaRouter:
+    """
+    读写分离路由：所有写入走主库；use_replica 块内（只读视图）的 elections 模型读取走副本
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is not None and model._meta.app_label in get_replica_settings()['APPS']:
+            return alias
+        return None
+
+    def db_for_write(self, model, **hints):
+        # 从副本读出的对象保存时也写主库
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # 副本是主库的完整拷贝，两边的对象可以互相关联
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # 副本的表结构随备份一起复制，不单独迁移
+        if db == get_replica_settings()['ALIAS']:
+            return False
+        return None
@@ -0,0 +1,155 @@
+from collections import defaultdict
+from operator import attrgetter, itemgetter
+
+from django.db.models import Count, Prefetch, prefetch_related_objects
+
+from .models import CandidateTally, ElectionCandidate, Vote, roster_only
+
+# 结果页面用到的候选人字段：不读取简介、纲领等大文本字段，结果缓存也随之变小
+RESULT_CANDIDATE_FIELDS = ('full_name', 'party', 'color', 'light_color', 'photo', 'photo_renditions')
+# 投票页的候选人卡片还要显示简介
+BALLOT_CANDIDATE_FIELDS = (*RESULT_CANDIDATE_FIELDS, 'bio')
+
+# 结果接口可以返回的字段（v2 接口通过 fields 参数选择）
+API_CANDIDATE_FIELDS = ('id', 'full_name', 'party', 'color')
+API_FIELDS = (*API_CANDIDATE_FIELDS, 'votes', 'percentage', 'rank', 'tied')
+DEFAULT_API_FIELDS = ('id', 'full_name', 'votes', 'percentage', 'rank')
+# v1 接口保持原有格式：按选票顺序排列，不含名次
+V1_API_FIELDS = ('id', 'full_name', 'votes', 'percentage')
+
+
+def roster_prefetch(fields=RESULT_CANDIDATE_FIELDS):
+    """
+    预取选举候选人名单（连同候选人）的 Prefetch 对象，fields 为 None 时读取候选人全部字段
+    """
+    queryset = ElectionCandidate.objects.select_related('candidate')
+    if fields is not None:
+        queryset = queryset.only(*roster_only(fields))
+    return Prefetch('roster', queryset=queryset)
+
+
+def count_votes(election_ids=None, from_votes=False):
+    """
+    一次分组查询统计所有选举的得票数。
+    返回 {election_id: {candidate_id: 票数}}
+    from_votes=True 时直接对原始 Vote 表做 GROUP BY (election_id, candidate_id)，
+    否则读取计票汇总表。
+    """
+    if from_votes:
+        qs = (
+            Vote.objects.order_by()
+            .values_list('election_id', 'candidate_id')
+            .annotate(n=Count('id'))
+        )
+    else:
+        qs = CandidateTally.objects.values_list('election_id', 'candidate_id', 'votes')
+    if election_ids is not None:
+        qs = qs.filter(election_id__in=list(election_ids))
+
+    counts = defaultdict(dict)
+    for election_id, candidate_id, votes in qs:
+        counts[election_id][candidate_id] = votes
+    return counts
+
+
+def build_standings(candidates, votes, key=attrgetter('id')):
+    """
+    根据候选人列表和 {candidate_id: 票数} 生成排名表。
+    票数相同的候选人名次相同（如 1, 1, 3），并标记 tied。
+    key 从候选人取出 id（候选人为 values() 字典时传 itemgetter('id')）。
+    """
+    total_votes = sum(votes.get(key(c), 0) for c in candidates)
+    standings = []
+    for candidate in candidates:
+        vote_count = votes.get(key(candidate), 0)
+        percentage = 0
+        if total_votes > 0:
+            percentage = (vote_count / total_votes) * 100
+        standings.append({
+            'candidate': candidate,
+            'vote_count': vote_count,
+            'percentage': percentage,
+        })
+
+    # 稳定排序，票数相同时保持候选人原有顺序
+    standings.sort(key=lambda x: x['vote_count'], reverse=True)
+
+    tie_counts = defaultdict(int)
+    for row in standings:
+        tie_counts[row['vote_count']] += 1
+
+    rank = 0
+    previous = None
+    for position, row in enumerate(standings, start=1):
+        if row['vote_count'] != previous:
+            rank = position
+            previous = row['vote_count']
+        row['rank'] = rank
+        row['tied'] = tie_counts[row['vote_count']] > 1
+
+    return standings, total_votes
+
+
+def election_standings(election, candidates=None):
+    """
+    计算单个选举的排名表，返回 (standings, total_votes)
+    """
+    if candidates is None:
+        candidates = election.ballot(RESULT_CANDIDATE_FIELDS)
+    votes = count_votes([election.id]).get(election.id, {})
+    return build_standings(candidates, votes)
+
+
+def all_standings(elections):
+    """
+    一次分组查询计算多个选举的排名表，每个选举只包含其名单上的候选人。
+    返回 [{'election', 'results', 'total_votes'}]，顺序与 elections 一致。
+    """
+    elections = list(elections)
+    prefetch_related_objects(elections, roster_prefetch())
+    counts = count_votes([e.id for e in elections])
+
+    data = []
+    for election in elections:
+        standings, total_votes = build_standings(election.ballot(), counts.get(election.id, {}))
+        data.append({
+            'election': election,
+            'results': standings,
+            'total_votes': total_votes,
+        })
+    return data
+
+
+def api_standings(election_ids):
+    """
+    结果接口用的排名表：名单用 values_list 读取，不实例化模型，也不读取接口用不到的字段。
+    返回 {election_id: (rows, total_votes)}，rows 按名次排列，为包含 API_FIELDS 的普通字典，
+    另有 position（候选人在选票上的位置），v1 接口据此恢复选票顺序。
+    """
+    election_ids = list(election_ids)
+    rosters = defaultdict(list)
+    roster = ElectionCandidate.objects.filter(election_id__in=election_ids).values_list(
+        'election_id', *(f'candidate__{f}' for f in API_CANDIDATE_FIELDS)
+    )
+    for election_id, *values in roster:
+        candidate = dict(zip(API_CANDIDATE_FIELDS, values))
+        candidate['position'] = len(rosters[election_id])
+        rosters[election_id].append(candidate)
+    counts = count_votes(election_ids)
+
+    data = {}
+    for election_id in election_ids:
+        standings, total_votes = build_standings(
+            rosters[election_id], counts.get(election_id, {}), key=itemgetter('id')
+        )
+        data[election_id] = ([
+            {
+                **row['candidate'],
+                'votes': row['vote_count'],
+                'percentage': row['percentage'],
+                'rank': row['rank'],
+                'tied': row['tied'],
+            }
+            for row in standings
+        ], total_votes)
+    return data
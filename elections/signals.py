@@ -0,0 +1,88 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .cache import CANDIDATE_FRAGMENTS, ELECTION_FRAGMENTS, bump_catalog_version, invalidate_fragments
+from .models import Candidate, Election, ElectionCandidate, Vote
+from .renditions import schedule_renditions
+from .voted import voted_registry
+
+
+@receiver(pre_delete, sender=Candidate)
+@receiver(pre_delete, sender=User)
+def votes_cascading(sender, instance, **kwargs):
+    """
+    删除候选人或用户前先删除相关选票，按组扣减计票（见 VoteQuerySet.delete）。
+    Vote 本身不注册删除信号，级联删除时不会逐行加载选票、逐行更新计票。
+    同一次删除中的多个对象共享的选票只会被第一个处理到的对象删除和扣减一次
+    """
+    field = 'candidate' if sender is Candidate else 'voter'
+    Vote.objects.filter(**{field: instance}).delete()
+
+
+@receiver(post_delete, sender=Election)
+def election_deleted(sender, instance, **kwargs):
+    """
+    选举被删除时选票与计票表随之级联删除，丢弃其已投票位图
+    """
+    voted_registry.forget(instance.pk)
+
+
+@receiver(post_save, sender=Election)
+@receiver(post_delete, sender=Election)
+@receiver(post_save, sender=Candidate)
+@receiver(post_delete, sender=Candidate)
+@receiver(post_save, sender=ElectionCandidate)
+@receiver(post_delete, sender=ElectionCandidate)
+def results_catalog_changed(sender, instance, **kwargs):
+    """
+    选举、候选人或候选人名单变化时使结果缓存失效
+    """
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=Candidate)
+@receiver(post_delete, sender=Candidate)
+def candidate_changed(sender, instance, **kwargs):
+    """
+    候选人信息变化时（事务提交后）删除其卡片的片段缓存
+    """
+    pk = instance.pk
+    transaction.on_commit(lambda: invalidate_fragments(CANDIDATE_FRAGMENTS, pk))
+
+
+@receiver(post_save, sender=Candidate)
+def candidate_photo_changed(sender, instance, **kwargs):
+    """
+    照片上传或更换后（事务提交后）在后台生成缩略图
+    """
+    if (instance.photo.name or '') != instance.photo_renditions.get('source', ''):
+        pk = instance.pk
+        transaction.on_commit(lambda: schedule_renditions(pk))
+
+
+@receiver(post_save, sender=Election)
+@receiver(post_delete, sender=Election)
+def election_changed(sender, instance, **kwargs):
+    """
+    选举信息变化时（事务提交后）删除选举标题区的片段缓存
+    """
+    pk = instance.pk
+    transaction.on_commit(lambda: invalidate_fragments(ELECTION_FRAGMENTS, pk))
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """
+    打开 SQLite 连接时应用 settings.SQLITE_PRAGMAS（生产配置档）。
+    只用于主库：只读副本由备份整体覆盖，不应在其上切换 WAL 等写入性设置
+    """
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    if connection.vendor != 'sqlite' or connection.alias != DEFAULT_DB_ALIAS or not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,168 @@
+import datetime
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncMinute
+from django.utils import timezone
+
+from .cache import bump_results_version
+from .models import CandidateTally, Election, ElectionTally, TurnoutBucket, Vote
+from .voted import forget_voters
+
+
+def _increment(model, lookup, field, amount):
+    """
+    原子地累加计数字段；行不存在时创建（仅当 amount 为正）
+    """
+    if model.objects.filter(**lookup).update(**{field: F(field) + amount}):
+        return
+    if amount <= 0:
+        # 减票时行已被级联删除，无需处理
+        return
+    obj, created = model.objects.get_or_create(**lookup, defaults={field: amount})
+    if not created:
+        model.objects.filter(pk=obj.pk).update(**{field: F(field) + amount})
+
+
+def _apply_counts(counts, turnout):
+    """
+    把增量写入计票表：counts {(election_id, candidate_id): 增量}，
+    turnout {(election_id, minute): 增量}。每组一条 UPDATE，与选票张数无关
+    """
+    election_totals = Counter()
+    for (election_id, candidate_id), amount in counts.items():
+        if not amount:
+            continue
+        _increment(
+            CandidateTally,
+            {'election_id': election_id, 'candidate_id': candidate_id},
+            'votes',
+            amount,
+        )
+        election_totals[election_id] += amount
+
+    for election_id, amount in election_totals.items():
+        if amount:
+            _increment(ElectionTally, {'election_id': election_id}, 'total_votes', amount)
+    for (election_id, minute), amount in turnout.items():
+        if amount:
+            _increment(
+                TurnoutBucket,
+                {'election_id': election_id, 'minute': minute},
+                'votes',
+                amount,
+            )
+
+    # 事务提交后再递增结果版本，避免缓存未提交的计票
+    changed = [eid for eid, amount in election_totals.items() if amount]
+    if changed:
+        transaction.on_commit(lambda: bump_results_version(*changed))
+
+
+def record_votes(counts, at=None):
+    """
+    批量更新计票表及投票率分钟统计。
+    counts: {(election_id, candidate_id): 票数增量}
+    at: 投票时间（默认当前时间），决定计入哪一分钟
+    须在写入 Vote 的同一事务内调用。
+    """
+    minute = (at or timezone.now()).replace(second=0, microsecond=0)
+    turnout = Counter()
+    for (election_id, candidate_id), amount in counts.items():
+        turnout[(election_id, minute)] += amount
+    _apply_counts(counts, turnout)
+
+
+def retract_votes(votes):
+    """
+    从计票表中扣除一批即将删除的选票，按 (选举, 候选人) 和 (选举, 分钟) 聚合，
+    用两次分组查询和每组一条 UPDATE 完成。返回这些选票的 [(election_id, voter_id)]。
+    须在删除选票的同一事务内、删除之前调用。
+    """
+    votes = votes.order_by()
+    counts = Counter()
+    turnout = Counter()
+    rows = (
+        votes.annotate(minute=TruncMinute('voted_at', tzinfo=datetime.timezone.utc))
+        .values('election_id', 'candidate_id', 'minute')
+        .annotate(n=Count('id'))
+    )
+    for row in rows:
+        counts[(row['election_id'], row['candidate_id'])] -= row['n']
+        turnout[(row['election_id'], row['minute'])] -= row['n']
+    _apply_counts(counts, turnout)
+    return list(votes.values_list('election_id', 'voter_id'))
+
+
+@contextmanager
+def retracting(votes):
+    """
+    在 with 块内删除 votes：进入时扣减计票，与删除在同一事务内；
+    提交后清除这些投票人的已投票状态，使其可以重新投票
+    """
+    with transaction.atomic(using=votes.db):
+        voters = retract_votes(votes)
+        yield
+    forget_voters(voters)
+
+
+def record_vote(election_id, candidate_id, amount=1, at=None):
+    """
+    为单张选票更新计票表
+    """
+    record_votes({(election_id, candidate_id): amount}, at=at)
+
+
+@transaction.atomic
+def rebuild_tallies(election_ids=None):
+    """
+    根据原始 Vote 记录重建计票表，返回重建的选举数量
+    """
+    elections = Election.objects.all()
+    votes = Vote.objects.all()
+    if election_ids:
+        elections = elections.filter(id__in=election_ids)
+        votes = votes.filter(election_id__in=election_ids)
+    election_ids = list(elections.values_list('id', flat=True))
+
+    CandidateTally.objects.filter(election_id__in=election_ids).delete()
+    ElectionTally.objects.filter(election_id__in=election_ids).delete()
+    TurnoutBucket.objects.filter(election_id__in=election_ids).delete()
+
+    totals = Counter()
+    candidate_tallies = []
+    rows = (
+        votes.order_by()
+        .values('election_id', 'candidate_id')
+        .annotate(n=Count('id'))
+    )
+    for row in rows:
+        totals[row['election_id']] += row['n']
+        candidate_tallies.append(CandidateTally(
+            election_id=row['election_id'],
+            candidate_id=row['candidate_id'],
+            votes=row['n'],
+        ))
+
+    CandidateTally.objects.bulk_create(candidate_tallies, batch_size=1000)
+    ElectionTally.objects.bulk_create(
+        [ElectionTally(election_id=eid, total_votes=totals[eid]) for eid in election_ids],
+        batch_size=1000,
+    )
+    turnout = (
+        votes.order_by()
+        .annotate(bucket=TruncMinute('voted_at', tzinfo=datetime.timezone.utc))
+        .values('election_id', 'bucket')
+        .annotate(n=Count('id'))
+    )
+    TurnoutBucket.objects.bulk_create(
+        [
+            TurnoutBucket(election_id=row['election_id'], minute=row['bucket'], votes=row['n'])
+            for row in turnout.iterator()
+        ],
+        batch_size=1000,
+    )
+    transaction.on_commit(lambda: bump_results_version(*election_ids))
+    return len(election_ids)
@@ -1,10 +1,53 @@
-from django.test import TestCase, Client
-from django.contrib.auth.models import User
+from asgiref.sync import async_to_sync
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.http import Http404
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, TransactionTestCase, Client, override_settings
+from django.contrib.auth.models import AnonymousUser, User
 from django.urls import reverse
 from django.utils import timezone
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection
+from django.test.utils import CaptureQueriesContext
+from django.contrib.admin import site as admin_site
 from datetime import timedelta
+from io import BytesIO, StringIO
+import asyncio
+import csv
+import gc
+import gzip
+import importlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from unittest import mock
 
-from .models import Election, Candidate, Vote
+from PIL import Image
+
+from .cache import bump_catalog_version, bump_results_version, combine_versions, election_results_version
+from .export import export_chunks
+from .ingest import Ballot, IngestPending, IngestUnavailable, VoteIngestor, flush_ballots
+from . import metrics, urls as election_urls, views
+from .middleware import profile_aggregates
+from .signals import apply_sqlite_pragmas
+from .tallies import rebuild_tallies, record_votes
+from .voted import VotedBitmap, VotedRegistry, get_voted_elections, voted_registry
+from .live import ResultsBroadcaster
+from .models import Election, Candidate, ElectionCandidate, Vote, CandidateTally, TurnoutBucket
+from .renditions import RENDITION_RE, build_renditions
+from .ratelimit import CacheLimiter, TokenBucketLimiter, memory_limiter, parse_rate, rate_limit_ip
+from .recount import count_range_readonly, recount, split_range
+from .replica import (
+    PIN_KEY, ReplicaRouter, backup_database, read_alias_for, readable_version, reads_from,
+    replica_status,
+)
+from .results import all_standings, api_standings, count_votes, election_standings
 
 class ModelCreationTest(TestCase):
 
@@ -28,6 +71,7 @@ class ModelCreationTest(TestCase):
             end_date=timezone.now() + timedelta(days=1),
             is_active=True
         )
+        self.election.candidates.add(self.candidate)
 
     def test_models_created(self):
         self.assertEqual(Candidate.objects.count(), 1)
@@ -59,6 +103,7 @@ class VoteModelTest(TestCase):
             end_date=timezone.now() + timedelta(days=1),
             is_active=True
         )
+        self.election.candidates.add(self.candidate)
 
     def test_unique_vote_constraint(self):
         Vote.objects.create(
@@ -76,6 +121,8 @@ class VoteModelTest(TestCase):
 class VoteViewTest(TestCase):
 
     def setUp(self):
+        voted_registry.clear()
+        memory_limiter.clear()
         self.client = Client()
 
         self.voter = User.objects.create_user(
@@ -102,6 +149,7 @@ class VoteViewTest(TestCase):
             end_date=timezone.now() + timedelta(days=1),
             is_active=True
         )
+        self.election.candidates.add(self.candidate)
 
         self.vote_url = reverse(
             'elections:vote',
@@ -112,6 +160,18 @@ class VoteViewTest(TestCase):
         response = self.client.post(self.vote_url)
         self.assertEqual(response.status_code, 302)
 
+    def test_vote_for_candidate_off_roster_rejected(self):
+        other = Candidate.objects.create(
+            user=User.objects.create_user(username='other'),
+            full_name='Other',
+            bio='Bio',
+            program='Program'
+        )
+        self.client.login(username='voter', password='testpass')
+        response = self.client.post(reverse('elections:vote', args=[self.election.id, other.id]))
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Vote.objects.exists())
+
     def test_user_can_vote_once(self):
         self.client.login(username='voter', password='testpass')
 
@@ -120,3 +180,1892 @@ class VoteViewTest(TestCase):
 
         response = self.client.post(self.vote_url)
         self.assertEqual(Vote.objects.count(), 1)
+
+    def test_repeat_vote_rejected_without_vote_queries(self):
+        self.client.login(username='voter', password='testpass')
+        self.client.post(self.vote_url)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                self.vote_url, HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+            )
+        self.assertFalse(response.json()['success'])
+        self.assertFalse(any('elections_' in q['sql'] for q in queries))
+
+    def test_unknown_election_does_not_load_bitmap(self):
+        self.client.login(username='voter', password='testpass')
+        missing = self.election.id + 1000
+        response = self.client.post(reverse('elections:vote', args=[missing, self.candidate.id]))
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn(missing, voted_registry._sets)
+
+    def test_integrity_error_maps_to_already_voted(self):
+        # 模拟并发：另一请求已写入，但本进程位图尚未记录
+        Vote.objects.create(
+            voter=self.voter,
+            candidate=self.candidate,
+            election=self.election
+        )
+        voted_registry.clear()
+        voted_registry.has_voted(self.election.id, 0)
+        voted_registry.unmark(self.election.id, self.voter.id)
+
+        self.client.login(username='voter', password='testpass')
+        response = self.client.post(
+            self.vote_url, HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        self.assertEqual(response.json(), {'success': False, 'message': '您已经投过票了'})
+        self.assertTrue(voted_registry.has_voted(self.election.id, self.voter.id))
+
+    def test_deleted_vote_allows_revote(self):
+        self.client.login(username='voter', password='testpass')
+        self.client.post(self.vote_url)
+        Vote.objects.all().delete()
+
+        self.client.post(self.vote_url)
+        self.assertEqual(Vote.objects.count(), 1)
+class TallyTest(TestCase):
+
+    def setUp(self):
+        voted_registry.clear()
+        memory_limiter.clear()
+        self.client = Client()
+
+        self.voter = User.objects.create_user(
+            username='voter',
+            password='testpass'
+        )
+
+        self.candidate_user = User.objects.create_user(
+            username='candidate',
+            password='testpass'
+        )
+
+        self.candidate = Candidate.objects.create(
+            user=self.candidate_user,
+            full_name='Candidate',
+            bio='Bio',
+            program='Program'
+        )
+
+        self.election = Election.objects.create(
+            title='Election',
+            description='Desc',
+            start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=1),
+            is_active=True
+        )
+        self.election.candidates.add(self.candidate)
+
+        self.vote_url = reverse(
+            'elections:vote',
+            args=[self.election.id, self.candidate.id]
+        )
+
+    def test_vote_updates_tally(self):
+        self.client.login(username='voter', password='testpass')
+        self.client.post(self.vote_url)
+
+        self.assertEqual(self.election.total_votes, 1)
+        self.assertEqual(self.candidate.get_votes_count(self.election), 1)
+        self.assertEqual(self.candidate.get_vote_percentage(self.election), 100)
+
+    def test_deleting_vote_decrements_tally(self):
+        self.client.login(username='voter', password='testpass')
+        self.client.post(self.vote_url)
+
+        Vote.objects.all().delete()
+        self.assertEqual(
+            CandidateTally.objects.get(election=self.election).votes, 0
+        )
+        self.assertEqual(Election.objects.get(pk=self.election.pk).total_votes, 0)
+
+    def add_candidate_with_votes(self, name, count):
+        candidate = Candidate.objects.create(
+            user=User.objects.create_user(username=name),
+            full_name=name,
+            bio='Bio',
+            program='Program'
+        )
+        self.election.candidates.add(candidate)
+        for i in range(count):
+            Vote.objects.create(
+                voter=User.objects.create_user(username=f'{name}-voter{i}'),
+                candidate=candidate,
+                election=self.election
+            )
+        record_votes({(self.election.id, candidate.id): count})
+        return candidate
+
+    def test_cascade_delete_adjusts_tallies_in_constant_queries(self):
+        few = self.add_candidate_with_votes('few', 2)
+        many = self.add_candidate_with_votes('many', 20)
+        kept = self.add_candidate_with_votes('kept', 3)
+
+        with CaptureQueriesContext(connection) as few_queries:
+            few.delete()
+        with CaptureQueriesContext(connection) as many_queries:
+            many.delete()
+        self.assertEqual(len(few_queries), len(many_queries))
+
+        self.assertEqual(Election.objects.get(pk=self.election.pk).total_votes, 3)
+        self.assertEqual(kept.get_votes_count(self.election), 3)
+        self.assertEqual(
+            sum(TurnoutBucket.objects.filter(election=self.election).values_list('votes', flat=True)), 3
+        )
+
+    def test_deleting_voter_and_candidate_counts_shared_vote_once(self):
+        Vote.objects.create(voter=self.candidate_user, candidate=self.candidate, election=self.election)
+        Vote.objects.create(voter=self.voter, candidate=self.candidate, election=self.election)
+        record_votes({(self.election.id, self.candidate.id): 2})
+        other = self.add_candidate_with_votes('other', 1)
+
+        # 候选人给自己投票：删除用户时该选票同时属于被删除的用户和候选人
+        User.objects.filter(pk__in=[self.candidate_user.pk, self.voter.pk]).delete()
+        self.assertEqual(Election.objects.get(pk=self.election.pk).total_votes, 1)
+        self.assertEqual(other.get_votes_count(self.election), 1)
+
+    def test_rebuild_tallies(self):
+        Vote.objects.create(
+            voter=self.voter,
+            candidate=self.candidate,
+            election=self.election
+        )
+        self.assertEqual(self.election.total_votes, 0)
+
+        call_command('rebuild_tallies', stdout=StringIO())
+        self.assertEqual(Election.objects.get(pk=self.election.pk).total_votes, 1)
+        self.assertEqual(self.candidate.get_votes_count(self.election), 1)
+class ResultsServiceTest(TestCase):
+
+    def setUp(self):
+        self.candidates = []
+        for name in ['A', 'B', 'C']:
+            user = User.objects.create_user(username=name, password='testpass')
+            self.candidates.append(Candidate.objects.create(
+                user=user,
+                full_name=name,
+                bio='Bio',
+                program='Program'
+            ))
+
+        self.election = self.create_election('Election')
+
+    def create_election(self, title):
+        election = Election.objects.create(
+            title=title,
+            description='Desc',
+            start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=1),
+            is_active=True
+        )
+        for position, candidate in enumerate(self.candidates, start=1):
+            ElectionCandidate.objects.create(
+                election=election, candidate=candidate, ballot_order=position
+            )
+        return election
+
+    def cast(self, election, candidate, count):
+        for i in range(count):
+            voter = User.objects.create_user(username=f'v{election.id}-{candidate.id}-{i}')
+            Vote.objects.create(voter=voter, candidate=candidate, election=election)
+        call_command('rebuild_tallies', stdout=StringIO())
+
+    def test_standings_rank_and_ties(self):
+        a, b, c = self.candidates
+        self.cast(self.election, a, 2)
+        self.cast(self.election, c, 2)
+        self.cast(self.election, b, 1)
+
+        standings, total_votes = election_standings(self.election)
+        self.assertEqual(total_votes, 5)
+        self.assertEqual(
+            [(r['candidate'], r['rank'], r['tied']) for r in standings],
+            [(a, 1, True), (c, 1, True), (b, 3, False)]
+        )
+        self.assertEqual(standings[0]['percentage'], 40)
+
+    def test_tally_and_raw_counts_agree(self):
+        self.cast(self.election, self.candidates[0], 3)
+        self.assertEqual(count_votes(), count_votes(from_votes=True))
+
+    def test_results_query_count_is_constant(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as one_election:
+            self.client.get(reverse('elections:results'))
+
+        for i in range(3):
+            election = self.create_election(f'Election {i}')
+            self.cast(election, self.candidates[i], 1)
+
+        cache.clear()
+        with CaptureQueriesContext(connection) as many_elections:
+            response = self.client.get(reverse('elections:results'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(one_election), len(many_elections))
+
+    def test_standings_use_election_roster(self):
+        a, b, c = self.candidates
+        other = self.create_election('Other')
+        ElectionCandidate.objects.filter(election=self.election, candidate=a).delete()
+        ElectionCandidate.objects.filter(election=self.election, candidate=c).update(ballot_order=0)
+
+        standings, _ = election_standings(self.election)
+        self.assertEqual([r['candidate'] for r in standings], [c, b])
+
+        data = all_standings(Election.objects.filter(id__in=[self.election.id, other.id]).order_by('id'))
+        self.assertEqual([len(d['results']) for d in data], [2, 3])
+
+    def test_build_rosters_from_votes(self):
+        a, b, c = self.candidates
+        self.cast(self.election, c, 1)
+        self.cast(self.election, a, 2)
+        # 已结束的选举按投票生成名单；进行中的选举（即使没有投票）列入全部候选人
+        Election.objects.filter(pk=self.election.pk).update(
+            is_active=False, end_date=timezone.now() - timedelta(days=1)
+        )
+        open_election = self.create_election('Open')
+        ElectionCandidate.objects.all().delete()
+
+        migration = importlib.import_module('elections.migrations.0006_election_roster')
+        migration.build_rosters(django_apps, None)
+        self.assertEqual(self.election.ballot(), [a, c])
+        self.assertEqual(open_election.ballot(), [a, b, c])
+
+    def test_standings_skip_large_text_fields(self):
+        standings, _ = election_standings(self.election)
+        deferred = standings[0]['candidate'].get_deferred_fields()
+        self.assertIn('bio', deferred)
+        self.assertIn('program', deferred)
+
+        data = all_standings(Election.objects.filter(id=self.election.id))
+        self.assertIn('program', data[0]['results'][0]['candidate'].get_deferred_fields())
+
+    def test_api_standings_match_model_standings(self):
+        a, b, c = self.candidates
+        self.cast(self.election, b, 2)
+        self.cast(self.election, a, 1)
+
+        standings, total_votes = election_standings(self.election)
+        with self.assertNumQueries(2):
+            rows, api_total = api_standings([self.election.id])[self.election.id]
+        self.assertEqual(api_total, total_votes)
+        self.assertEqual(
+            [(r['id'], r['full_name'], r['votes'], r['rank'], r['tied']) for r in rows],
+            [(r['candidate'].id, r['candidate'].full_name, r['vote_count'], r['rank'], r['tied'])
+             for r in standings]
+        )
+
+
+class ResultsCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        voted_registry.clear()
+        memory_limiter.clear()
+        self.client = Client()
+
+        self.voter = User.objects.create_user(
+            username='voter',
+            password='testpass'
+        )
+
+        self.candidate_user = User.objects.create_user(
+            username='candidate',
+            password='testpass'
+        )
+
+        self.candidate = Candidate.objects.create(
+            user=self.candidate_user,
+            full_name='Candidate',
+            bio='Bio',
+            program='Program'
+        )
+
+        self.election = Election.objects.create(
+            title='Election',
+            description='Desc',
+            start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=1),
+            is_active=True
+        )
+        self.election.candidates.add(self.candidate)
+
+        self.api_url = reverse('elections:api_results')
+
+    def test_api_results_not_modified(self):
+        response = self.client.get(self.api_url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertFalse(response.has_header('Last-Modified'))
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.api_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_vote_changes_etag(self):
+        etag = self.client.get(self.api_url)['ETag']
+
+        self.client.login(username='voter', password='testpass')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse(
+                'elections:vote',
+                args=[self.election.id, self.candidate.id]
+            ))
+
+        response = self.client.get(self.api_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['results'][0]['votes'], 1)
+
+    def test_results_page_not_modified(self):
+        url = reverse('elections:results')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_other_election_vote_keeps_version(self):
+        other = Election.objects.create(
+            title='Other',
+            description='Desc',
+            start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=1),
+            is_active=True
+        )
+        version = election_results_version(self.election.id)
+        bump_results_version(other.id)
+        self.assertEqual(election_results_version(self.election.id), version)
+
+        bump_catalog_version()
+        self.assertNotEqual(election_results_version(self.election.id), version)
+class FragmentCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        voted_registry.clear()
+        memory_limiter.clear()
+        self.voter = User.objects.create_user(username='voter', password='testpass')
+        self.candidate = Candidate.objects.create(
+            user=User.objects.create_user(username='candidate'),
+            full_name='Candidate',
+            bio='Bio',
+            program='Program'
+        )
+        self.election = Election.objects.create(
+            title='Election',
+            description='Desc',
+            start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=1),
+            is_active=True
+        )
+        self.election.candidates.add(self.candidate)
+        self.client.force_login(self.voter)
+        self.url = reverse('elections:election_list')
+
+    def test_candidate_card_invalidated_on_save(self):
+        self.client.get(self.url)
+        # 绕过信号的更新不会使片段失效
+        Candidate.objects.filter(pk=self.candidate.pk).update(bio='Changed bio')
+        self.assertNotContains(self.client.get(self.url), 'Changed bio')
+
+        self.candidate.refresh_from_db()
+        self.candidate.bio = 'Saved bio'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.candidate.save()
+        self.assertContains(self.client.get(self.url), 'Saved bio')
+
+    def test_counts_and_voted_state_stay_fresh(self):
+        self.assertContains(self.client.get(self.url), 'onclick="openVoteModal(')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('elections:vote', args=[self.election.id, self.candidate.id]),
+                HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+            )
+        response = self.client.get(self.url)
+        self.assertNotContains(response, 'onclick="openVoteModal(')
+        self.assertContains(response, '1票 (100.0%)')
+
+        # 其他尚未投票的用户仍看到投票按钮
+        other = Client()
+        other.force_login(User.objects.create_user(username='other'))
+        self.assertContains(other.get(self.url), 'onclick="openVoteModal(')
+
+    def test_election_header_invalidated_on_save(self):
+        self.client.get(self.url)
+        self.election.end_date = timezone.now() + timedelta(days=400)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.election.save()
+        expected = timezone.localtime(self.election.end_date).strftime('%Y年%m月%d日')
+        self.assertContains(self.client.get(self.url), expected)
+
+
+class LiveResultsTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+        self.candidate_user = User.objects.create_user(
+            username='candidate',
+            password='testpass'
+        )
+
+        self.candidate = Candidate.objects.create(
+            user=self.candidate_user,
+            full_name='Candidate',
+            bio='Bio',
+            program='Program'
+        )
+
+        self.election = Election.objects.create(
+            title='Election',
+            description='Desc',
+            start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=1),
+            is_active=True
+        )
+        self.election.candidates.add(self.candidate)
+
+    async def test_broadcast_fans_out_one_update(self):
+        broadcaster = ResultsBroadcaster(interval=0.01)
+        first = broadcaster.subscribe(self.election.id)
+        second = broadcaster.subscribe(self.election.id)
+
+        initial = await asyncio.wait_for(first.get(), timeout=2)
+        self.assertIs(initial, await asyncio.wait_for(second.get(), timeout=2))
+        self.assertEqual(initial['results'][0]['id'], self.candidate.id)
+
+        bump_results_version(self.election.id)
+        update = await asyncio.wait_for(first.get(), timeout=2)
+        self.assertIs(update, await asyncio.wait_for(second.get(), timeout=2))
+        self.assertGreater(update['version'], initial['version'])
+
+        broadcaster.unsubscribe(self.election.id, first)
+        broadcaster.unsubscribe(self.election.id, second)
+        self.assertEqual(broadcaster.subscriber_count(self.election.id), 0)
+
+    async def test_stream_sends_results_event(self):
+        url = reverse('elections:results_stream', args=[self.election.id])
+        response = await self.async_client.get(url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        chunks = response.streaming_content
+        self.assertEqual(await chunks.__anext__(), b'retry: 3000\n\n')
+        event = (await chunks.__anext__()).decode()
+        await chunks.aclose()
+
+        self.assertTrue(event.startswith('id: '))
+        data = json.loads(event.split('data: ', 1)[1])
+        self.assertEqual(data['election_id'], self.election.id)
+
+    def test_stream_unavailable_under_wsgi(self):
+        url = reverse('elections:results_stream', args=[self.election.id])
+        self.assertEqual(self.client.get(url).status_code, 204)
+class VotedBitmapTest(TestCase):
+
+    def test_add_and_discard(self):
+        bitmap = VotedBitmap()
+        self.assertNotIn(5, bitmap)
+        bitmap.add(5)
+        bitmap.add(1000003)
+        self.assertIn(5, bitmap)
+        self.assertIn(1000003, bitmap)
+        self.assertNotIn(4, bitmap)
+        bitmap.discard(5)
+        self.assertNotIn(5, bitmap)
+        self.assertIn(1000003, bitmap)
+
+    @override_settings(VOTED_SET_TTL=0)
+    def test_stale_bitmap_refreshed_in_background(self):
+        loaded = threading.Event()
+
+        class Registry(VotedRegistry):
+            loads = 0
+
+            def _load(self, election_id):
+                self.loads += 1
+                bitmap = VotedBitmap()
+                if self.loads > 1:
+                    bitmap.add(7)
+                    loaded.set()
+                return bitmap
+
+        registry = Registry()
+        self.assertFalse(registry.has_voted(1, 7))
+        # 位图过期：请求仍用旧位图立即返回，新位图在后台线程中加载
+        self.assertFalse(registry.has_voted(1, 7))
+        self.assertTrue(loaded.wait(2))
+        for thread in threading.enumerate():
+            if thread.name == 'voted-refresh-1':
+                thread.join()
+        self.assertTrue(registry.has_voted_cached(1, 7))
+class GroupCommitTest(TestCase):
+
+    def setUp(self):
+        self.voters = [
+            User.objects.create_user(username=f'voter{i}', password='testpass')
+            for i in range(3)
+        ]
+
+        self.candidate_user = User.objects.create_user(
+            username='candidate',
+            password='testpass'
+        )
+
+        self.candidate = Candidate.objects.create(
+            user=self.candidate_user,
+            full_name='Candidate',
+            bio='Bio',
+            program='Program'
+        )
+
+        self.election = Election.objects.create(
+            title='Election',
+            description='Desc',
+            start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=1),
+            is_active=True
+        )
+        self.election.candidates.add(self.candidate)
+
+    def test_flush_rejects_duplicates(self):
+        Vote.objects.create(
+            voter=self.voters[0],
+            candidate=self.candidate,
+            election=self.election
+        )
+        ballots = [
+            Ballot(voter.id, self.election.id, self.candidate.id)
+            for voter in self.voters + [self.voters[1]]
+        ]
+
+        self.assertEqual(flush_ballots(ballots), 2)
+        self.assertEqual(
+            [b.accepted for b in ballots],
+            [False, True, True, False]
+        )
+        self.assertEqual(Vote.objects.count(), 3)
+        self.assertEqual(
+            CandidateTally.objects.get(election=self.election).votes, 2
+        )
+
+    def test_timeout_withdraws_queued_ballot(self):
+        ingestor = StalledIngestor()
+        with self.assertRaises(IngestUnavailable):
+            ingestor.submit(self.voters[0].id, self.election.id, self.candidate.id, timeout=0.01)
+        # 撤回的选票不会被写入线程提交
+        self.assertEqual(ingestor._claim(ingestor._collect()), [])
+
+    def test_timeout_after_claim_is_pending(self):
+        ingestor = StalledIngestor()
+        claimer = threading.Thread(target=lambda: ingestor._claim([ingestor.queue.get()]))
+        claimer.start()
+        with self.assertRaises(IngestPending):
+            ingestor.submit(self.voters[0].id, self.election.id, self.candidate.id, timeout=0.2)
+        claimer.join()
+
+    def test_batch_error_raised_per_waiter(self):
+        ballots = [Ballot(voter.id, self.election.id, self.candidate.id) for voter in self.voters[:2]]
+        ingestor = StalledIngestor()
+        cause = DatabaseError('database is locked')
+        errors = []
+
+        def submit(ballot):
+            try:
+                ingestor.submit(ballot.voter_id, ballot.election_id, ballot.candidate_id)
+            except IngestUnavailable as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=submit, args=[ballot]) for ballot in ballots]
+        for thread in threads:
+            thread.start()
+        batch = ingestor._claim([ingestor.queue.get(), ingestor.queue.get()])
+        for ballot in batch:
+            ballot.error = cause
+            ballot.done.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(errors), 2)
+        self.assertIsNot(errors[0], errors[1])
+        self.assertTrue(all(exc.__cause__ is cause for exc in errors))
+
+
+class StalledIngestor(VoteIngestor):
+    """
+    不启动写入线程的管道，测试中手动认领和完成选票
+    """
+
+    def start(self):
+        pass
+
+
+class GroupCommitPipelineTest(TransactionTestCase):
+
+    def test_submit_waits_for_batch_commit(self):
+        voter = User.objects.create_user(username='voter', password='testpass')
+        candidate = Candidate.objects.create(
+            user=User.objects.create_user(username='candidate'),
+            full_name='Candidate',
+            bio='Bio',
+            program='Program'
+        )
+        election = Election.objects.create(
+            title='Election',
+            description='Desc',
+            start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=1),
+            is_active=True
+        )
+        election.candidates.add(candidate)
+
+        ingestor = VoteIngestor(batch_size=10, max_wait=0.01)
+        self.assertTrue(ingestor.submit(voter.id, election.id, candidate.id))
+        self.assertFalse(ingestor.submit(voter.id, election.id, candidate.id))
+        self.assertEqual(Vote.objects.count(), 1)
+        self.assertEqual(ingestor.ballots, 2)
+
+    @override_settings(VOTE_INGEST={'ENABLED': True})
+    def test_vote_view_uses_pipeline(self):
+        voted_registry.clear()
+        User.objects.create_user(username='voter', password='testpass')
+        candidate = Candidate.objects.create(
+            user=User.objects.create_user(username='candidate'),
+            full_name='Candidate',
+            bio='Bio',
+            program='Program'
+        )
+        election = Election.objects.create(
+            title='Election',
+            description='Desc',
+            start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=1),
+            is_active=True
+        )
+        election.candidates.add(candidate)
+        self.client.login(username='voter', password='testpass')
+        url = reverse('elections:vote', args=[election.id, candidate.id])
+
+        response = self.client.post(url, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertTrue(response.json()['success'])
+        response = self.client.post(url, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertFalse(response.json()['success'])
+        self.assertEqual(election.total_votes, 1)
+
+
+class SQLiteProfileTest(TestCase):
+
+    @override_settings(SQLITE_PRAGMAS={'cache_size': -4096, 'busy_timeout': 1234})
+    def test_pragmas_applied_on_connect(self):
+        apply_sqlite_pragmas(sender=None, connection=connection)
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], -4096)
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 1234)
+
+    @override_settings(SQLITE_PRAGMAS={'journal_mode': 'WAL'})
+    def test_pragmas_skip_replica(self):
+        class ReplicaConnection:
+            vendor = 'sqlite'
+            alias = 'replica'
+
+            def cursor(self):
+                raise AssertionError('副本连接不应执行 PRAGMA')
+
+        apply_sqlite_pragmas(sender=None, connection=ReplicaConnection())
+
+
+class LoadTestCommandTest(TransactionTestCase):
+
+    def test_reports_json_per_endpoint(self):
+        voted_registry.clear()
+        out = StringIO()
+        call_command('loadtest', voters=5, reads=4, concurrency=1, stdout=out)
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(report['votes_recorded'], 5)
+        self.assertEqual(
+            set(report['endpoints']), {'vote', 'api_results', 'results'}
+        )
+        vote = report['endpoints']['vote']
+        self.assertEqual(vote['requests'], 5)
+        for key in ['p50_ms', 'p95_ms', 'p99_ms', 'queries_per_request', 'lock_errors']:
+            self.assertIn(key, vote)
+        # 默认清理生成的数据
+        self.assertFalse(Election.objects.exists())
+
+
+class SampleDataCommandTest(TestCase):
+
+    def test_generates_requested_scale(self):
+        call_command(
+            'create_sample_data',
+            elections=2, candidates=4, voters=50, votes=80, batch_size=16, seed=1,
+            stdout=StringIO()
+        )
+        self.assertEqual(Election.objects.count(), 2)
+        self.assertEqual(Candidate.objects.count(), 4)
+        self.assertEqual(Vote.objects.count(), 80)
+        self.assertEqual(
+            sorted(e.total_votes for e in Election.objects.all()), [40, 40]
+        )
+        for election in Election.objects.all():
+            for vote in Vote.objects.filter(election=election)[:5]:
+                self.assertTrue(election.start_date <= vote.voted_at <= election.end_date)
+        self.assertEqual(count_votes(), count_votes(from_votes=True))
+
+    def test_rejects_more_votes_than_voters(self):
+        with self.assertRaises(CommandError):
+            call_command('create_sample_data', voters=2, votes=5, stdout=StringIO())
+
+
+@override_settings(
+    MIDDLEWARE=settings.MIDDLEWARE + ['elections.middleware.RequestProfilingMiddleware']
+)
+class RequestProfilingTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        profile_aggregates.reset()
+        self.staff = User.objects.create_user(
+            username='staff',
+            password='testpass',
+            is_staff=True
+        )
+        Election.objects.create(
+            title='Election',
+            description='Desc',
+            start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=1),
+            is_active=True
+        )
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('elections:results'))
+        timing = response['Server-Timing']
+        for metric in ['view;dur=', 'sql;dur=', 'sqlmax;dur=', 'tpl;dur=']:
+            self.assertIn(metric, timing)
+
+    def test_aggregates_endpoint_is_staff_only(self):
+        self.client.get(reverse('elections:api_results'))
+        self.client.get(reverse('elections:api_results'))
+
+        url = reverse('elections:profile_stats')
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.login(username='staff', password='testpass')
+        stats = self.client.get(url).json()['views']
+        self.assertEqual(stats['elections:api_results']['requests'], 2)
+        self.assertGreater(stats['elections:api_results']['avg_queries'], 0)
+
+
+class MetricsTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        voted_registry.clear()
+        metrics.reset()
+
+        User.objects.create_user(
+            username='voter',
+            password='testpass'
+        )
+
+        self.candidate = Candidate.objects.create(
+            user=User.objects.create_user(username='candidate'),
+            full_name='Candidate',
+            bio='Bio',
+            program='Program'
+        )
+
+        self.election = Election.objects.create(
+            title='Election',
+            description='Desc',
+            start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=1),
+            is_active=True
+        )
+        self.election.candidates.add(self.candidate)
+
+    def test_metrics_exposition(self):
+        url = reverse('elections:vote', args=[self.election.id, self.candidate.id])
+        self.client.login(username='voter', password='testpass')
+        self.client.post(url)
+        self.client.post(url)
+        self.client.get(url)
+        self.client.get(reverse('elections:api_results'))
+        self.client.get(reverse('elections:api_results'))
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        eid = self.election.id
+        self.assertIn(f'voting_votes_total{{election="{eid}",result="accepted"}} 1', body)
+        self.assertIn(f'voting_votes_total{{election="{eid}",result="already_voted"}} 1', body)
+        self.assertIn('voting_votes_total{election="unknown",result="bad_method"} 1', body)
+        self.assertNotIn(f'voting_votes_total{{election="{eid}",result="bad_method"}}', body)
+        self.assertIn(
+            'voting_request_duration_seconds_count{view="elections:api_results"} 2', body
+        )
+        self.assertIn('voting_request_duration_seconds_bucket{view="elections:vote",le="+Inf"} 3', body)
+        self.assertIn('voting_results_cache_hit_ratio 0.5', body)
+        self.assertIn('voting_db_queries_total{view="elections:api_results"}', body)
+
+    def test_counters_merge_across_threads(self):
+        def work():
+            for _ in range(100):
+                metrics.inc('voting_votes_total', election=1, result='accepted')
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        counters, _ = metrics.collect()
+        key = ('voting_votes_total', (('election', 1), ('result', 'accepted')))
+        self.assertEqual(counters[key], 400)
+
+    def test_finished_threads_do_not_keep_shards(self):
+        def work():
+            metrics.inc('voting_votes_total', election=1, result='accepted')
+            metrics.observe('voting_request_duration_seconds', 0.02, view='v')
+
+        before = len(metrics._shards)
+        for _ in range(50):
+            thread = threading.Thread(target=work)
+            thread.start()
+            thread.join()
+        gc.collect()
+
+        # 已结束线程的分片被合并后移除，数据不丢失
+        self.assertLessEqual(len(metrics._shards), before + 1)
+        counters, histograms = metrics.collect()
+        self.assertEqual(counters[('voting_votes_total', (('election', 1), ('result', 'accepted')))], 50)
+        self.assertEqual(histograms[('voting_request_duration_seconds', (('view', 'v'),))][-1], 50)
+
+
+class AdminChangelistTest(TestCase):
+
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(
+            username='admin',
+            password='adminpass'
+        )
+        self.client.force_login(self.admin_user)
+
+        self.candidates = [
+            Candidate.objects.create(
+                user=User.objects.create_user(username=f'candidate{i}'),
+                full_name=f'Candidate {i}',
+                bio='Bio',
+                program='Program'
+            )
+            for i in range(2)
+        ]
+        self.elections = [
+            Election.objects.create(
+                title=f'Election {i}',
+                description='Desc',
+                start_date=timezone.now(),
+                end_date=timezone.now() + timedelta(days=1),
+                is_active=True
+            )
+            for i in range(2)
+        ]
+
+    def add_votes(self, count):
+        start = User.objects.count()
+        voters = User.objects.bulk_create([
+            User(username=f'voter{start + i}') for i in range(count)
+        ])
+        Vote.objects.bulk_create([
+            Vote(
+                voter=voter,
+                election=self.elections[i % 2],
+                candidate=self.candidates[i % 2],
+            )
+            for i, voter in enumerate(voters)
+        ])
+        rebuild_tallies()
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_changelist_query_budget(self):
+        urls = [
+            reverse('admin:elections_election_changelist'),
+            reverse('admin:elections_candidate_changelist'),
+            reverse('admin:elections_vote_changelist'),
+            reverse('admin:elections_vote_changelist') + f'?election__id__exact={self.elections[0].id}',
+        ]
+        self.add_votes(4)
+        # 先请求一次，使会话和用户进入缓存
+        self.client.get(urls[0])
+        small = [self.changelist_queries(url)[0] for url in urls]
+        self.add_votes(40)
+        large = [self.changelist_queries(url)[0] for url in urls]
+
+        # 查询数与行数无关，且在预算之内
+        self.assertEqual(small, large)
+        for count in large:
+            self.assertLessEqual(count, 10)
+
+    def test_election_total_votes_annotated(self):
+        self.add_votes(5)
+        _, response = self.changelist_queries(reverse('admin:elections_election_changelist'))
+        totals = {e.id: e.vote_total for e in response.context['cl'].result_list}
+        self.assertEqual(totals, {self.elections[0].id: 3, self.elections[1].id: 2})
+
+    def test_vote_keyset_pagination(self):
+        self.add_votes(5)
+        vote_admin = admin_site._registry[Vote]
+        vote_admin.list_per_page = 2
+        try:
+            base = reverse('admin:elections_vote_changelist')
+            url = base
+            seen = []
+            while url:
+                _, response = self.changelist_queries(url)
+                cl = response.context['cl']
+                self.assertEqual(cl.result_count, 5)
+                seen += [vote.id for vote in cl.result_list]
+                url = cl.next_page_url and base + cl.next_page_url
+        finally:
+            del vote_admin.list_per_page
+
+        self.assertEqual(seen, list(Vote.objects.order_by('-id').values_list('id', flat=True)))
+
+    def test_vote_search_uses_bounded_count(self):
+        self.add_votes(3)
+        voter = Vote.objects.first().voter
+        _, response = self.changelist_queries(
+            reverse('admin:elections_vote_changelist') + f'?q={voter.username}'
+        )
+        cl = response.context['cl']
+        self.assertEqual(cl.result_count, 1)
+        self.assertEqual([vote.voter_id for vote in cl.result_list], [voter.id])
+
+
+class ExplainCommandTest(TestCase):
+
+    def test_plans_use_indexes(self):
+        election = Election.objects.create(
+            title='Election',
+            description='Desc',
+            start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=1),
+            is_active=True
+        )
+        out = StringIO()
+        call_command('explain', '--check', '--timing', '--repeat', '1', election=election.id, stdout=out)
+        output = out.getvalue()
+        for name in ('results_from_votes', 'turnout_timeline', 'ip_audit', 'duplicate_check'):
+            self.assertIn(name, output)
+        self.assertIn('vote_election_candidate_idx', output)
+        self.assertIn('vote_election_time_idx', output)
+        self.assertIn('vote_election_ip_idx', output)
+
+
+class TurnoutTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.candidate = Candidate.objects.create(
+            user=User.objects.create_user(username='candidate'),
+            full_name='Candidate',
+            bio='Bio',
+            program='Program'
+        )
+        self.election = Election.objects.create(
+            title='Election',
+            description='Desc',
+            start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=1),
+            is_active=True
+        )
+        self.election.candidates.add(self.candidate)
+        self.start = timezone.make_aware(timezone.datetime(2024, 3, 1, 9, 0))
+
+    def cast(self, minutes):
+        # minutes: 相对 self.start 的分钟偏移，每个偏移一张选票
+        for offset in minutes:
+            voter = User.objects.create_user(username=f'voter{User.objects.count()}')
+            moment = self.start + timedelta(minutes=offset, seconds=30)
+            vote = Vote.objects.create(voter=voter, candidate=self.candidate, election=self.election)
+            Vote.objects.filter(pk=vote.pk).update(voted_at=moment)
+            record_votes({(self.election.id, self.candidate.id): 1}, at=moment)
+
+    def get_series(self, resolution):
+        response = self.client.get(
+            reverse('elections:turnout', args=[self.election.id]),
+            {'resolution': resolution}
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_downsampling(self):
+        self.cast([0, 0, 1, 59, 60, 61, 24 * 60])
+
+        minute = self.get_series('minute')
+        self.assertEqual(minute['total_votes'], 7)
+        self.assertEqual([p['votes'] for p in minute['series']], [2, 1, 1, 1, 1, 1])
+
+        hour = self.get_series('hour')
+        self.assertEqual([p['votes'] for p in hour['series']], [4, 2, 1])
+        self.assertEqual([p['cumulative'] for p in hour['series']], [4, 6, 7])
+        self.assertTrue(hour['series'][0]['time'].startswith('2024-03-01T09:00:00'))
+
+        day = self.get_series('day')
+        self.assertEqual([p['votes'] for p in day['series']], [6, 1])
+
+    def test_rebuild_and_delete_match_incremental(self):
+        self.cast([0, 5, 5, 90])
+        incremental = self.get_series('minute')['series']
+
+        rebuild_tallies([self.election.id])
+        self.assertEqual(self.get_series('minute')['series'], incremental)
+
+        Vote.objects.filter(voted_at__gte=self.start + timedelta(minutes=90)).delete()
+        self.assertEqual(
+            list(TurnoutBucket.objects.filter(election=self.election, votes__gt=0)
+                 .order_by('minute').values_list('votes', flat=True)),
+            [1, 2]
+        )
+
+    def test_query_count_independent_of_votes(self):
+        self.cast([0, 1])
+        with CaptureQueriesContext(connection) as few:
+            self.get_series('hour')
+        self.cast([1] * 20)
+        with CaptureQueriesContext(connection) as many:
+            self.get_series('hour')
+        self.assertEqual(len(few), len(many))
+        self.assertFalse(any('elections_vote' in q['sql'] for q in many.captured_queries))
+
+    def test_invalid_resolution(self):
+        response = self.client.get(
+            reverse('elections:turnout', args=[self.election.id]),
+            {'resolution': 'week'}
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class VoteExportTest(TestCase):
+
+    def setUp(self):
+        self.staff = User.objects.create_user(username='staff', password='staffpass', is_staff=True)
+        self.candidate = Candidate.objects.create(
+            user=User.objects.create_user(username='candidate'),
+            full_name='Candidate',
+            bio='Bio',
+            program='Program'
+        )
+        self.election = Election.objects.create(
+            title='Election',
+            description='Desc',
+            start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=1),
+            is_active=True
+        )
+        self.election.candidates.add(self.candidate)
+        self.url = reverse('elections:export_votes', args=[self.election.id])
+        self.client.force_login(self.staff)
+
+    def cast(self, count):
+        start = User.objects.count()
+        voters = User.objects.bulk_create([
+            User(username=f'voter{start + i}') for i in range(count)
+        ])
+        Vote.objects.bulk_create([
+            Vote(voter=voter, candidate=self.candidate, election=self.election, ip_address='10.0.0.1')
+            for voter in voters
+        ])
+
+    def export(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_csv_export(self):
+        self.cast(3)
+        rows = list(csv.reader(self.export().decode().splitlines()))
+        self.assertEqual(rows[0], ['id', 'voter_id', 'voter', 'candidate_id', 'candidate', 'voted_at', 'ip_address'])
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1][4], 'Candidate')
+        self.assertEqual(rows[1][6], '10.0.0.1')
+
+    def test_ndjson_gzip_export(self):
+        self.cast(5)
+        lines = gzip.decompress(self.export(format='ndjson', gzip='1')).decode().splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual(len(records), 5)
+        self.assertEqual(
+            [r['id'] for r in records],
+            list(Vote.objects.order_by('id').values_list('id', flat=True))
+        )
+
+    def test_asgi_export_streams_chunk_by_chunk(self):
+        self.cast(6)
+        produced = []
+
+        def counting_chunks(election, fmt):
+            for chunk in export_chunks(election, fmt, chunk_size=2):
+                produced.append(chunk)
+                yield chunk
+
+        async def first_two_chunks():
+            response = await self.async_client.get(self.url)
+            chunks = response.streaming_content
+            first = await chunks.__anext__()
+            seen = len(produced)
+            second = await chunks.__anext__()
+            await chunks.aclose()
+            return first, seen, second
+
+        self.async_client.force_login(self.staff)
+        with mock.patch.object(views, 'export_chunks', counting_chunks):
+            first, seen, second = async_to_sync(first_two_chunks)()
+        # 发送第一块时后面的块尚未生成
+        self.assertTrue(first.startswith(b'id,voter_id'))
+        self.assertEqual(seen, 1)
+        self.assertEqual(len(produced), 2)
+        self.assertEqual(len(second.splitlines()), 2)
+
+    def test_query_count_independent_of_size(self):
+        self.cast(2)
+        self.export()
+        with CaptureQueriesContext(connection) as few:
+            self.export()
+        self.cast(30)
+        with CaptureQueriesContext(connection) as many:
+            self.export()
+        self.assertEqual(len(few), len(many))
+
+    def test_staff_only(self):
+        User.objects.create_user(username='voter', password='testpass')
+        self.client.login(username='voter', password='testpass')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+
+    def test_command_writes_gzip_file(self):
+        self.cast(4)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'votes.csv.gz')
+            call_command('export_votes', self.election.id, '--gzip', '--output', path, '--chunk-size', '2')
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                self.assertEqual(len(f.read().splitlines()), 5)
+
+    def test_command_writes_to_given_stdout(self):
+        self.cast(3)
+        out = StringIO()
+        call_command('export_votes', self.election.id, '--format', 'ndjson', stdout=out)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(len(rows), 3)
+
+        with self.assertRaises(CommandError):
+            call_command('export_votes', self.election.id, '--gzip', stdout=StringIO())
+
+
+class RecountTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.candidates = [
+            Candidate.objects.create(
+                user=User.objects.create_user(username=f'candidate{i}'),
+                full_name=f'Candidate {i}',
+                bio='Bio',
+                program='Program'
+            )
+            for i in range(2)
+        ]
+        self.election = Election.objects.create(
+            title='Election',
+            description='Desc',
+            start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=1),
+            is_active=True
+        )
+        self.election.candidates.add(*self.candidates)
+        voters = User.objects.bulk_create([User(username=f'voter{i}') for i in range(7)])
+        Vote.objects.bulk_create([
+            Vote(voter=voter, candidate=self.candidates[i % 2], election=self.election)
+            for i, voter in enumerate(voters)
+        ])
+        rebuild_tallies()
+
+    def test_split_range(self):
+        self.assertEqual(split_range(1, 10, 3), [(1, 4), (5, 8), (9, 10)])
+        self.assertEqual(split_range(5, 5, 4), [(5, 5)])
+        self.assertEqual(split_range(None, None, 4), [])
+
+    def test_recount_matches_tallies(self):
+        counts, stats = recount(workers=3)
+        self.assertEqual(counts, {self.election.id: {self.candidates[0].id: 4, self.candidates[1].id: 3}})
+        self.assertEqual(stats['ranges'], 7)
+
+        out = StringIO()
+        call_command('recount', stdout=out)
+        self.assertIn('一致', out.getvalue())
+
+    def test_mismatch_reported_and_repaired(self):
+        CandidateTally.objects.filter(candidate=self.candidates[0]).update(votes=10)
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('recount', '--json', stdout=out)
+        report = json.loads(out.getvalue())
+        # 页面显示的总票数由计票表求和得出，因此也不一致
+        self.assertEqual(
+            [(m['candidate'], m['recount'], m['tally'], m['displayed']) for m in report['mismatches']],
+            [(self.candidates[0].id, 4, 10, 10), (None, 7, 7, 13)]
+        )
+
+        call_command('recount', '--repair', stdout=StringIO())
+        self.assertEqual(self.candidates[0].get_votes_count(self.election), 4)
+
+    def test_readonly_worker(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'votes.sqlite3')
+            conn = sqlite3.connect(path)
+            conn.execute('CREATE TABLE vote (id INTEGER PRIMARY KEY, election_id, candidate_id)')
+            conn.executemany('INSERT INTO vote VALUES (?, ?, ?)', [(i, 1, i % 2) for i in range(1, 11)])
+            conn.commit()
+            conn.close()
+            rows = count_range_readonly(path, 'vote', 3, 8, [1])
+        self.assertEqual(sorted(rows), [(1, 0, 3), (1, 1, 3)])
+
+
+class AsyncViewsTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        voted_registry.clear()
+        memory_limiter.clear()
+        self.factory = AsyncRequestFactory()
+        self.voter = User.objects.create_user(username='voter', password='testpass')
+        self.candidate = Candidate.objects.create(
+            user=User.objects.create_user(username='candidate'),
+            full_name='Candidate',
+            bio='Bio',
+            program='Program'
+        )
+        self.election = Election.objects.create(
+            title='Election',
+            description='Desc',
+            start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=1),
+            is_active=True
+        )
+        self.election.candidates.add(self.candidate)
+
+    def avote(self, user, candidate_id=None):
+        request = self.factory.post('/', headers={'X-Requested-With': 'XMLHttpRequest'})
+        request.user = user
+        return async_to_sync(views.avote)(request, self.election.id, candidate_id or self.candidate.id)
+
+    def test_avote_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.avote(self.voter)
+        self.assertTrue(json.loads(response.content)['success'])
+        response = self.avote(self.voter)
+        self.assertFalse(json.loads(response.content)['success'])
+        self.assertEqual(Vote.objects.count(), 1)
+        self.assertEqual(self.candidate.get_votes_count(self.election), 1)
+
+    def test_avote_requires_login_and_roster(self):
+        self.assertEqual(self.avote(AnonymousUser()).status_code, 302)
+
+        other = Candidate.objects.create(
+            user=User.objects.create_user(username='other'),
+            full_name='Other',
+            bio='Bio',
+            program='Program'
+        )
+        with self.assertRaises(Http404):
+            self.avote(self.voter, other.id)
+
+    def test_aapi_results_matches_sync_view(self):
+        self.avote(self.voter)
+        request = self.factory.get('/')
+        response = async_to_sync(views.aapi_results)(request)
+        sync_response = self.client.get(reverse('elections:api_results'))
+        self.assertEqual(response['ETag'], sync_response['ETag'])
+        self.assertEqual(json.loads(response.content)['results'], sync_response.json()['results'])
+
+        request = self.factory.get('/', headers={'If-None-Match': response['ETag']})
+        self.assertEqual(async_to_sync(views.aapi_results)(request).status_code, 304)
+
+    def test_async_routes_enabled_by_setting(self):
+        def vote_callback():
+            importlib.reload(election_urls)
+            return next(p.callback for p in election_urls.urlpatterns if p.name == 'vote')
+
+        try:
+            with override_settings(ASYNC_VIEWS=True):
+                self.assertIs(vote_callback(), views.avote)
+        finally:
+            self.assertIs(vote_callback(), views.vote)
+
+
+class RateLimitTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        voted_registry.clear()
+        memory_limiter.clear()
+        self.voters = [
+            User.objects.create_user(username=f'voter{i}', password='testpass') for i in range(3)
+        ]
+        self.candidate = Candidate.objects.create(
+            user=User.objects.create_user(username='candidate'),
+            full_name='Candidate',
+            bio='Bio',
+            program='Program'
+        )
+        self.election = Election.objects.create(
+            title='Election',
+            description='Desc',
+            start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=1),
+            is_active=True
+        )
+        self.election.candidates.add(self.candidate)
+        self.url = reverse('elections:vote', args=[self.election.id, self.candidate.id])
+
+    def post(self, voter, ip='10.0.0.1'):
+        client = Client()
+        client.force_login(voter)
+        return client.post(self.url, HTTP_X_REQUESTED_WITH='XMLHttpRequest', REMOTE_ADDR=ip)
+
+    def test_token_bucket_refills(self):
+        limiter = TokenBucketLimiter()
+        self.assertEqual(parse_rate('2/m'), (2, 60))
+        self.assertEqual(limiter.hit('k', 2, 60, now=0), 0)
+        self.assertEqual(limiter.hit('k', 2, 60, now=0), 0)
+        self.assertAlmostEqual(limiter.hit('k', 2, 60, now=0), 30)
+        self.assertAlmostEqual(limiter.hit('k', 2, 60, now=15), 15)
+        self.assertEqual(limiter.hit('k', 2, 60, now=30), 0)
+
+    def test_token_bucket_memory_is_bounded(self):
+        limiter = TokenBucketLimiter()
+        for i in range(100):
+            limiter.hit(f'ip{i}', 1, 60, max_keys=10, now=0)
+        self.assertEqual(len(limiter), 10)
+        # 最早的键已被淘汰，重新出现时得到满桶
+        self.assertEqual(limiter.hit('ip0', 1, 60, max_keys=10, now=0), 0)
+        self.assertGreater(limiter.hit('ip99', 1, 60, max_keys=10, now=0), 0)
+
+    def test_cache_limiter_sliding_window(self):
+        limiter = CacheLimiter(cache)
+        self.assertEqual(limiter.hit('k', 2, 60, now=60), 0)
+        self.assertEqual(limiter.hit('k', 2, 60, now=61), 0)
+        self.assertAlmostEqual(limiter.hit('k', 2, 60, now=62), 58)
+        # 下一个窗口开始时上一窗口仍按比例计入
+        self.assertGreater(limiter.hit('k', 2, 60, now=125), 0)
+        self.assertEqual(limiter.hit('k', 2, 60, now=175), 0)
+
+    def test_cache_limiter_retry_after_wait_succeeds(self):
+        limiter = CacheLimiter(cache)
+        for _ in range(10):
+            self.assertEqual(limiter.hit('r', 10, 60, now=0), 0)
+        wait = limiter.hit('r', 10, 60, now=61)
+        self.assertAlmostEqual(wait, 5)
+        self.assertGreater(limiter.hit('r', 10, 60, now=61 + wait - 0.5), 0)
+        self.assertEqual(limiter.hit('r', 10, 60, now=61 + wait), 0)
+
+    @override_settings(VOTE_RATE_LIMIT={'IP_RATE': '2/m', 'USER_RATE': None})
+    def test_ip_limit_returns_429_before_any_query(self):
+        self.assertEqual(self.post(self.voters[0]).status_code, 200)
+        self.assertEqual(self.post(self.voters[1]).status_code, 200)
+
+        client = Client()
+        client.force_login(self.voters[2])
+        with self.assertNumQueries(0):
+            response = client.post(self.url, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        counters, _ = metrics.collect()
+        self.assertIn(('voting_votes_total', (('election', 'unknown'), ('result', 'rate_limited'))), counters)
+        self.assertEqual(self.post(self.voters[2], ip='10.0.0.2').status_code, 200)
+        self.assertEqual(Vote.objects.count(), 3)
+
+    @override_settings(VOTE_RATE_LIMIT={'IP_RATE': '1/m', 'USER_RATE': None})
+    def test_forwarded_for_is_not_trusted_by_default(self):
+        client = Client()
+        client.force_login(self.voters[0])
+        client.post(self.url, REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='1.1.1.1')
+        client.force_login(self.voters[1])
+        # 伪造不同的 X-Forwarded-For 不能绕过按 IP 的限额
+        response = client.post(self.url, REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='2.2.2.2')
+        self.assertEqual(response.status_code, 429)
+
+    def test_proxy_hops(self):
+        request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='6.6.6.6, 3.3.3.3')
+        self.assertEqual(rate_limit_ip(request), '10.0.0.1')
+        with override_settings(VOTE_RATE_LIMIT={'PROXY_HOPS': 1}):
+            self.assertEqual(rate_limit_ip(request), '3.3.3.3')
+        with override_settings(VOTE_RATE_LIMIT={'PROXY_HOPS': 3}):
+            self.assertEqual(rate_limit_ip(request), '10.0.0.1')
+
+    @override_settings(VOTE_RATE_LIMIT={'IP_RATE': None, 'USER_RATE': '1/h'})
+    def test_user_limit(self):
+        self.post(self.voters[0])
+        response = self.post(self.voters[0], ip='10.0.0.2')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(int(response['Retry-After']), 3600)
+        self.assertEqual(self.post(self.voters[1]).status_code, 200)
+
+    def test_per_election_override(self):
+        limits = {'IP_RATE': '100/m', 'ELECTIONS': {self.election.id: {'IP_RATE': '1/m'}}}
+        with override_settings(VOTE_RATE_LIMIT=limits):
+            self.assertEqual(self.post(self.voters[0]).status_code, 200)
+            self.assertEqual(self.post(self.voters[1]).status_code, 429)
+
+    @override_settings(VOTE_RATE_LIMIT={'IP_RATE': '1/m', 'CACHE': 'default'})
+    def test_shared_cache_backend(self):
+        self.assertEqual(self.post(self.voters[0]).status_code, 200)
+        self.assertEqual(self.post(self.voters[1]).status_code, 429)
+        self.assertEqual(len(memory_limiter), 0)
+
+    @override_settings(VOTE_RATE_LIMIT={'IP_RATE': '1/m'})
+    def test_async_vote_is_limited(self):
+        factory = AsyncRequestFactory()
+        responses = []
+        for voter in self.voters[:2]:
+            request = factory.post(
+                '/', headers={'X-Requested-With': 'XMLHttpRequest'}, REMOTE_ADDR='10.0.0.1'
+            )
+            request.user = voter
+            responses.append(async_to_sync(views.avote)(request, self.election.id, self.candidate.id))
+        self.assertEqual([r.status_code for r in responses], [200, 429])
+
+
+@override_settings(PHOTO_RENDITIONS={'WIDTHS': (64, 128), 'ASYNC': False})
+class PhotoRenditionTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = override_settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.candidate = Candidate.objects.create(
+            user=User.objects.create_user(username='candidate'),
+            full_name='Candidate',
+            bio='Bio',
+            program='Program'
+        )
+        self.election = Election.objects.create(
+            title='Election',
+            description='Desc',
+            start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=1),
+            is_active=True
+        )
+        self.election.candidates.add(self.candidate)
+
+    def upload(self, color, size=(300, 200)):
+        buffer = BytesIO()
+        Image.new('RGB', size, color).save(buffer, format='PNG')
+        self.candidate.photo = SimpleUploadedFile('photo.png', buffer.getvalue(), content_type='image/png')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.candidate.save()
+        self.candidate.refresh_from_db()
+
+    def test_renditions_generated_on_upload(self):
+        self.upload('red')
+        renditions = self.candidate.photo_renditions
+        self.assertEqual(renditions['source'], self.candidate.photo.name)
+        self.assertEqual([w for w, _ in renditions['webp']], [64, 128])
+        for width, name in renditions['webp'] + renditions['jpeg']:
+            self.assertTrue(name.startswith('candidates/'))
+            self.assertRegex(name, RENDITION_RE)
+            with default_storage.open(name) as f:
+                self.assertEqual(Image.open(f).size, (width, width))
+
+        srcset = self.candidate.photo_webp_srcset
+        self.assertIn('.64.', srcset)
+        self.assertTrue(srcset.endswith(' 128w'))
+
+        response = self.client.get(reverse('elections:election_list'))
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, 'sizes="100px"')
+
+    def test_replacing_photo_removes_old_renditions(self):
+        self.upload('red')
+        old = [name for _, name in self.candidate.photo_renditions['jpeg']]
+        self.upload('blue')
+        new = [name for _, name in self.candidate.photo_renditions['jpeg']]
+        self.assertNotEqual(old, new)
+        self.assertFalse(any(default_storage.exists(name) for name in old))
+        self.assertTrue(all(default_storage.exists(name) for name in new))
+
+    def test_stale_renditions_not_used(self):
+        self.upload('red')
+        Candidate.objects.filter(pk=self.candidate.pk).update(photo='candidates/other.png')
+        self.candidate.refresh_from_db()
+        self.assertEqual(self.candidate.photo_jpeg_srcset, '')
+
+    def test_backfill_command(self):
+        buffer = BytesIO()
+        Image.new('RGB', (40, 40), 'green').save(buffer, format='JPEG')
+        name = default_storage.save('candidates/existing.jpg', BytesIO(buffer.getvalue()))
+        Candidate.objects.filter(pk=self.candidate.pk).update(photo=name)
+
+        out = StringIO()
+        call_command('build_renditions', '--workers', '1', stdout=out)
+        self.assertIn('生成 1 组缩略图', out.getvalue())
+        self.candidate.refresh_from_db()
+        # 原图小于所有尺寸时只生成最小的一档
+        self.assertEqual([w for w, _ in self.candidate.photo_renditions['webp']], [64])
+        self.assertFalse(build_renditions(self.candidate.pk))
+
+    def test_renditions_served_immutable(self):
+        self.upload('red')
+        _, name = self.candidate.photo_renditions['webp'][0]
+        response = views.serve_media(RequestFactory().get('/'), name)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+        response = views.serve_media(RequestFactory().get('/'), self.candidate.photo.name)
+        self.assertFalse(response.has_header('Cache-Control'))
+
+
+class StaticPipelineTest(TestCase):
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        override = override_settings(
+            STATIC_ROOT=root.name,
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'elections.storage.CompressedManifestStaticFilesStorage'},
+            },
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        self.root = root.name
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(self.root, 'staticfiles.json')) as f:
+            self.manifest = json.load(f)['paths']
+
+    def test_collectstatic_hashes_and_precompresses(self):
+        hashed = self.manifest['elections/style.css']
+        self.assertRegex(hashed, r'^elections/style\.[0-9a-f]{12}\.css$')
+        with open(os.path.join(self.root, hashed), 'rb') as f:
+            original = f.read()
+        with gzip.open(os.path.join(self.root, hashed + '.gz')) as f:
+            self.assertEqual(f.read(), original)
+
+    def test_serves_precompressed_with_immutable_cache(self):
+        hashed = self.manifest['elections/index.js']
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        response = views.serve_static(request, hashed)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(response['Content-Type'].startswith('text/javascript'))
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+        response = views.serve_static(RequestFactory().get('/'), hashed)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        response = views.serve_static(RequestFactory().get('/'), 'elections/index.js')
+        self.assertFalse(response.has_header('Cache-Control'))
+
+    def test_pages_have_no_inline_css_or_js(self):
+        self.client.force_login(User.objects.create_user(username='voter'))
+        for url in (reverse('elections:election_list'), reverse('elections:results'), reverse('login')):
+            content = self.client.get(url).content.decode()
+            self.assertNotIn('<style', content)
+            self.assertNotRegex(content, r'<script>')
+            self.assertRegex(content, r'/static/elections/style\.[0-9a-f]{12}\.css')
+
+
+class SessionVoteStatusTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        voted_registry.clear()
+        memory_limiter.clear()
+        self.voter = User.objects.create_user(username='voter', password='testpass')
+        self.candidate = Candidate.objects.create(
+            user=User.objects.create_user(username='candidate'),
+            full_name='Candidate',
+            bio='Bio',
+            program='Program'
+        )
+        self.election = Election.objects.create(
+            title='Election',
+            description='Desc',
+            start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=1),
+            is_active=True
+        )
+        self.election.candidates.add(self.candidate)
+        self.client.login(username='voter', password='testpass')
+        self.url = reverse('elections:election_list')
+
+    def tables_queried(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        sql = ' '.join(q['sql'] for q in queries.captured_queries)
+        return response, {t for t in ('django_session', 'auth_user', 'elections_vote') if f'"{t}"' in sql}
+
+    def vote(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('elections:vote', args=[self.election.id, self.candidate.id]),
+                HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+            )
+
+    def test_vote_status_without_queries(self):
+        # 用户对象每个请求都从数据库读取，会话和投票状态来自缓存
+        self.client.get(self.url)
+        response, tables = self.tables_queried()
+        self.assertFalse(response.context['has_voted'])
+        self.assertEqual(tables, {'auth_user'})
+
+        self.vote()
+        response, tables = self.tables_queried()
+        self.assertTrue(response.context['has_voted'])
+        self.assertEqual(response.context['vote_timestamp'], Vote.objects.get().voted_at)
+        self.assertEqual(tables, {'auth_user'})
+
+    def test_deleted_vote_clears_status(self):
+        self.client.get(self.url)
+        self.vote()
+        Vote.objects.get().delete()
+        response, _ = self.tables_queried()
+        self.assertFalse(response.context['has_voted'])
+        self.assertEqual(get_voted_elections(self.voter.id), {})
+
+    def test_deactivation_takes_effect_immediately(self):
+        self.client.get(self.url)
+        # QuerySet.update() 不发信号，停用仍须在下一个请求生效
+        User.objects.filter(pk=self.voter.pk).update(is_active=False)
+        response = self.client.get(self.url)
+        self.assertFalse(response.context['user'].is_authenticated)
+
+
+class ResultsApiV2Test(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.candidates = [
+            Candidate.objects.create(
+                user=User.objects.create_user(username=name),
+                full_name=name,
+                party='Party',
+                bio='Bio',
+                program='Program'
+            )
+            for name in ['A', 'B']
+        ]
+        self.elections = []
+        for i in range(3):
+            election = Election.objects.create(
+                title=f'Election {i}',
+                description='Desc',
+                start_date=timezone.now(),
+                end_date=timezone.now() + timedelta(days=1),
+                is_active=(i == 0)
+            )
+            election.candidates.add(*self.candidates)
+            self.elections.append(election)
+        voter = User.objects.create_user(username='voter')
+        Vote.objects.create(voter=voter, candidate=self.candidates[1], election=self.elections[1])
+        call_command('rebuild_tallies', stdout=StringIO())
+
+        self.url = reverse('elections:api_results_v2')
+
+    def test_many_elections_in_one_request(self):
+        ids = f'{self.elections[1].id},{self.elections[2].id},9999'
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, {'election_ids': ids, 'fields': 'id,votes'})
+        data = response.json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([e['id'] for e in data['elections']], [self.elections[1].id, self.elections[2].id])
+        self.assertEqual(data['elections'][0]['total_votes'], 1)
+        self.assertEqual(
+            data['elections'][0]['results'][0], {'id': self.candidates[1].id, 'votes': 1}
+        )
+
+        # 结果已缓存：只需确认选举存在
+        with self.assertNumQueries(1):
+            self.client.get(self.url, {'election_ids': ids, 'fields': 'id,votes'})
+
+    def test_defaults_to_current_election(self):
+        data = self.client.get(self.url).json()
+        self.assertEqual([e['id'] for e in data['elections']], [self.elections[0].id])
+        v1 = self.client.get(reverse('elections:api_results')).json()['results']
+        self.assertEqual(
+            sorted(r['id'] for r in data['elections'][0]['results']), sorted(r['id'] for r in v1)
+        )
+        self.assertIn('rank', data['elections'][0]['results'][0])
+
+    def test_v1_keeps_ballot_order_without_rank(self):
+        voter = User.objects.create_user(username='voter0')
+        Vote.objects.create(voter=voter, candidate=self.candidates[1], election=self.elections[0])
+        call_command('rebuild_tallies', stdout=StringIO())
+
+        v1 = self.client.get(reverse('elections:api_results')).json()['results']
+        self.assertEqual([r['id'] for r in v1], [c.id for c in self.candidates])
+        self.assertEqual(sorted(v1[0]), ['full_name', 'id', 'percentage', 'votes'])
+        self.assertEqual([r['votes'] for r in v1], [0, 1])
+
+    def test_invalid_parameters(self):
+        for params in ({'fields': 'id,bio'}, {'election_ids': 'x'}, {'election_ids': ''}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 400)
+            self.assertFalse(response.json()['success'])
+
+        with override_settings(API_MAX_ELECTIONS=2):
+            response = self.client.get(self.url, {'election_ids': '1,2,3'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_etag_depends_on_fields_and_results(self):
+        params = {'election_ids': self.elections[2].id, 'fields': 'id,votes'}
+        etag = self.client.get(self.url, params)['ETag']
+        response = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(self.url, {**params, 'fields': 'id'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        bump_results_version(self.elections[2].id)
+        response = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_async_view_matches_sync_view(self):
+        params = {'election_ids': f'{self.elections[0].id},{self.elections[1].id}'}
+        request = AsyncRequestFactory().get('/', params)
+        response = async_to_sync(views.aapi_results_v2)(request)
+        sync_response = self.client.get(self.url, params)
+        self.assertEqual(response['ETag'], sync_response['ETag'])
+        self.assertEqual(json.loads(response.content), sync_response.json())
+
+
+@override_settings(READ_REPLICA={'ALIAS': 'default', 'MAX_LAG': 5, 'CHECK_INTERVAL': 0})
+class ReadReplicaTest(TestCase):
+    # 测试环境没有单独的副本：把主库别名当作副本，只验证路由与回退逻辑
+
+    def setUp(self):
+        cache.clear()
+        voted_registry.clear()
+        memory_limiter.clear()
+        replica_status.reset()
+        self.voter = User.objects.create_user(username='voter', password='testpass')
+        self.candidate = Candidate.objects.create(
+            user=User.objects.create_user(username='candidate'),
+            full_name='Candidate',
+            bio='Bio',
+            program='Program'
+        )
+        self.election = Election.objects.create(
+            title='Election',
+            description='Desc',
+            start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=1),
+            is_active=True
+        )
+        self.election.candidates.add(self.candidate)
+
+    def mark_synced(self, seconds_ago=0):
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TABLE IF NOT EXISTS replica_sync (synced_at REAL NOT NULL)')
+            cursor.execute('DELETE FROM replica_sync')
+            cursor.execute('INSERT INTO replica_sync (synced_at) VALUES (%s)', [time.time() - seconds_ago])
+        replica_status.reset()
+
+    def test_backup_copies_database_and_sync_time(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source_path = os.path.join(tmp, 'primary.sqlite3')
+            target_path = os.path.join(tmp, 'replica.sqlite3')
+            with sqlite3.connect(source_path) as source:
+                source.execute('CREATE TABLE t (x INTEGER)')
+                source.execute('INSERT INTO t VALUES (1), (2)')
+            source.close()
+
+            backup_database(source_path, target_path, 123.5)
+            target = sqlite3.connect(target_path)
+            try:
+                self.assertEqual(target.execute('SELECT COUNT(*) FROM t').fetchone()[0], 2)
+                self.assertEqual(target.execute('SELECT synced_at FROM replica_sync').fetchone()[0], 123.5)
+            finally:
+                target.close()
+
+    def test_falls_back_to_primary_when_stale_or_pinned(self):
+        # 副本从未同步
+        self.assertIsNone(read_alias_for())
+
+        self.mark_synced(seconds_ago=60)
+        self.assertIsNone(read_alias_for())
+
+        self.mark_synced()
+        self.assertEqual(read_alias_for(self.voter.id), 'default')
+
+        # 投票后该用户读主库，其他用户仍读副本
+        time.sleep(0.01)
+        self.client.login(username='voter', password='testpass')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('elections:vote', args=[self.election.id, self.candidate.id]),
+                HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+            )
+        self.assertIsNotNone(cache.get(PIN_KEY.format(self.voter.id)))
+        self.assertIsNone(read_alias_for(self.voter.id))
+        self.assertEqual(read_alias_for(self.candidate.user_id), 'default')
+
+        # 副本同步到投票之后恢复读副本
+        time.sleep(0.01)
+        self.mark_synced()
+        self.assertEqual(read_alias_for(self.voter.id), 'default')
+
+    def test_deleted_vote_pins_voter_to_primary(self):
+        self.client.login(username='voter', password='testpass')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('elections:vote', args=[self.election.id, self.candidate.id]),
+                HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+            )
+        time.sleep(0.01)
+        self.mark_synced()
+        self.assertEqual(read_alias_for(self.voter.id), 'default')
+
+        # 管理员删除选票后，副本同步之前投票人读主库，不会把旧的“已投票”状态重新缓存
+        time.sleep(0.01)
+        Vote.objects.filter(voter=self.voter).delete()
+        self.assertIsNone(read_alias_for(self.voter.id))
+        response = self.client.get(reverse('elections:election_list'))
+        self.assertFalse(response.context['has_voted'])
+        self.assertEqual(get_voted_elections(self.voter.id), {})
+
+    def test_router_sends_writes_to_primary(self):
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Vote))
+        with reads_from('default'):
+            self.assertEqual(router.db_for_read(Vote), 'default')
+            self.assertIsNone(router.db_for_read(User))
+        self.assertEqual(router.db_for_write(Vote), 'default')
+        self.assertFalse(router.allow_migrate('default', 'elections'))
+
+    def test_results_version_limited_to_replica_sync(self):
+        self.mark_synced(seconds_ago=2)
+        synced_ms = int(replica_status.synced_at() * 1000)
+        bump_results_version(self.election.id)
+        version = int(time.time() * 1000)
+
+        self.assertEqual(readable_version(version), version)
+        with reads_from('default'):
+            self.assertEqual(readable_version(version), synced_ms)
+
+        # 只读视图从副本读取时 ETag 以副本的同步时间为准，副本刷新后客户端会拿到新结果
+        response = self.client.get(reverse('elections:api_results'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(str(combine_versions(synced_ms, synced_ms)), response['ETag'])
@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import TurnoutBucket
+
+RESOLUTIONS = ('minute', 'hour', 'day')
+
+
+def truncate(moment, resolution):
+    """
+    将时间截断到指定粒度（按本地时区划分小时和天），返回 (起点, 下一时间段起点)
+    """
+    moment = timezone.localtime(moment).replace(second=0, microsecond=0)
+    step = timedelta(minutes=1)
+    if resolution in ('hour', 'day'):
+        moment = moment.replace(minute=0)
+        step = timedelta(hours=1)
+    if resolution == 'day':
+        moment = moment.replace(hour=0)
+        step = timedelta(days=1)
+    return moment, moment + step
+
+
+def turnout_series(election_id, resolution='minute'):
+    """
+    由分钟统计降采样得到投票率时间序列，开销与分钟桶数量成正比，与票数无关。
+    返回 [{'time', 'votes', 'cumulative'}]，只包含有投票的时间段。
+    """
+    buckets = (
+        TurnoutBucket.objects.filter(election_id=election_id, votes__gt=0)
+        .order_by('minute')
+        .values_list('minute', 'votes')
+    )
+    series = []
+    cumulative = 0
+    boundary = None
+    for minute, votes in buckets.iterator():
+        cumulative += votes
+        # 分钟桶有序，只有越过当前时间段的终点时才需要重新截断
+        if boundary is None or minute >= boundary:
+            moment, boundary = truncate(minute, resolution)
+            series.append({'time': moment, 'votes': 0, 'cumulative': 0})
+        series[-1]['votes'] += votes
+        series[-1]['cumulative'] = cumulative
+    return series
@@ -1,20 +1,42 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
 app_name = 'elections'
 
+# ASGI 部署（voting_system/asgi.py 开启 ASYNC_VIEWS）时投票和结果接口使用异步视图，
+# 等待数据库时不占用线程
+if settings.ASYNC_VIEWS:
+    vote_view, election_results_view, api_results_view, api_results_v2_view = (
+        views.avote, views.aelection_results, views.aapi_results, views.aapi_results_v2
+    )
+else:
+    vote_view, election_results_view, api_results_view, api_results_v2_view = (
+        views.vote, views.election_results, views.api_results, views.api_results_v2
+    )
+
 urlpatterns = [
     path('', views.election_list, name='election_list'),
     path('<int:election_id>/', views.election_detail, name='election_detail'),
     path(
         '<int:election_id>/vote/<int:candidate_id>/',
-        views.vote,
+        vote_view,
         name='vote'
     ),
     # 添加全局结果页面（不需要参数）
     path('results/', views.results, name='results'),
     # 单个选举结果页面（需要参数）
-    path('<int:election_id>/results/', views.election_results, name='election_results'),
+    path('<int:election_id>/results/', election_results_view, name='election_results'),
     # API 接口
-    path('api/results/', views.api_results, name='api_results'),
+    path('api/results/', api_results_view, name='api_results'),
+    # 多选举、可选字段的结果接口
+    path('api/v2/results/', api_results_v2_view, name='api_results_v2'),
+    # 投票率时间序列
+    path('<int:election_id>/turnout/', views.turnout, name='turnout'),
+    # 投票记录导出（仅管理员）
+    path('<int:election_id>/export/', views.export_votes, name='export_votes'),
+    # 实时结果推送 (SSE)
+    path('<int:election_id>/stream/', views.results_stream, name='results_stream'),
+    # 请求分析数据（仅管理员）
+    path('debug/profile/', views.profile_stats, name='profile_stats'),
 ]
@@ -1,11 +1,67 @@
+import hashlib
+import json
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.forms import UserCreationForm  # 注册表单
 from django.contrib.auth import login                  # 登录函数
 from django.contrib import messages
-from django.http import HttpResponseForbidden, JsonResponse
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.db import IntegrityError, transaction
 from django.utils import timezone
-from .models import Election, Candidate, Vote
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.views.static import serve
+from functools import wraps
+from operator import itemgetter
+from . import metrics
+from .cache import (
+    cached_all_standings, cached_api_standings, cached_election_standings, get_results_version,
+    version_etag,
+)
+from .export import FORMATS as EXPORT_FORMATS, async_chunks, export_chunks, gzip_chunks
+from .ingest import IngestPending, IngestUnavailable, ingest_enabled, submit_vote
+from .live import event_stream
+from .middleware import profile_aggregates
+from .models import Election, Candidate, ElectionCandidate, Vote
+from .ratelimit import check_vote_rate_limit
+from .replica import pin_to_primary, read_alias_for, reads_from, replica_alias
+from .renditions import RENDITION_MAX_AGE, RENDITION_RE
+from .results import API_FIELDS, BALLOT_CANDIDATE_FIELDS, DEFAULT_API_FIELDS, V1_API_FIELDS
+from .storage import HASHED_NAME_RE, STATIC_MAX_AGE
+from .tallies import record_vote
+from .turnout import RESOLUTIONS, turnout_series
+from .voted import forget_votes, get_voted_elections, remember_vote, voted_registry
+
+def read_replica(view):
+    """
+    装饰器：只读视图的 GET/HEAD 请求从只读副本读取 elections 模型。
+    副本落后超过 READ_REPLICA['MAX_LAG'] 秒，或当前用户刚写入而副本尚未同步时仍读主库。
+    未配置副本时不做任何事。
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or replica_alias() is None:
+                return await view(request, *args, **kwargs)
+            user = await aget_user(request)
+            alias = await sync_to_async(read_alias_for)(user.pk)
+            # 上下文变量会随 sync_to_async 传入同步线程，异步 ORM 查询同样生效
+            with reads_from(alias):
+                return await view(request, *args, **kwargs)
+    else:
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or replica_alias() is None:
+                return view(request, *args, **kwargs)
+            # 先在主库上解析当前用户（会话、用户表不走副本）
+            with reads_from(read_alias_for(request.user.pk)):
+                return view(request, *args, **kwargs)
+    return wrapper
 
 def home(request):
     """
@@ -25,6 +81,7 @@ def home(request):
         'candidates_count': candidates_count
     })
 
+@read_replica
 def election_list(request):
     """
     视图原型：选举列表 (核心投票页)
@@ -40,41 +97,43 @@ def election_list(request):
     if not current_election:
         current_election = elections.first()
         
-    # 查询所有候选人
-    candidates = Candidate.objects.all()
+    # 当前选举的候选人名单（按选票顺序，不读取页面用不到的竞选纲领）
+    candidates = current_election.ballot(BALLOT_CANDIDATE_FIELDS) if current_election else []
     
+    standings = []
     total_votes = 0
+    results_version = None
     has_voted = False
     vote_timestamp = None
     
     if current_election:
-        # 计算当前选举的总票数
-        total_votes = Vote.objects.filter(election=current_election).count()
+        # 从结果缓存读取当前选举的排名表；版本号同时作为候选人列表片段缓存的键
+        standings, total_votes, results_version = cached_election_standings(current_election)
         
-        # 检查当前用户是否已投票
+        # 检查当前用户是否已投票（读取缓存的已投票集合，不查询投票表）
         if request.user.is_authenticated:
-            user_vote = Vote.objects.filter(
-                voter=request.user, 
-                election=current_election
-            ).first()
-            if user_vote:
+            voted = get_voted_elections(request.user.id)
+            if current_election.id in voted:
                 has_voted = True
-                vote_timestamp = user_vote.voted_at
+                vote_timestamp = voted[current_election.id]
 
-    # 为每个候选人添加统计属性
+    # 为每个候选人添加统计属性（保持候选人原有顺序）
     for candidate in candidates:
-        # 只统计在当前选举中的票数
-        candidate.vote_count = Vote.objects.filter(candidate=candidate, election=current_election).count()
-        if total_votes > 0:
-            candidate.percentage = (candidate.vote_count / total_votes) * 100
-        else:
-            candidate.percentage = 0
+        candidate.vote_count = 0
+        candidate.percentage = 0
+    by_id = {candidate.id: candidate for candidate in candidates}
+    for row in standings:
+        candidate = by_id.get(row['candidate'].id)
+        if candidate:
+            candidate.vote_count = row['vote_count']
+            candidate.percentage = row['percentage']
 
     return render(request, 'elections/index.html', {
         'elections': elections,
         'current_election': current_election,
         'candidates': candidates,
         'total_votes': total_votes,
+        'results_version': results_version,
         'has_voted': has_voted,
         'vote_timestamp': vote_timestamp,
         'remaining_time': '计算中...' 
@@ -87,59 +146,194 @@ def election_detail(request, election_id):
     路由：GET /elections/<id>/
     """
     election = get_object_or_404(Election, id=election_id)
-    candidates = Candidate.objects.all()
+    candidates = election.ballot()
 
-    user_vote = None
-    if request.user.is_authenticated:
-        user_vote = Vote.objects.filter(
-            voter=request.user,
-            election=election
-        ).first()
+    voted = get_voted_elections(request.user.id) if request.user.is_authenticated else {}
 
     return render(request, 'elections/election_detail.html', {
         'election': election,
         'candidates': candidates,
-        'user_vote': user_vote,
+        'has_voted': election.id in voted,
+        'vote_timestamp': voted.get(election.id),
     })
 
+def rate_limited(view):
+    """
+    装饰器：投票接口限流。先按客户端 IP 检查（不访问数据库），
+    再按已登录用户检查，超出限额时返回 429，均在视图的任何查询之前完成。
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(request, election_id, *args, **kwargs):
+            # 共享缓存限流器和解析当前用户都是阻塞操作，一次放到同步线程中完成
+            retry_after = await sync_to_async(check_vote_rate_limit)(request, election_id)
+            if retry_after:
+                return rate_limited_response(retry_after)
+            return await view(request, election_id, *args, **kwargs)
+    else:
+        @wraps(view)
+        def wrapper(request, election_id, *args, **kwargs):
+            retry_after = check_vote_rate_limit(request, election_id)
+            if retry_after:
+                return rate_limited_response(retry_after)
+            return view(request, election_id, *args, **kwargs)
+    return wrapper
+
+@rate_limited
 @login_required
 def vote(request, election_id, candidate_id):
     """
     视图原型：处理投票
     描述：接收 POST 请求。
-          1. 验证选举是否活跃。
-          2. 验证用户是否已投过票。
-          3. 创建 Vote 记录。
+          1. 通过进程内已投票位图快速拒绝重复投票（只查已加载的位图）。
+          2. 验证候选人在该选举的名单上，且选举处于活跃状态；
+             选举确认存在后才加载其位图，任意 id 不会在进程中留下位图。
+          3. 创建 Vote 记录，重复投票由 (voter, election) 唯一约束拦截。
           4. 支持响应 AJAX (返回 JSON) 或普通表单提交 (重定向)。
     路由：POST /elections/<id>/vote/<cand_id>/
     """
-    election = get_object_or_404(Election, id=election_id)
-    candidate = get_object_or_404(Candidate, id=candidate_id)
-
     if request.method != 'POST':
+        metrics.inc('voting_votes_total', election=metrics.UNKNOWN_ELECTION, result='bad_method')
         return HttpResponseForbidden("Invalid request method")
 
+    # 进程内已投票位图：重复投票无需访问数据库即可拒绝
+    if voted_registry.has_voted_cached(election_id, request.user.id):
+        return already_voted_response(request, election_id)
+
+    # 一次查询同时取出选举和候选人；不在名单上的候选人返回 404
+    entry = get_object_or_404(
+        ElectionCandidate.objects.select_related('election', 'candidate'),
+        election_id=election_id,
+        candidate_id=candidate_id,
+    )
+    election, candidate = entry.election, entry.candidate
+
+    # 选举存在：位图尚未加载时在此加载
+    if voted_registry.has_voted(election.id, request.user.id):
+        return already_voted_response(request, election.id)
+
     # 检查选举是否开放
     if not election.is_active:
-         messages.error(request, "该选举未开始或已结束。")
-         return redirect('elections:election_detail', election_id=election.id)
-
-    # 检查是否已投票
-    if Vote.objects.filter(voter=request.user, election=election).exists():
-        # 如果是 AJAX 请求，返回 JSON 错误
-        if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-            return JsonResponse({'success': False, 'message': '您已经投过票了'})
-        messages.warning(request, "You have already voted in this election.")
-        return redirect('elections:election_detail', election_id=election.id)
+        return election_closed_response(request, election)
 
-    # 创建投票
-    Vote.objects.create(
-        voter=request.user,
-        candidate=candidate,
-        election=election,
-        ip_address=get_client_ip(request),
-    )
+    try:
+        accepted = cast_ballot(request.user, election, candidate, get_client_ip(request))
+    except IngestUnavailable:
+        return ingest_unavailable_response(election)
+    except IngestPending:
+        return ingest_pending_response(election)
+    if not accepted:
+        return already_voted_response(request, election.id)
+    return vote_accepted_response(request, election)
 
+@rate_limited
+async def avote(request, election_id, candidate_id):
+    """
+    视图原型：处理投票（异步版本，ASGI 部署时使用）
+    描述：流程与 vote 相同。选举与候选人通过异步 ORM 读取；
+          写入选票和计票需要事务，在同步线程中一次完成（异步 ORM 不支持事务），
+          分组提交模式下在独立线程中等待批次提交，不占用共享的同步线程。
+    路由：POST /elections/<id>/vote/<cand_id>/
+    """
+    user = await aget_user(request)
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+
+    if request.method != 'POST':
+        metrics.inc('voting_votes_total', election=metrics.UNKNOWN_ELECTION, result='bad_method')
+        return HttpResponseForbidden("Invalid request method")
+
+    if voted_registry.has_voted_cached(election_id, user.id):
+        return already_voted_response(request, election_id)
+
+    try:
+        entry = await ElectionCandidate.objects.select_related('election', 'candidate').aget(
+            election_id=election_id,
+            candidate_id=candidate_id,
+        )
+    except ElectionCandidate.DoesNotExist:
+        raise Http404("No ElectionCandidate matches the given query.")
+    election, candidate = entry.election, entry.candidate
+
+    # 位图首次访问某个选举时需要查询数据库加载
+    if await sync_to_async(voted_registry.has_voted)(election.id, user.id):
+        return already_voted_response(request, election.id)
+
+    if not election.is_active:
+        return election_closed_response(request, election)
+
+    try:
+        accepted = await sync_to_async(cast_ballot, thread_sensitive=not ingest_enabled())(
+            user, election, candidate, get_client_ip(request)
+        )
+    except IngestUnavailable:
+        return ingest_unavailable_response(election)
+    except IngestPending:
+        return ingest_pending_response(election)
+    if not accepted:
+        return already_voted_response(request, election.id)
+    return vote_accepted_response(request, election)
+
+def cast_ballot(user, election, candidate, ip_address):
+    """
+    辅助函数：写入一张选票并更新计票，返回是否被接受（False 表示已投过票）。
+    分组提交模式下选票进入队列，批次提交后返回；队列已满或选票已撤回时抛出 IngestUnavailable，
+    选票已在提交中但等待超时时抛出 IngestPending。
+    """
+    if ingest_enabled():
+        try:
+            accepted = submit_vote(user.id, election.id, candidate.id, ip_address)
+        except IngestPending:
+            # 结果未知：不标记位图，重新加载已投票集合，下次投票由唯一约束确定结果
+            forget_votes(user.id)
+            pin_to_primary(user.id)
+            raise
+        voted_registry.mark(election.id, user.id)
+        pin_to_primary(user.id)
+        if accepted:
+            # 批次提交时间与此相差不超过 MAX_WAIT_MS
+            remember_vote(user.id, election.id, timezone.now())
+        else:
+            forget_votes(user.id)
+        return accepted
+
+    # 创建投票，并在同一事务内更新计票表；重复投票由唯一约束拦截
+    try:
+        with transaction.atomic():
+            ballot = Vote.objects.create(
+                voter=user,
+                candidate=candidate,
+                election=election,
+                ip_address=ip_address,
+            )
+            record_vote(election.id, candidate.id, at=ballot.voted_at)
+    except IntegrityError:
+        if not Vote.objects.filter(voter=user, election=election).exists():
+            raise
+        voted_registry.mark(election.id, user.id)
+        # 缓存的已投票集合与数据库不一致（例如投票来自其他进程），下次重新加载
+        forget_votes(user.id)
+        pin_to_primary(user.id)
+        return False
+    voted_registry.mark(election.id, user.id)
+    remember_vote(user.id, election.id, ballot.voted_at)
+    # 副本同步到这张选票之前，该用户的页面读主库，能看到自己的投票状态
+    pin_to_primary(user.id)
+    return True
+
+async def aget_user(request):
+    """
+    辅助函数：在异步视图中取得当前用户。
+    request.user 是惰性对象，首次求值会查询会话和用户表，须在同步线程中完成。
+    """
+    await sync_to_async(lambda: request.user.is_authenticated)()
+    return request.user
+
+def vote_accepted_response(request, election):
+    """
+    辅助函数：投票成功时的响应
+    """
+    metrics.inc('voting_votes_total', election=election.id, result='accepted')
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
         # 如果是 AJAX 请求，返回 JSON 成功
         return JsonResponse({'success': True, 'message': '投票成功'})
@@ -148,6 +342,59 @@ def vote(request, election_id, candidate_id):
         messages.success(request, "Your vote has been recorded successfully.")
         return redirect('elections:election_detail', election_id=election.id)
 
+def election_closed_response(request, election):
+    """
+    辅助函数：选举未开放时的响应
+    """
+    metrics.inc('voting_votes_total', election=election.id, result='inactive')
+    messages.error(request, "该选举未开始或已结束。")
+    return redirect('elections:election_detail', election_id=election.id)
+
+def ingest_unavailable_response(election):
+    """
+    辅助函数：分组提交队列已满、等待超时（选票已撤回）或批次提交失败时的响应
+    """
+    metrics.inc('voting_votes_total', election=election.id, result='unavailable')
+    return JsonResponse(
+        {'success': False, 'message': '投票人数过多，请稍后重试'},
+        status=503
+    )
+
+def ingest_pending_response(election):
+    """
+    辅助函数：选票已在提交中的批次里但等待超时时的响应，客户端稍后刷新查看投票状态
+    """
+    metrics.inc('voting_votes_total', election=election.id, result='pending')
+    return JsonResponse(
+        {'success': False, 'pending': True, 'message': '投票正在处理，请稍后刷新页面查看结果'},
+        status=202
+    )
+
+def already_voted_response(request, election_id):
+    """
+    辅助函数：重复投票时的响应。
+    只在选举已确认存在时调用（查到名单之后，或命中已加载的位图——位图只为存在的选举加载），
+    因此可以直接用 election_id 作为指标标签
+    """
+    metrics.inc('voting_votes_total', election=election_id, result='already_voted')
+    # 如果是 AJAX 请求，返回 JSON 错误
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        return JsonResponse({'success': False, 'message': '您已经投过票了'})
+    messages.warning(request, "You have already voted in this election.")
+    return redirect('elections:election_detail', election_id=election_id)
+
+def rate_limited_response(retry_after):
+    """
+    辅助函数：超出投票限流时的响应。限流在查询选举之前，URL 中的 id 未经验证，不用作标签
+    """
+    metrics.inc('voting_votes_total', election=metrics.UNKNOWN_ELECTION, result='rate_limited')
+    response = JsonResponse(
+        {'success': False, 'message': '请求过于频繁，请稍后重试'},
+        status=429
+    )
+    response['Retry-After'] = str(retry_after)
+    return response
+
 def get_client_ip(request):
     """
     辅助函数：获取用户 IP 地址
@@ -157,6 +404,7 @@ def get_client_ip(request):
         return x_forwarded_for.split(',')[0]
     return request.META.get('REMOTE_ADDR')
 
+@read_replica
 def election_results(request, election_id):
     """
     视图原型：单个选举结果
@@ -164,30 +412,55 @@ def election_results(request, election_id):
     路由：GET /elections/<id>/results/
     """
     election = get_object_or_404(Election, id=election_id)
-    candidates = Candidate.objects.all()
+    standings, total_votes, version = cached_election_standings(election)
     
-    # 计算每个候选人的票数
-    results = []
-    for candidate in candidates:
-        vote_count = Vote.objects.filter(candidate=candidate, election=election).count()
-        
-        if vote_count > 0:
-            results.append({
-                'candidate': candidate,
-                'vote_count': vote_count
-            })
-    
-    # 按票数排序
-    results.sort(key=lambda x: x['vote_count'], reverse=True)
-    
-    total_votes = sum(r['vote_count'] for r in results)
+    # 结果未变化时直接返回 304
+    etag = version_etag(election.id, version, request.user.pk or 0)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified:
+        return not_modified
     
-    return render(request, 'elections/election_results.html', {
+    response = render(request, 'elections/election_results.html',
+                      election_results_context(election, standings, total_votes))
+    return set_results_validators(response, etag)
+
+@read_replica
+async def aelection_results(request, election_id):
+    """
+    视图原型：单个选举结果（异步版本，ASGI 部署时使用）
+    描述：与 election_results 相同；读取缓存和渲染模板在同步线程中完成。
+    路由：GET /elections/<id>/results/
+    """
+    try:
+        election = await Election.objects.aget(id=election_id)
+    except Election.DoesNotExist:
+        raise Http404("No Election matches the given query.")
+    user = await aget_user(request)
+    standings, total_votes, version = await sync_to_async(cached_election_standings)(election)
+
+    etag = version_etag(election.id, version, user.pk or 0)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified:
+        return not_modified
+
+    response = await sync_to_async(render)(
+        request, 'elections/election_results.html',
+        election_results_context(election, standings, total_votes)
+    )
+    return set_results_validators(response, etag)
+
+def election_results_context(election, standings, total_votes):
+    """
+    辅助函数：单个选举结果页面的模板上下文
+    """
+    # 只显示有得票的候选人（已按票数排序）
+    return {
         'election': election,
-        'results': results,
+        'results': [r for r in standings if r['vote_count'] > 0],
         'total_votes': total_votes
-    })
+    }
 
+@read_replica
 def results(request):
     """
     视图原型：所有结果汇总
@@ -195,42 +468,21 @@ def results(request):
     路由：GET /elections/results/
     """
     elections = Election.objects.all().order_by('-start_date')
-    results_data = []
     
-    for election in elections:
-        candidates = Candidate.objects.all()
-        total_votes = Vote.objects.filter(election=election).count()
-        
-        election_results = []
-        for candidate in candidates:
-            vote_count = Vote.objects.filter(
-                candidate=candidate,
-                election=election
-            ).count()
-            
-            percentage = 0
-            if total_votes > 0:
-                percentage = (vote_count / total_votes) * 100
-            
-            election_results.append({
-                'candidate': candidate,
-                'vote_count': vote_count,
-                'percentage': percentage
-            })
-        
-        # 按票数排序
-        election_results.sort(key=lambda x: x['vote_count'], reverse=True)
-        
-        results_data.append({
-            'election': election,
-            'results': election_results,
-            'total_votes': total_votes
-        })
+    # 从结果缓存读取（缓存未命中时一次分组查询计算所有选举的结果）
+    results_data, version = cached_all_standings(elections)
+    
+    etag = version_etag('all', version, request.user.pk or 0)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified:
+        return not_modified
     
-    return render(request, 'elections/results.html', {
+    response = render(request, 'elections/results.html', {
         'results_data': results_data
     })
+    return set_results_validators(response, etag)
 
+@read_replica
 def api_results(request):
     """
     视图原型：AJAX API
@@ -242,38 +494,355 @@ def api_results(request):
         current_election = Election.objects.first()
     
     if not current_election:
-        return JsonResponse({
-            'success': False,
-            'message': '没有找到选举'
-        })
-    
-    # 获取该选举的投票结果
-    candidates = Candidate.objects.all()
-    total_votes = Vote.objects.filter(election=current_election).count()
-    
-    results = []
-    for candidate in candidates:
-        vote_count = Vote.objects.filter(
-            candidate=candidate, 
-            election=current_election
-        ).count()
-        
-        percentage = 0
-        if total_votes > 0:
-            percentage = (vote_count / total_votes) * 100
-        
-        results.append({
-            'id': candidate.id,
-            'full_name': candidate.full_name,
-            'votes': vote_count,
-            'percentage': percentage
-        })
+        return no_election_response()
     
+    # 从结果缓存读取该选举的投票结果（普通字典，不含候选人模型）
+    rows, total_votes, version = cached_api_standings([current_election.id])[current_election.id]
+    return api_results_response(request, current_election, rows, version)
+
+@read_replica
+async def aapi_results(request):
+    """
+    视图原型：AJAX API（异步版本，ASGI 部署时使用）
+    描述：与 api_results 相同；选举通过异步 ORM 读取，结果缓存在同步线程中读取。
+    路由：GET /elections/api/results/
+    """
+    current_election = await Election.objects.filter(is_active=True).afirst()
+    if not current_election:
+        current_election = await Election.objects.afirst()
+
+    if not current_election:
+        return no_election_response()
+
+    standings = await sync_to_async(cached_api_standings)([current_election.id])
+    rows, total_votes, version = standings[current_election.id]
+    return api_results_response(request, current_election, rows, version)
+
+def no_election_response():
+    """
+    辅助函数：没有任何选举时的 API 响应
+    """
     return JsonResponse({
+        'success': False,
+        'message': '没有找到选举'
+    })
+
+def compact_json_response(data, status=200):
+    """
+    辅助函数：紧凑的 JSON 响应。不转义中文、不加空格，
+    数据只含基本类型，直接用 json.dumps 而不经过 DjangoJSONEncoder
+    """
+    return HttpResponse(
+        json.dumps(data, ensure_ascii=False, separators=(',', ':')),
+        content_type='application/json',
+        status=status,
+    )
+
+def api_results_response(request, election, rows, version):
+    """
+    辅助函数：结果 API 的 JSON 响应（结果未变化时返回 304）。
+    与改版前一致按选票顺序返回，不含名次；名次只在 v2 接口中提供
+    """
+    # 轮询时结果未变化则返回 304，无需重新序列化
+    etag = version_etag(election.id, version)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified:
+        return not_modified
+    
+    response = compact_json_response({
         'success': True,
-        'results': results,
+        'results': [
+            {field: row[field] for field in V1_API_FIELDS}
+            for row in sorted(rows, key=itemgetter('position'))
+        ],
         'timestamp': timezone.now().strftime('%Y-%m-%d %H:%M:%S')
     })
+    return set_results_validators(response, etag)
+
+def api_error_response(message):
+    """
+    辅助函数：API 参数错误时的 400 响应
+    """
+    return compact_json_response({'success': False, 'message': message}, status=400)
+
+def parse_api_v2_params(request):
+    """
+    辅助函数：解析 v2 结果 API 的参数，返回 (election_ids, fields)。
+    election_ids 和 fields 均为逗号分隔（也可以重复传参）；未指定 election_ids 时返回 None。
+    参数不合法时抛出 ValueError。
+    """
+    def split(name):
+        return [v.strip() for value in request.GET.getlist(name) for v in value.split(',') if v.strip()]
+
+    election_ids = None
+    if 'election_ids' in request.GET:
+        try:
+            election_ids = list(dict.fromkeys(int(v) for v in split('election_ids')))
+        except ValueError:
+            raise ValueError('election_ids 必须是逗号分隔的选举 ID')
+        if not election_ids:
+            raise ValueError('election_ids 不能为空')
+        limit = getattr(settings, 'API_MAX_ELECTIONS', 50)
+        if len(election_ids) > limit:
+            raise ValueError(f'一次最多查询 {limit} 个选举')
+
+    fields = list(dict.fromkeys(split('fields'))) or list(DEFAULT_API_FIELDS)
+    unknown = [f for f in fields if f not in API_FIELDS]
+    if unknown:
+        raise ValueError('不支持的字段: {}（可选: {}）'.format(', '.join(unknown), ', '.join(API_FIELDS)))
+    return election_ids, fields
+
+@read_replica
+def api_results_v2(request):
+    """
+    视图原型：结果 API v2
+    描述：一次返回多个选举的结果，只包含 fields 指定的字段，供仪表盘批量轮询。
+          未指定 election_ids 时返回当前活跃选举（与 v1 相同）。
+    路由：GET /elections/api/v2/results/?election_ids=1,2&fields=id,votes
+    """
+    try:
+        election_ids, fields = parse_api_v2_params(request)
+    except ValueError as exc:
+        return api_error_response(str(exc))
+
+    if election_ids is None:
+        current = Election.objects.filter(is_active=True).values_list('id', flat=True).first()
+        if current is None:
+            current = Election.objects.values_list('id', flat=True).first()
+        found = [current] if current is not None else []
+    else:
+        existing = set(Election.objects.filter(id__in=election_ids).values_list('id', flat=True))
+        found = [election_id for election_id in election_ids if election_id in existing]
+
+    return api_results_v2_response(request, found, fields, cached_api_standings(found))
+
+@read_replica
+async def aapi_results_v2(request):
+    """
+    视图原型：结果 API v2（异步版本，ASGI 部署时使用）
+    描述：与 api_results_v2 相同；选举通过异步 ORM 读取，结果缓存在同步线程中读取。
+    路由：GET /elections/api/v2/results/
+    """
+    try:
+        election_ids, fields = parse_api_v2_params(request)
+    except ValueError as exc:
+        return api_error_response(str(exc))
+
+    if election_ids is None:
+        current = await Election.objects.filter(is_active=True).values_list('id', flat=True).afirst()
+        if current is None:
+            current = await Election.objects.values_list('id', flat=True).afirst()
+        found = [current] if current is not None else []
+    else:
+        existing = {
+            election_id
+            async for election_id in Election.objects.filter(id__in=election_ids).values_list('id', flat=True)
+        }
+        found = [election_id for election_id in election_ids if election_id in existing]
+
+    standings = await sync_to_async(cached_api_standings)(found)
+    return api_results_v2_response(request, found, fields, standings)
+
+def api_results_v2_response(request, election_ids, fields, standings):
+    """
+    辅助函数：v2 结果 API 的 JSON 响应。
+    ETag 由各选举的版本号和所选字段组成，任一选举结果变化才重新序列化；
+    百分比保留两位小数以减小响应体。
+    """
+    if not election_ids:
+        return no_election_response()
+
+    versions = [standings[election_id][2] for election_id in election_ids]
+    version = max(versions)
+    digest = hashlib.md5(
+        repr((election_ids, versions, fields)).encode(), usedforsecurity=False
+    ).hexdigest()[:16]
+    etag = version_etag('v2', version, digest)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified:
+        return not_modified
+
+    round_percentage = 'percentage' in fields
+    elections = []
+    for election_id in election_ids:
+        rows, total_votes, _ = standings[election_id]
+        results = [{field: row[field] for field in fields} for row in rows]
+        if round_percentage:
+            for result in results:
+                result['percentage'] = round(result['percentage'], 2)
+        elections.append({'id': election_id, 'total_votes': total_votes, 'results': results})
+
+    response = compact_json_response({'success': True, 'version': version, 'elections': elections})
+    return set_results_validators(response, etag)
+
+@read_replica
+def turnout(request, election_id):
+    """
+    视图原型：投票率时间序列 API
+    描述：按 resolution（minute / hour / day）返回每个时间段的票数和累计票数，
+          由每分钟统计降采样得到，不扫描投票表。结果未变化时返回 304。
+    路由：GET /elections/<id>/turnout/?resolution=hour
+    """
+    election = get_object_or_404(Election, id=election_id)
+    resolution = request.GET.get('resolution', 'minute')
+    if resolution not in RESOLUTIONS:
+        return JsonResponse({
+            'success': False,
+            'message': 'resolution 只能是 ' + ' / '.join(RESOLUTIONS)
+        }, status=400)
+
+    version = get_results_version(election.id)
+    etag = version_etag(f'turnout-{election.id}', version, resolution)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified:
+        return not_modified
+
+    series = turnout_series(election.id, resolution)
+    response = JsonResponse({
+        'success': True,
+        'election_id': election.id,
+        'resolution': resolution,
+        'total_votes': series[-1]['cumulative'] if series else 0,
+        'series': [
+            {
+                'time': point['time'].isoformat(),
+                'votes': point['votes'],
+                'cumulative': point['cumulative'],
+            }
+            for point in series
+        ],
+    })
+    return set_results_validators(response, etag)
+
+async def results_stream(request, election_id):
+    """
+    视图原型：实时结果推送 (Server-Sent Events)
+    描述：通过 ASGI 保持长连接，选举结果变化时推送精简的排名数据。
+          所有订阅者共享同一次计算结果。
+          WSGI 下无法保持长连接，返回 204 让前端退回轮询。
+    路由：GET /elections/<id>/stream/
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    if not await Election.objects.filter(id=election_id).aexists():
+        return HttpResponse(status=404)
+
+    response = StreamingHttpResponse(
+        event_stream(election_id),
+        content_type='text/event-stream'
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    # 禁止反向代理缓冲事件流
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def set_results_validators(response, etag):
+    """
+    辅助函数：为结果响应设置 ETag，并要求客户端每次重新验证。
+    不设置 Last-Modified：版本精确到毫秒，按秒比较的 If-Modified-Since 会在同一秒内误判未修改
+    """
+    response.headers['ETag'] = etag
+    patch_cache_control(response, no_cache=True)
+    return response
+
+@staff_member_required
+def profile_stats(request):
+    """
+    视图原型：请求分析数据（仅管理员）
+    描述：返回 RequestProfilingMiddleware 按 URL 名称累计的请求耗时与 SQL 统计。
+          POST reset=1 清空累计数据。
+    路由：GET/POST /elections/debug/profile/
+    """
+    if request.method == 'POST' and request.POST.get('reset'):
+        profile_aggregates.reset()
+
+    return JsonResponse({
+        'enabled': getattr(settings, 'REQUEST_PROFILING', False),
+        'views': profile_aggregates.snapshot(),
+    })
+
+@staff_member_required
+def export_votes(request, election_id):
+    """
+    视图原型：投票记录导出（仅管理员）
+    描述：按 id 顺序流式输出选举的全部投票记录，format=csv / ndjson，
+          gzip=1 时边生成边压缩。分块读取数据库，内存占用与选举规模无关
+          （ASGI 下同样逐块发送）。
+    路由：GET /elections/<id>/export/?format=csv&gzip=1
+    """
+    election = get_object_or_404(Election, id=election_id)
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return JsonResponse({
+            'success': False,
+            'message': 'format 只能是 ' + ' / '.join(EXPORT_FORMATS)
+        }, status=400)
+
+    chunks = export_chunks(election, fmt)
+    filename = f'election-{election.id}-votes.{fmt}'
+    content_type = 'text/csv; charset=utf-8' if fmt == 'csv' else 'application/x-ndjson'
+    if request.GET.get('gzip') == '1':
+        chunks = gzip_chunks(chunks)
+        filename += '.gz'
+        content_type = 'application/gzip'
+    if isinstance(request, ASGIRequest):
+        # ASGI 下同步迭代器会被一次读完，改为逐块读取
+        chunks = async_chunks(chunks)
+
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+def metrics_view(request):
+    """
+    视图原型：Prometheus 指标
+    描述：以文本格式输出投票计数、请求耗时直方图、结果缓存命中率和 SQL 数量。
+    路由：GET /metrics
+    """
+    return HttpResponse(
+        metrics.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+def serve_media(request, path):
+    """
+    视图原型：上传文件（开发环境）
+    描述：提供 MEDIA_ROOT 下的文件。文件名带内容哈希的缩略图永不改变，
+          设置一年的 immutable 缓存；生产环境应由 Web 服务器按同样规则配置。
+    路由：GET /media/<path>
+    """
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    if RENDITION_RE.search(path):
+        patch_cache_control(response, public=True, max_age=RENDITION_MAX_AGE, immutable=True)
+    return response
+
+def serve_static(request, path):
+    """
+    视图原型：静态文件（生产环境，collectstatic 之后）
+    描述：客户端接受 br/gzip 时返回预压缩版本。带内容哈希的文件名设置一年的
+          immutable 缓存，修改后文件名随之改变。
+    路由：GET /static/<path>
+    """
+    accepted = {
+        part.split(';')[0].strip()
+        for part in request.headers.get('Accept-Encoding', '').split(',')
+    }
+    response = None
+    for suffix, encoding in (('.br', 'br'), ('.gz', 'gzip')):
+        if encoding in accepted:
+            try:
+                response = serve(request, path + suffix, document_root=settings.STATIC_ROOT)
+                break
+            except Http404:
+                continue
+    if response is None:
+        response = serve(request, path, document_root=settings.STATIC_ROOT)
+    patch_vary_headers(response, ['Accept-Encoding'])
+    if HASHED_NAME_RE.search(path):
+        patch_cache_control(response, public=True, max_age=STATIC_MAX_AGE, immutable=True)
+    return response
 
 def register(request):
     """
@@ -0,0 +1,189 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+
+from .cache import get_cache
+from .models import Vote
+from .replica import pin_users_to_primary
+
+USER_VOTES_KEY = 'elections:user_votes:{}'
+
+
+class VotedBitmap:
+    """
+    以用户 id 为下标的位图，一百万用户约占 125KB
+    """
+
+    def __init__(self):
+        self._bits = bytearray()
+        self._lock = threading.Lock()
+
+    def __contains__(self, user_id):
+        index = user_id >> 3
+        return index < len(self._bits) and bool(self._bits[index] & (1 << (user_id & 7)))
+
+    def add(self, user_id):
+        index = user_id >> 3
+        with self._lock:
+            if index >= len(self._bits):
+                # 按需扩容，预留一些空间减少重复分配
+                self._bits.extend(bytes(index - len(self._bits) + 1 + len(self._bits) // 4))
+            self._bits[index] |= 1 << (user_id & 7)
+
+    def discard(self, user_id):
+        index = user_id >> 3
+        with self._lock:
+            if index < len(self._bits):
+                self._bits[index] &= ~(1 << (user_id & 7)) & 0xFF
+
+
+class VotedRegistry:
+    """
+    进程内的“已投票”集合，每个选举一个位图。
+    首次访问某个选举时用一次查询加载，之后重复投票无需访问数据库即可拒绝。
+    只用于快速拒绝：位图中没有的用户仍由数据库唯一约束把关。
+    超过 VOTED_SET_TTL 秒后在后台线程中重新加载，以便其他进程中删除的投票最终生效；
+    重新加载期间请求继续使用旧位图。加载按选举分别加锁，互不阻塞。
+    调用方须先确认选举存在再调用 has_voted / mark，否则任意 id 都会留下一个位图。
+    """
+
+    def __init__(self):
+        self._sets = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _load(self, election_id):
+        bitmap = VotedBitmap()
+        voter_ids = (
+            Vote.objects.filter(election_id=election_id)
+            .values_list('voter_id', flat=True)
+            .iterator(chunk_size=10000)
+        )
+        for voter_id in voter_ids:
+            bitmap.add(voter_id)
+        return bitmap
+
+    def _lock_for(self, election_id):
+        lock = self._locks.get(election_id)
+        if lock is None:
+            with self._lock:
+                lock = self._locks.setdefault(election_id, threading.Lock())
+        return lock
+
+    def _get(self, election_id):
+        entry = self._sets.get(election_id)
+        if entry is None:
+            # 首次访问只能同步加载；同一选举的并发请求等待同一次加载
+            with self._lock_for(election_id):
+                entry = self._sets.get(election_id)
+                if entry is None:
+                    entry = (self._load(election_id), time.monotonic())
+                    self._sets[election_id] = entry
+        elif time.monotonic() - entry[1] > getattr(settings, 'VOTED_SET_TTL', 300):
+            self._refresh_in_background(election_id)
+        return entry[0]
+
+    def _refresh_in_background(self, election_id):
+        lock = self._lock_for(election_id)
+        if not lock.acquire(blocking=False):
+            # 该选举正在加载或刷新
+            return None
+        thread = threading.Thread(
+            target=self._refresh,
+            args=(election_id, lock),
+            name=f'voted-refresh-{election_id}',
+            daemon=True,
+        )
+        thread.start()
+        return thread
+
+    def _refresh(self, election_id, lock):
+        try:
+            self._sets[election_id] = (self._load(election_id), time.monotonic())
+        except DatabaseError:
+            # 保留旧位图，下次访问时再试
+            pass
+        finally:
+            lock.release()
+            connection.close()
+
+    def has_voted(self, election_id, user_id):
+        return user_id in self._get(election_id)
+
+    def has_voted_cached(self, election_id, user_id):
+        """
+        只查已加载的位图，不访问数据库；选举尚未加载时返回 False
+        """
+        entry = self._sets.get(election_id)
+        return entry is not None and user_id in entry[0]
+
+    def mark(self, election_id, user_id):
+        self._get(election_id).add(user_id)
+
+    def unmark(self, election_id, user_id):
+        entry = self._sets.get(election_id)
+        if entry is not None:
+            entry[0].discard(user_id)
+
+    def forget(self, election_id):
+        """
+        丢弃某个选举的位图（选举被删除时），下次访问重新加载
+        """
+        self._sets.pop(election_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._sets.clear()
+
+
+voted_registry = VotedRegistry()
+
+
+def get_voted_elections(user_id):
+    """
+    返回用户已投票的选举 {election_id: 投票时间}。
+    缓存未命中时用一次查询取出该用户的全部投票，之后页面渲染无需查询。
+    """
+    cache = get_cache()
+    key = USER_VOTES_KEY.format(user_id)
+    voted = cache.get(key)
+    if voted is None:
+        voted = dict(Vote.objects.filter(voter_id=user_id).values_list('election_id', 'voted_at'))
+        # add 而不是 set：避免覆盖并发投票刚写入的结果
+        cache.add(key, voted, getattr(settings, 'VOTED_SET_TTL', 300))
+    return voted
+
+
+def remember_vote(user_id, election_id, voted_at):
+    """
+    投票成功后更新用户的已投票集合；集合尚未缓存时下次读取会从数据库加载
+    """
+    cache = get_cache()
+    key = USER_VOTES_KEY.format(user_id)
+    voted = cache.get(key)
+    if voted is not None:
+        voted[election_id] = voted_at
+        cache.set(key, voted, getattr(settings, 'VOTED_SET_TTL', 300))
+
+
+def forget_votes(user_id):
+    """
+    删除用户的已投票集合缓存（投票被删除或状态不一致时）
+    """
+    get_cache().delete(USER_VOTES_KEY.format(user_id))
+
+
+def forget_voters(voters):
+    """
+    选票被删除后清除投票人的已投票状态。voters: [(election_id, voter_id)]
+    投票人在副本同步到删除之前读主库，否则重新加载的已投票集合会从副本读到已删除的选票。
+    只清除本进程的位图和结果缓存中的集合：缓存不在进程间共享（默认的本地内存缓存）时，
+    其他进程最长 VOTED_SET_TTL 秒后才会看到删除（见 settings.VOTED_SET_TTL）
+    """
+    for election_id, voter_id in voters:
+        voted_registry.unmark(election_id, voter_id)
+    voter_ids = {v for _, v in voters}
+    pin_users_to_primary(voter_ids)
+    get_cache().delete_many([USER_VOTES_KEY.format(voter_id) for voter_id in voter_ids])
@@ -0,0 +1,14 @@
+// 关闭消息提示
+document.querySelectorAll('.close-message').forEach(button => {
+    button.addEventListener('click', function() {
+        this.parentElement.remove();
+    });
+});
+
+// 自动关闭消息提示
+setTimeout(() => {
+    document.querySelectorAll('.alert').forEach(alert => {
+        alert.style.opacity = '0';
+        setTimeout(() => alert.remove(), 300);
+    });
+}, 5000);
@@ -0,0 +1,198 @@
+// 投票首页脚本：页面参数由 #election-page 的 data-* 属性提供
+const page = document.getElementById('election-page').dataset;
+
+// ================== 新增：获取 CSRF Token 的函数 ==================
+function getCookie(name) {
+    let cookieValue = null;
+    if (document.cookie && document.cookie !== '') {
+        const cookies = document.cookie.split(';');
+        for (let i = 0; i < cookies.length; i++) {
+            const cookie = cookies[i].trim();
+            // Does this cookie string begin with the name we want?
+            if (cookie.substring(0, name.length + 1) === (name + '=')) {
+                cookieValue = decodeURIComponent(cookie.substring(name.length + 1));
+                break;
+            }
+        }
+    }
+    return cookieValue;
+}
+// =============================================================
+
+// 全局变量
+let selectedCandidateId = null;
+let selectedCandidateName = '';
+let selectedCandidateParty = '';
+
+// 打开投票确认模态框
+function openVoteModal(candidateId, candidateName, candidateParty) {
+    selectedCandidateId = candidateId;
+    selectedCandidateName = candidateName;
+    selectedCandidateParty = candidateParty;
+
+    document.getElementById('candidate-name-confirm').textContent = candidateName;
+    document.getElementById('candidate-party-confirm').textContent = candidateParty;
+
+    document.getElementById('voteModal').classList.add('active');
+}
+
+// 关闭投票确认模态框
+function closeVoteModal() {
+    document.getElementById('voteModal').classList.remove('active');
+}
+
+// 提交投票
+function submitVote() {
+    closeVoteModal();
+
+    // 修复：简化 URL 构造方式
+    // 确保 current_election 存在，否则会报错
+    var electionId = page.electionId || "0";
+    var voteUrl = "/elections/" + electionId + "/vote/" + selectedCandidateId + "/";
+
+    // 发送投票请求到服务器
+    $.ajax({
+        url: voteUrl,
+        method: "POST",
+        headers: {
+            "X-CSRFToken": getCookie('csrftoken')  // 修复：添加 CSRF Token
+        },
+        data: {
+            candidate_id: selectedCandidateId
+        },
+        success: function(response) {
+            if (response.success) {
+                // 更新UI显示用户已投票
+                document.querySelectorAll('.vote-btn').forEach(btn => {
+                    btn.disabled = true;
+                    btn.innerHTML = '<i class="fas fa-check"></i> 您已投票';
+                });
+
+                // 显示成功消息
+                setTimeout(() => {
+                    document.getElementById('successModal').classList.add('active');
+                }, 500);
+
+                // 更新用户状态显示
+                document.querySelector('.user-status').innerHTML = 
+                    '<span class="status-badge voted"><i class="fas fa-check-circle"></i> 已投票</span>';
+
+                // 更新状态卡片
+                document.querySelector('.status-card h4').textContent = '您已完成投票';
+                document.querySelector('.status-card p').textContent = '感谢您行使民主权利！您的投票已被安全记录。';
+                document.querySelector('.status-icon').innerHTML = '<i class="fas fa-check-circle"></i>';
+                document.querySelector('.status-icon').className = 'status-icon voted';
+
+            } else {
+                alert('投票失败: ' + response.message);
+            }
+        },
+        error: function(xhr, status, error) {
+            console.error("Error:", error);
+            alert('网络错误，请稍后重试');
+        }
+    });
+}
+
+// 关闭成功模态框
+function closeSuccessModal() {
+    document.getElementById('successModal').classList.remove('active');
+    // 刷新页面以更新数据
+    setTimeout(() => location.reload(), 500);
+}
+
+// 将结果数据应用到页面
+function applyResults(response) {
+    if (!response.success) {
+        return;
+    }
+    // 更新图表数据
+    response.results.forEach(candidate => {
+        // 更新候选人卡片上的票数
+        const card = document.querySelector(`.candidate-card[data-candidate-id="${candidate.id}"]`);
+        if (card) {
+            const statValues = card.querySelectorAll('.stat-value');
+            if (statValues.length >= 2) {
+                statValues[0].textContent = candidate.percentage.toFixed(1) + '%';
+                statValues[1].textContent = candidate.votes;
+            }
+        }
+    });
+
+    // 更新最后更新时间
+    document.getElementById('last-update-time').textContent = response.timestamp;
+}
+
+// 更新投票结果
+function updateResults() {
+    $.ajax({
+        url: page.resultsUrl,
+        method: "GET",
+        success: applyResults,
+        error: function() {
+            console.error("更新结果失败");
+        }
+    });
+}
+
+// 开始轮询（实时推送不可用时的后备方案，每30秒）
+let pollingTimer = null;
+function startPolling() {
+    if (!pollingTimer) {
+        pollingTimer = setInterval(updateResults, 30000);
+    }
+}
+
+// 订阅实时结果推送，不可用时退回轮询
+function subscribeResults() {
+    if (page.streamUrl && window.EventSource) {
+        const source = new EventSource(page.streamUrl);
+        source.addEventListener('results', function(e) {
+            applyResults(JSON.parse(e.data));
+        });
+        source.onerror = function() {
+            if (source.readyState === EventSource.CLOSED) {
+                startPolling();
+            }
+        };
+        return;
+    }
+    startPolling();
+}
+
+// 刷新结果
+function refreshResults() {
+    updateResults();
+    const btn = document.querySelector('.btn-refresh');
+    btn.innerHTML = '<i class="fas fa-spinner fa-spin"></i> 更新中...';
+    setTimeout(() => {
+        btn.innerHTML = '<i class="fas fa-redo"></i> 刷新数据';
+    }, 1000);
+}
+
+// 页面加载完成后初始化
+$(document).ready(function() {
+    // 设置最后更新时间
+    const now = new Date();
+    document.getElementById('last-update-time').textContent = now.toLocaleString('zh-CN');
+
+    // 开始自动更新结果
+    subscribeResults();
+
+    // 点击模态框外部关闭
+    document.querySelectorAll('.modal-overlay').forEach(overlay => {
+        overlay.addEventListener('click', function(e) {
+            if (e.target === this) {
+                this.classList.remove('active');
+            }
+        });
+    });
+
+    // 如果用户已投票，禁用所有投票按钮
+    if (page.hasVoted === '1') {
+        document.querySelectorAll('.vote-btn').forEach(btn => {
+            btn.disabled = true;
+            btn.innerHTML = '<i class="fas fa-check"></i> 您已投票';
+        });
+    }
+});
@@ -3,6 +3,16 @@ ASGI config for voting_system project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The live results stream (``/elections/<id>/stream/``) is only available
+when the project is served through this ASGI application, e.g.::
+
+    uvicorn voting_system.asgi:application
+
+Under ASGI the vote and results endpoints are served by the async views
+(``avote``, ``aapi_results``, ``aelection_results``) so that requests waiting
+on the database do not hold a worker thread. Set ``VOTING_ASYNC_VIEWS=0``
+to keep the synchronous views.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
@@ -12,5 +22,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'voting_system.settings')
+os.environ.setdefault('VOTING_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
@@ -6,8 +6,8 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 # 安全设置（开发环境）
 SECRET_KEY = 'django-insecure-your-secret-key-here'  # 生产环境请更换
-DEBUG = True
-ALLOWED_HOSTS = []
+DEBUG = os.environ.get('VOTING_DEBUG', '1') == '1'  # 生产环境设置 VOTING_DEBUG=0
+ALLOWED_HOSTS = [h for h in os.environ.get('VOTING_ALLOWED_HOSTS', '').split(',') if h]
 
 # 已安装的应用程序
 INSTALLED_APPS = [
@@ -29,8 +29,18 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'elections.middleware.MetricsMiddleware',
 ]
 
+# 请求分析（可选）：设置 VOTING_PROFILE_REQUESTS=1 后记录每个请求的 SQL 与耗时，
+# 通过 Server-Timing 响应头和 /elections/debug/profile/ 查看
+REQUEST_PROFILING = os.environ.get('VOTING_PROFILE_REQUESTS') == '1'
+if REQUEST_PROFILING:
+    MIDDLEWARE.append('elections.middleware.RequestProfilingMiddleware')
+
+# 异步视图：voting_system/asgi.py 默认开启，投票和结果接口改用异步视图（见 elections/urls.py）
+ASYNC_VIEWS = os.environ.get('VOTING_ASYNC_VIEWS') == '1'
+
 # URL配置
 ROOT_URLCONF = 'voting_system.urls'
 
@@ -51,14 +61,114 @@ TEMPLATES = [
     },
 ]
 
+# 生产环境显式使用缓存模板加载器：模板只解析一次，之后直接复用编译结果
+if not DEBUG:
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
 # 数据库配置（使用SQLite）
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('VOTING_DB_PATH', BASE_DIR / 'db.sqlite3'),
     }
 }
 
+# 生产环境 SQLite 参数：WAL 模式下读写互不阻塞，连接打开时设置（只用于主库）。
+# 锁等待时间只由下方 OPTIONS['timeout'] 设置，这里不再设 busy_timeout，避免两处取值互相覆盖
+SQLITE_PRODUCTION_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 268435456,
+    'cache_size': -65536,
+    'temp_store': 'MEMORY',
+}
+
+# 数据库配置档：设置 VOTING_DB_PROFILE=production 启用生产 SQLite 配置（WAL + 持久连接）
+DB_PROFILE = os.environ.get('VOTING_DB_PROFILE', 'development')
+SQLITE_PRAGMAS = {}
+if DB_PROFILE == 'production':
+    SQLITE_PRAGMAS = SQLITE_PRODUCTION_PRAGMAS
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        # 等待写锁的秒数（sqlite3 以此设置 busy timeout）
+        'OPTIONS': {'timeout': 5},
+    })
+
+# 只读副本（可选）：设置 VOTING_REPLICA_PATH 后，结果与审计类只读视图从主库的定期备份读取，
+# 写入始终走主库。副本由 refresh_replica 命令用 SQLite 备份 API 刷新
+if os.environ.get('VOTING_REPLICA_PATH'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['VOTING_REPLICA_PATH'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['elections.replica.ReplicaRouter']
+READ_REPLICA = {
+    'MAX_LAG': 5,
+    'REFRESH_INTERVAL': 2,
+}
+
+# 缓存配置（默认本地内存缓存；设置 VOTING_CACHE_DIR 后改用文件缓存，可在多进程间共享）
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'voting-system',
+    }
+}
+if os.environ.get('VOTING_CACHE_DIR'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ['VOTING_CACHE_DIR'],
+    }
+
+# 选举结果缓存
+RESULTS_CACHE_ALIAS = 'default'
+RESULTS_CACHE_TIMEOUT = 300
+# v2 结果接口一次最多查询的选举数
+API_MAX_ELECTIONS = 50
+
+# 实时结果推送：检查结果版本的间隔（秒）及单个连接的最长保持时间（秒）
+LIVE_RESULTS_INTERVAL = 0.5
+LIVE_RESULTS_MAX_AGE = 300
+
+# 投票分组提交：选票先进入有界队列，由后台线程按批（BATCH_SIZE 张或等待 MAX_WAIT_MS 毫秒）
+# 在一个事务内写入，适合 SQLite 在投票高峰时减少事务和 fsync 次数
+VOTE_INGEST = {
+    'ENABLED': os.environ.get('VOTING_GROUP_COMMIT') == '1',
+    'BATCH_SIZE': 200,
+    'MAX_WAIT_MS': 10,
+    'QUEUE_SIZE': 10000,
+    'SUBMIT_TIMEOUT': 5,
+}
+
+# 投票接口限流：按客户端 IP 和用户分别使用令牌桶，格式为 '次数/周期'（s/m/h/d），None 表示不限制。
+# ELECTIONS 按选举 id 覆盖限额；多进程部署时将 CACHE 设为共享缓存别名（如 Redis/Memcached），
+# 否则每个进程在内存中最多保存 MAX_KEYS 个桶。部署在反向代理之后时把 PROXY_HOPS 设为代理层数，
+# 按代理追加的 X-Forwarded-For 地址限流（客户端自己发送的部分不可信）
+VOTE_RATE_LIMIT = {
+    'ENABLED': True,
+    'IP_RATE': '60/m',
+    'USER_RATE': '10/m',
+    'ELECTIONS': {},
+    'CACHE': None,
+    'MAX_KEYS': 100000,
+    'PROXY_HOPS': 0,
+}
+
+# 进程内已投票位图及每个用户已投票选举集合的缓存时间（秒）。
+# 删除选票（如在后台）只能立即清除本进程的位图和 RESULTS_CACHE_ALIAS 缓存中的集合：
+# 多进程部署且使用默认的本地内存缓存时，其他进程中该投票人最长 VOTED_SET_TTL 秒内仍显示为已投票、
+# 重新投票被拒绝。多进程部署应设置 VOTING_CACHE_DIR（或其他共享缓存），
+# 位图的滞后则只能通过调小 VOTED_SET_TTL 缩短
+VOTED_SET_TTL = 300
+
 # 认证设置
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -89,6 +199,16 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# 候选人照片缩略图：上传后在后台线程池中生成正方形缩略图（WebP 和 JPEG），
+# 文件名带内容哈希，与原图放在同一目录；已有照片用 build_renditions 命令补生成
+PHOTO_RENDITIONS = {
+    'WIDTHS': (64, 128, 256),
+    'FORMATS': ('webp', 'jpeg'),
+    'QUALITY': 80,
+    'ASYNC': True,
+    'WORKERS': 2,
+}
+
 # 登录/登出重定向
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
@@ -96,6 +216,10 @@ LOGOUT_REDIRECT_URL = '/'
 # 👇 新增：关闭浏览器后自动退出登录
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 
+# 会话先读缓存，未命中才查询 django_session。
+# 用户对象不缓存：停用、改密码等安全相关的修改须在所有进程中立即生效
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
 # 默认主键类型
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -103,4 +227,9 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 if DEBUG:
     STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 else:
-    STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+    STATIC_ROOT = os.environ.get('VOTING_STATIC_ROOT', os.path.join(BASE_DIR, 'staticfiles'))
+    # collectstatic 为文件名加内容哈希并生成 .gz（安装 brotli 时还有 .br）
+    STORAGES = {
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'elections.storage.CompressedManifestStaticFilesStorage'},
+    }
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.conf import settings
+from django.urls import path, include, re_path
 from django.shortcuts import redirect
 from django.contrib.auth import views as auth_views
 from elections import views as election_views
@@ -16,7 +17,20 @@ urlpatterns = [
     # 👇 注册 (新加的)
     path('register/', election_views.register, name='register'),
     
+    # Prometheus 指标
+    path('metrics', election_views.metrics_view, name='metrics'),
+
     # elections 应用路由
     path('elections/', include('elections.urls')),
 ]
 
+if settings.DEBUG:
+    # 开发环境：提供上传文件（候选人照片及缩略图），静态文件由 runserver 提供
+    urlpatterns += [
+        re_path(r'^media/(?P<path>.*)$', election_views.serve_media, name='media'),
+    ]
+else:
+    # 生产环境：提供 collectstatic 生成的带哈希、预压缩的静态文件
+    urlpatterns += [
+        re_path(r'^static/(?P<path>.*)$', election_views.serve_static, name='static'),
+    ]